@@ -0,0 +1,8 @@
+from timing import measure
+from timing import write_results
+from timing import read_results
+from timing import find_regressions
+from timing import print_results
+from microbenchmarks import run_layer_benchmarks
+from training import run_training_benchmarks
+from training import print_training_results
@@ -0,0 +1,65 @@
+from timing import write_results
+from timing import read_results
+from timing import find_regressions
+from timing import print_results
+from microbenchmarks import run_layer_benchmarks
+from training import WORKLOADS
+from training import run_training_benchmarks
+from training import print_training_results
+
+import argparse
+import sys
+
+# Runs the benchmarks from the command line (from the src directory):
+#   python -m benchmarks layers --output results.json --baseline baseline.json --threshold 0.1
+#   python -m benchmarks training --workload conv --output training.json
+# Writes the results as JSON, and exits with status 1 if any benchmark is slower than the baseline
+# by more than the threshold (in time per call for layers, in time per epoch for training)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    subparsers = parser.add_subparsers(dest="suite")
+
+    layers = subparsers.add_parser("layers", help="per layer, activation, and cost function microbenchmarks")
+    layers.add_argument("--filter", help="only run benchmarks whose name contains this")
+    layers.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    layers.add_argument("--min-time", type=float, default=0.02, help="minimum seconds per timed run")
+
+    training = subparsers.add_parser("training", help="end to end training throughput of every network type")
+    training.add_argument("--workload", action="append", choices=[name for name, workload in WORKLOADS],
+                          help="only run this workload (can be given more than once)")
+    training.add_argument("--in-process", action="store_true",
+                          help="run the workloads in this process instead of one fresh interpreter each")
+    training.add_argument("--repeat", type=int, default=5, help="timed runs per workload, the fastest is compared")
+
+    for suite in subparsers.choices.values():
+        suite.add_argument("--output", help="write the results to this JSON file")
+        suite.add_argument("--baseline", help="compare against the results in this JSON file")
+        suite.add_argument("--threshold", type=float, default=0.1,
+                           help="flag benchmarks slower than the baseline by more than this fraction")
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    baseline = read_results(args.baseline) if args.baseline else None
+    if args.suite == "training":
+        results = run_training_benchmarks(args.workload, not args.in_process, repeat=args.repeat)
+        print_training_results(results, baseline)
+        key, unit, scale = "seconds_per_epoch", "s/epoch", 1
+    else:
+        results = run_layer_benchmarks(args.filter, args.repeat, args.min_time)
+        print_results(results, baseline)
+        key, unit, scale = "best", "us", 1e6
+    if args.output:
+        write_results(args.output, results)
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.threshold, key)
+        for name, before, after, ratio in regressions:
+            print("REGRESSION %s: %.4g %s -> %.4g %s (%.2fx)" % (name, before*scale, unit, after*scale, unit, ratio))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
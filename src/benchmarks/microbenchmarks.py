@@ -0,0 +1,213 @@
+from layers import Kernel
+from layers import ConvLayer
+from layers import DeconvLayer
+from layers import DenseLayer
+from layers import SoftmaxLayer
+from layers import RecurrentLayer
+
+from functions import LeakyRELU
+from functions import RELU
+from functions import Sigmoid
+from functions import Softmax
+from functions import QuadraticCost
+from functions import NegativeLogLikelihood
+
+from neuralnets import fullyconnected_functions as fn
+
+from timing import measure
+
+import numpy as np
+
+# Microbenchmarks of the layers, activation functions, and cost functions
+#
+# Every benchmark is named "<component>/<operation>/<shape>", for example "DenseLayer/backprop/256x128".
+# The benchmarks of a group are generators, each function is timed before the next one is made.
+# Layers are timed for forward, backward, and update, both for one example and (where the layer has it)
+# for a batch of BATCH_SIZE examples. Activation and cost functions are timed for one vector and a batch.
+
+# Examples per batch (and timesteps per sequence) in the batched benchmarks
+BATCH_SIZE = 32
+
+# Shape grids, from small to large
+# Kernel: ((image depth, image height, image length), (kernel depth, kernel height, kernel length))
+KERNEL_SHAPES = [((1, 8, 8), (1, 3, 3)),
+                 ((3, 16, 16), (3, 3, 3)),
+                 ((8, 16, 16), (8, 5, 5))]
+# ConvLayer: ((image depth, image height, image length), (num kernels, kernel depth, kernel height, kernel length))
+CONV_SHAPES = [((1, 8, 8), (4, 1, 3, 3)),
+               ((3, 16, 16), (8, 3, 3, 3)),
+               ((8, 16, 16), (8, 8, 5, 5))]
+# DeconvLayer: (input shape, (num kernels, output height, output length), kernel shape)
+DECONV_SHAPES = [((2, 4, 4), (4, 8, 8), (4, 2, 3, 3)),
+                 ((4, 8, 8), (8, 16, 16), (8, 4, 3, 3))]
+# DenseLayer and SoftmaxLayer: (num inputs, num outputs)
+DENSE_SHAPES = [(64, 32), (256, 128), (1024, 512)]
+# RecurrentLayer: (num neurons, num inputs)
+RECURRENT_SHAPES = [(32, 16), (128, 64), (256, 128)]
+# Activation and cost functions: vector sizes
+VECTOR_SIZES = [16, 256, 4096]
+
+def shape_name(*shapes):
+    return ",".join("x".join(str(s) for s in np.atleast_1d(shape)) for shape in shapes)
+
+# Yields (name, function) for every Kernel benchmark
+def kernel_benchmarks():
+    for image_shape, kernel_shape in KERNEL_SHAPES:
+        kernel = Kernel(kernel_shape)
+        image = np.random.rand(*image_shape)
+        output_shape = (1, image_shape[1]-kernel_shape[1]+1, image_shape[2]-kernel_shape[2]+1)
+        deltas = np.random.rand(*output_shape[1:])
+        d_weights = np.zeros(kernel_shape)
+        name = shape_name(image_shape, kernel_shape)
+
+        yield "Kernel/forward/" + name, lambda: kernel.use_kernel(image)
+        yield "Kernel/backprop/" + name, lambda: kernel.backprop(image_shape, output_shape, image, image, deltas)
+        yield "Kernel/update/" + name, lambda: kernel.update(d_weights, 0.0)
+
+# Yields (name, function) for every ConvLayer benchmark
+def conv_benchmarks():
+    for image_shape, kernel_shape in CONV_SHAPES:
+        layer = ConvLayer(image_shape, kernel_shape)
+        image = np.random.rand(*image_shape)
+        images = np.random.rand(*((BATCH_SIZE,) + image_shape))
+        deltas = np.random.rand(*layer.get_output_shape())
+        batch_deltas = np.random.rand(*((BATCH_SIZE,) + layer.get_output_shape()))
+        d_weights = np.zeros(kernel_shape)
+        d_biases = np.zeros(kernel_shape[0])
+        name = shape_name(image_shape, kernel_shape)
+
+        yield "ConvLayer/forward/" + name, lambda: layer.feedforward(image)
+        yield "ConvLayer/forward_batch/" + name, lambda: layer.feedforward_batch(images)
+        yield "ConvLayer/backprop/" + name, lambda: layer.backprop(image, image, deltas)
+        yield "ConvLayer/getdeltas_batch/" + name, lambda: layer.getdeltas_batch(images, batch_deltas)
+        yield "ConvLayer/update/" + name, lambda: layer.update(d_weights, d_biases)
+
+# Yields (name, function) for every DeconvLayer benchmark
+def deconv_benchmarks():
+    for image_shape, output_shape, kernel_shape in DECONV_SHAPES:
+        layer = DeconvLayer(image_shape, output_shape, kernel_shape)
+        image = np.random.rand(*image_shape)
+        images = np.random.rand(*((BATCH_SIZE,) + image_shape))
+        deltas = np.random.rand(*output_shape)
+        batch_deltas = np.random.rand(*((BATCH_SIZE,) + output_shape))
+        d_weights = np.zeros(kernel_shape)
+        d_biases = np.zeros(kernel_shape[0])
+        name = shape_name(image_shape, output_shape, kernel_shape)
+
+        yield "DeconvLayer/forward/" + name, lambda: layer.feedforward(image)
+        yield "DeconvLayer/forward_batch/" + name, lambda: layer.feedforward_batch(images)
+        yield "DeconvLayer/backprop/" + name, lambda: layer.backprop(image, image, deltas)
+        yield "DeconvLayer/getdeltas_batch/" + name, lambda: layer.getdeltas_batch(images, batch_deltas)
+        yield "DeconvLayer/update/" + name, lambda: layer.update(d_weights, d_biases)
+
+# Yields (name, function) for every DenseLayer and SoftmaxLayer benchmark
+def dense_benchmarks():
+    for layer_class in (DenseLayer, SoftmaxLayer):
+        for num_inputs, num_outputs in DENSE_SHAPES:
+            layer = layer_class(input_shape=num_inputs, output_shape=num_outputs)
+            inputs = np.random.rand(num_inputs)
+            batch_inputs = np.random.rand(BATCH_SIZE, num_inputs)
+            deltas = np.random.rand(num_outputs)
+            batch_deltas = np.random.rand(BATCH_SIZE, num_outputs)
+            d_weights = np.zeros((num_outputs, num_inputs))
+            d_biases = np.zeros(num_outputs)
+            prefix = layer_class.__name__ + "/"
+            name = shape_name((num_inputs, num_outputs))
+
+            yield prefix + "forward/" + name, lambda: layer.feedforward(inputs)
+            yield prefix + "forward_batch/" + name, lambda: layer.feedforward_batch(batch_inputs)
+            yield prefix + "backprop/" + name, lambda: layer.backprop(inputs, inputs, deltas)
+            yield prefix + "getdeltas_batch/" + name, lambda: layer.getdeltas_batch(batch_inputs, batch_deltas)
+            yield prefix + "update/" + name, lambda: layer.update(d_weights, d_biases)
+
+# Yields (name, function) for every RecurrentLayer benchmark
+def recurrent_benchmarks():
+    for num_neurons, num_inputs in RECURRENT_SHAPES:
+        layer = RecurrentLayer((num_neurons, num_inputs))
+        inputs = np.random.rand(num_inputs)
+        sequence = np.random.rand(BATCH_SIZE, num_inputs)
+        states = np.random.rand(num_neurons)
+        state_sequence = np.random.rand(BATCH_SIZE, num_neurons)
+        d_weights = np.zeros((num_neurons, num_inputs))
+        d_past_weights = np.zeros((num_neurons, num_neurons))
+        d_biases = np.zeros(num_neurons)
+        name = shape_name((num_neurons, num_inputs))
+
+        yield "RecurrentLayer/forward/" + name, lambda: layer.feed_forward(inputs)
+        yield "RecurrentLayer/forward_sequence/" + name, lambda: layer.feed_forward_sequence(sequence)
+        yield "RecurrentLayer/backprop/" + name, lambda: layer.backprop(states, inputs, states)
+        yield ("RecurrentLayer/backprop_sequence/" + name,
+               lambda: layer.backprop_sequence(state_sequence, sequence, state_sequence))
+        yield "RecurrentLayer/update/" + name, lambda: layer.update(d_weights, d_past_weights, d_biases)
+
+# Yields (name, function) for every activation function benchmark
+# The per element functions of some activations change their argument, so they get a copy every call
+def activation_benchmarks():
+    for activation in (LeakyRELU, RELU, Sigmoid, Softmax):
+        for size in VECTOR_SIZES:
+            z = np.random.randn(size)
+            batch_z = np.random.randn(BATCH_SIZE, size)
+            prefix = activation.__name__ + "/"
+            name = shape_name(size)
+
+            yield prefix + "func/" + name, lambda: activation.func(z.copy())
+            yield prefix + "func_deriv/" + name, lambda: activation.func_deriv(z.copy())
+            yield prefix + "batch_func/" + shape_name((BATCH_SIZE, size)), lambda: activation.batch_func(batch_z)
+            yield (prefix + "batch_func_deriv/" + shape_name((BATCH_SIZE, size)),
+                   lambda: activation.batch_func_deriv(batch_z))
+
+    for activation in (fn.Sigmoid, fn.TanH, fn.ReLU, fn.LeakyReLU, fn.SoftMax):
+        for size in VECTOR_SIZES:
+            z = np.random.randn(size)
+            prefix = "fullyconnected." + activation.__name__ + "/"
+            yield prefix + "func/" + shape_name(size), lambda: activation.func(z.copy())
+            yield prefix + "func_deriv/" + shape_name(size), lambda: activation.func_deriv(z.copy())
+
+# Yields (name, function) for every cost function benchmark
+# The cost functions of the fully connected net take their arguments to delta in another order
+def cost_benchmarks():
+    cost_functions = [("", cost_function, False) for cost_function in (QuadraticCost, NegativeLogLikelihood)]
+    cost_functions += [("fullyconnected.", cost_function, True)
+                       for cost_function in (fn.QuadraticCost, fn.CrossEntropy, fn.NegativeLogLikelihood)]
+    for prefix, cost_function, derivative_last in cost_functions:
+        prefix += cost_function.__name__ + "/"
+        for size in VECTOR_SIZES:
+            outputs = np.random.dirichlet(np.ones(size), BATCH_SIZE)
+            expected = np.eye(size)[np.random.randint(size, size=BATCH_SIZE)]
+            derivatives = np.random.rand(BATCH_SIZE, size)
+            delta_args = (outputs, expected, derivatives) if derivative_last else (outputs, derivatives, expected)
+            name = shape_name(size)
+            batch_name = shape_name((BATCH_SIZE, size))
+
+            yield prefix + "cost/" + name, lambda: cost_function.cost(outputs[0], expected[0])
+            yield prefix + "batch_cost/" + batch_name, lambda: cost_function.batch_cost(outputs, expected)
+            yield prefix + "delta/" + name, lambda: cost_function.delta(*[arg[0] for arg in delta_args])
+            yield prefix + "batch_delta/" + batch_name, lambda: cost_function.batch_delta(*delta_args)
+
+# Every group of benchmarks, by name
+GROUPS = [("kernel", kernel_benchmarks),
+          ("conv", conv_benchmarks),
+          ("deconv", deconv_benchmarks),
+          ("dense", dense_benchmarks),
+          ("recurrent", recurrent_benchmarks),
+          ("activation", activation_benchmarks),
+          ("cost", cost_benchmarks)]
+
+# Runs the microbenchmarks, returning a dictionary from benchmark name to measurement (see timing.py)
+# The inputs are drawn from a fixed seed, so every run times the same work
+# Args:
+#   name_filter (string) optional - only run benchmarks whose name contains this
+#   repeat (int) - number of timed runs per benchmark
+#   min_time (float) - minimum duration of one run in seconds
+#   report (function) optional - called with (name, measurement) after every benchmark
+def run_layer_benchmarks(name_filter=None, repeat=5, min_time=0.02, report=None):
+    np.random.seed(0)
+    results = {}
+    for group, benchmarks in GROUPS:
+        for name, function in benchmarks():
+            if name_filter is not None and name_filter not in name:
+                continue
+            results[name] = measure(function, repeat, min_time)
+            if report is not None:
+                report(name, results[name])
+    return results
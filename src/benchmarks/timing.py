@@ -0,0 +1,85 @@
+import json
+import platform
+import time
+import timeit
+
+import numpy as np
+
+# Timing, storing, and comparing benchmark results
+#
+# Results are a dictionary from a benchmark name to its measurement, written as JSON together with the
+# versions they were measured with:
+#   {"python": ..., "numpy": ..., "created": ..., "results": {name: {"best": ..., "median": ..., ...}}}
+# Times are in seconds per call, "best" (the fastest run) is the least noisy and is what comparisons use
+
+# Largest number of calls per run when calibrating very fast functions
+MAX_CALLS = 100000
+
+# Times a function, returning {"best": seconds per call, "median": seconds per call, "calls": calls per run}
+# The number of calls per run is chosen so one run takes at least min_time
+# Args:
+#   function - called without arguments
+#   repeat (int) - number of runs
+#   min_time (float) - minimum duration of one run in seconds
+def measure(function, repeat=5, min_time=0.02):
+    # The first call also warms up caches (and loads anything lazy)
+    start = timeit.default_timer()
+    function()
+    single = timeit.default_timer() - start
+    number = int(min(MAX_CALLS, max(1, min_time / max(single, 1e-9))))
+
+    per_call = []
+    for r in range(repeat):
+        start = timeit.default_timer()
+        for n in range(number):
+            function()
+        per_call.append((timeit.default_timer() - start) / number)
+    return {"best": min(per_call), "median": float(np.median(per_call)), "calls": number}
+
+# Writes results to a JSON file
+# Args:
+#   filename (string) - path of the file
+#   results (dictionary) - benchmark name to measurement
+def write_results(filename, results):
+    document = {"python": platform.python_version(),
+                "numpy": np.__version__,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results}
+    results_file = open(filename, "w")
+    json.dump(document, results_file, indent=2, sort_keys=True)
+    results_file.close()
+
+# Returns the results stored in a JSON file by write_results
+def read_results(filename):
+    results_file = open(filename)
+    document = json.load(results_file)
+    results_file.close()
+    return document["results"]
+
+# Compares results against a baseline, returning a list of (name, baseline, current, ratio) for every
+# benchmark that got slower than the baseline by more than threshold (0.1 is 10% slower), slowest first
+# Benchmarks missing from either side are not compared
+# Args:
+#   results, baseline (dictionaries) - benchmark name to measurement
+#   threshold (float) - allowed slowdown as a fraction of the baseline
+#   key (string) - which measurement to compare
+def find_regressions(results, baseline, threshold=0.1, key="best"):
+    regressions = []
+    for name, measurement in results.items():
+        if name not in baseline or key not in measurement or key not in baseline[name]:
+            continue
+        before = baseline[name][key]
+        after = measurement[key]
+        if before > 0 and after > before * (1 + threshold):
+            regressions.append((name, before, after, after / before))
+    return sorted(regressions, key=lambda regression: -regression[3])
+
+# Prints results as a table, with the change against a baseline if one is given
+def print_results(results, baseline=None, key="best"):
+    width = max([len(name) for name in results] + [len("benchmark")])
+    print("%-*s  %12s  %8s" % (width, "benchmark", "us/call", "change"))
+    for name in sorted(results):
+        line = "%-*s  %12.2f" % (width, name, results[name][key]*1e6)
+        if baseline is not None and name in baseline and baseline[name].get(key):
+            line += "  %+7.1f%%" % ((results[name][key] / baseline[name][key] - 1) * 100)
+        print(line)
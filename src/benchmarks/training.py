@@ -0,0 +1,200 @@
+from neuralnets import ConvolutionalNet
+from neuralnets import RecurrentNet
+from neuralnets import GAN
+
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+
+# End to end training benchmarks
+#
+# Each workload trains one network type the way its test script does (convtest.py, densetest.py,
+# recurrtest.py, gantest.py), but for a fixed number of epochs on a fixed amount of data and with
+# every random number generator seeded, so every run does the same work. A workload reports:
+#   "examples_per_second" - training examples (forward and backward passes) per second, in the fastest run
+#   "seconds_per_epoch" - wall time of one epoch (one round for the GAN) in the fastest run, which is what
+#                         baselines are compared on
+#   "median_seconds_per_epoch" - the same in the median run
+#   "repeat" - number of runs, each one builds and trains the workload again from the same seed
+#   "peak_rss_kb" - peak resident memory of the process running the workload
+#   "final_loss" - running average cost of the last epoch (of the generator for the GAN)
+#   "epochs", "examples" - the amount of work done
+# Workloads normally run in a fresh interpreter each, so the peak memory of one does not include another
+
+# Seed of every workload
+SEED = 0
+
+# Collects the reports of a training loop instead of printing them
+class ReportLog:
+    def __init__(self):
+        self.reports = []
+
+    def __call__(self, report):
+        self.reports.append(report)
+
+    # Returns the cost of the last report from the given network ("" for a standalone network)
+    def final_cost(self, network=""):
+        costs = [report["cost"] for report in self.reports if report.get("network", "") == network]
+        return costs[-1] if costs else float("nan")
+
+# Returns the nine pixel images and one hot labels of convtest.py
+def conv_patterns():
+    rows = [[[1, 1, 1], [1, 1, 1], [1, 1, 1]],
+            [[1, 1, 1], [1, 1, 1], [1, 1, 0]],
+            [[1, 0, 1], [1, 1, 1], [1, 1, 0]],
+            [[1, 0, 1], [1, 1, 0], [1, 1, 0]],
+            [[1, 0, 1], [1, 0, 0], [1, 1, 0]],
+            [[0, 0, 0], [0, 0, 1], [1, 1, 0]]]
+    return np.array(rows, dtype=float)[:, None], np.eye(6)[::-1]
+
+# The conv, deconv, dense, and softmax stack of convtest.py
+def conv_workload(epochs=3, num_examples=240):
+    images, labels = conv_patterns()
+    inputs = [images[x % 6] for x in range(num_examples)]
+    outputs = [labels[x % 6] for x in range(num_examples)]
+
+    cnn = ConvolutionalNet(input_shape=(1, 3, 3))
+    cnn.addlayer(layer_type="conv", output_size=None, kernel_size=(3, 2, 2))
+    cnn.addlayer(layer_type="deconv", output_size=(3, 3), kernel_size=(1, 2, 2))
+    cnn.addlayer(layer_type="deconv", output_size=(5, 5), kernel_size=(3, 2, 2))
+    cnn.addlayer(layer_type="dense", output_size=10)
+    cnn.addlayer(layer_type="soft", output_size=6)
+
+    log = ReportLog()
+    def train():
+        cnn.stochastic_gradient_descent(epochs=epochs, step_size=0.001, mini_batch_size=80, training_inputs=inputs,
+                                        expected_outputs=outputs, is_momentum_based=True, friction=0.8,
+                                        progress=log)
+    return train, epochs, epochs*num_examples, log.final_cost
+
+# The three bit to eight class multilayer perceptron of densetest.py
+def dense_workload(epochs=5, num_examples=1000):
+    patterns = np.array([[(x >> 2) & 1, (x >> 1) & 1, x & 1] for x in range(8)], dtype=float)
+    inputs = [patterns[x % 8] for x in range(num_examples)]
+    outputs = [np.eye(8)[x % 8] for x in range(num_examples)]
+
+    mlp = ConvolutionalNet(input_shape=3)
+    mlp.addlayer(layer_type="dense", output_size=20)
+    mlp.addlayer(layer_type="soft", output_size=8)
+
+    log = ReportLog()
+    def train():
+        mlp.stochastic_gradient_descent(epochs=epochs, step_size=0.01, mini_batch_size=80, training_inputs=inputs,
+                                        expected_outputs=outputs, is_momentum_based=True, friction=0.9,
+                                        progress=log)
+    return train, epochs, epochs*num_examples, log.final_cost
+
+# The character level recurrent net of recurrtest.py
+def recurrent_workload(epochs=20, repeats=8):
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+    text = alphabet*repeats
+    one_hot = np.eye(len(alphabet))
+    codes = [alphabet.index(letter) for letter in text]
+    training_set = [(one_hot[curr], one_hot[nxt]) for curr, nxt in zip(codes[:-1], codes[1:])]
+
+    rnn = RecurrentNet(len(alphabet))
+    rnn.add("recurr", 40)
+    rnn.add("recurr", 30)
+    rnn.add("soft", len(alphabet))
+
+    log = ReportLog()
+    def train():
+        rnn.stochastic_gradient_descent(epochs=epochs, step_size=0.01, mini_batch_size=len(alphabet),
+                                        training_set=training_set, progress=log)
+    return train, epochs, epochs*len(training_set), log.final_cost
+
+# The GAN loop of gantest.py
+def gan_workload(rounds=2, num_examples=200, discriminator_epochs=2, generator_epochs=2):
+    gan = GAN(image_shape=(1, 3, 3), generator_input_shape=(1, 2, 2), discriminator_output_shape=2)
+    gan.add_layer_to_generator("deconv", (3, 3), (1, 2, 2))
+    gan.add_layer_to_discriminator("conv", None, (3, 2, 2))
+    gan.add_layer_to_discriminator("dense", 10)
+    gan.add_layer_to_discriminator("soft", 2)
+
+    images, labels = conv_patterns()
+    real_images = np.array([images[i % 6] for i in range(num_examples)])
+    noise_set = [(n, np.array([1, 0])) for n in np.random.randn(num_examples, 1, 2, 2)]
+
+    log = ReportLog()
+    def train():
+        gan.train(rounds=rounds, real_images=real_images, noise_set=noise_set, real_output=np.array([1, 0]),
+                  fake_output=np.array([0, 1]), buffer_capacity=num_examples, discriminator_epochs=discriminator_epochs,
+                  generator_epochs=generator_epochs, mini_batch_size=50, progress=log)
+    # The discriminator trains on the real images and the full buffer, the generator on the noise
+    examples = rounds*(discriminator_epochs*2*num_examples + generator_epochs*num_examples)
+    return train, rounds, examples, lambda: log.final_cost("Generator")
+
+# Every workload by name, each returns (train function, epochs, examples, final loss function)
+WORKLOADS = [("conv", conv_workload),
+             ("dense", dense_workload),
+             ("recurrent", recurrent_workload),
+             ("gan", gan_workload)]
+
+# Builds and trains one workload in this process repeat times, returning its measurements (see the top of the file)
+# Args:
+#   name (string) - name of the workload
+#   repeat (int) - number of runs
+def run_workload(name, repeat=5):
+    times = []
+    for r in range(repeat):
+        np.random.seed(SEED)
+        random.seed(SEED)
+        train, epochs, examples, final_loss = dict(WORKLOADS)[name]()
+
+        start = timeit.default_timer()
+        train()
+        times.append(timeit.default_timer() - start)
+
+    return {"examples_per_second": examples / min(times),
+            "seconds_per_epoch": min(times) / epochs,
+            "median_seconds_per_epoch": float(np.median(times)) / epochs,
+            "repeat": repeat,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "final_loss": final_loss(),
+            "epochs": epochs,
+            "examples": examples}
+
+# Runs one workload in a fresh interpreter and returns its measurements
+def run_isolated(name, repeat=5):
+    source_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, "-c",
+               "import json; from benchmarks.training import run_workload; "
+               "print(json.dumps(run_workload(%r, %d)))" % (name, repeat)]
+    output = subprocess.check_output(command, cwd=source_directory)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+# Runs the training workloads, returning a dictionary from "training/<workload>" to its measurements
+# Args:
+#   names (list of strings) optional - which workloads to run, all of them if None
+#   isolate (bool) - run every workload in a fresh interpreter (for a meaningful peak memory)
+#   report (function) optional - called with (name, measurements) after every workload
+#   repeat (int) - number of runs of every workload
+def run_training_benchmarks(names=None, isolate=True, report=None, repeat=5):
+    results = {}
+    for name, workload in WORKLOADS:
+        if names is not None and name not in names:
+            continue
+        results["training/" + name] = run_isolated(name, repeat) if isolate else run_workload(name, repeat)
+        if report is not None:
+            report("training/" + name, results["training/" + name])
+    return results
+
+# Prints training results as a table, with the change in time per epoch against a baseline if one is given
+def print_training_results(results, baseline=None):
+    width = max([len(name) for name in results] + [len("workload")])
+    print("%-*s  %12s  %10s  %10s  %10s  %8s" % (width, "workload", "examples/s", "s/epoch", "peak MB",
+                                                "final loss", "change"))
+    for name in sorted(results):
+        result = results[name]
+        line = "%-*s  %12.1f  %10.3f  %10.1f  %10.4f" % (width, name, result["examples_per_second"],
+                                                         result["seconds_per_epoch"], result["peak_rss_kb"]/1024.0,
+                                                         result["final_loss"])
+        if baseline is not None and name in baseline:
+            line += "  %+7.1f%%" % ((result["seconds_per_epoch"] / baseline[name]["seconds_per_epoch"] - 1) * 100)
+        print(line)
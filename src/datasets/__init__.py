@@ -0,0 +1,7 @@
+from array_dataset import ArrayDataset
+from array_dataset import from_examples
+from stream import Stream
+from stream import training_data
+from sharded import ShardedDataset
+from sharded import write_shards
+from sharded import load_shards
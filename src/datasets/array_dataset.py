@@ -0,0 +1,38 @@
+import numpy as np
+
+# Training examples held in memory as two contiguous arrays, one of inputs and one of targets
+# Minibatches are gathered with one fancy index per array instead of copying lists of tuples
+class ArrayDataset:
+    # Args:
+    #   inputs (np array or list) - (num examples,) + input shape
+    #   targets (np array or list) - (num examples,) + target shape
+    def __init__(self, inputs, targets):
+        self.inputs = np.ascontiguousarray(inputs, dtype=float)
+        self.targets = np.ascontiguousarray(targets, dtype=float)
+        if len(self.inputs) != len(self.targets):
+            raise ValueError("%d inputs but %d targets" % (len(self.inputs), len(self.targets)))
+        self.input_shape = self.inputs.shape[1:]
+        self.target_shape = self.targets.shape[1:]
+
+    def __len__(self):
+        return len(self.inputs)
+
+    # Returns one (input, target) example
+    def __getitem__(self, index):
+        return self.inputs[index], self.targets[index]
+
+    def __iter__(self):
+        return iter(zip(self.inputs, self.targets))
+
+    # Returns the (inputs, targets) arrays of the examples at the given indices
+    # Args:
+    #   indices (1D np array of ints) - indices of the examples, in the order they should be returned
+    #                                   (IndexError if one is out of range)
+    #   inputs_out, targets_out (np arrays) optional - contiguous arrays to write the examples into
+    def gather(self, indices, inputs_out=None, targets_out=None):
+        return (np.take(self.inputs, indices, axis=0, out=inputs_out),
+                np.take(self.targets, indices, axis=0, out=targets_out))
+
+# Returns an ArrayDataset of a list of (input, target) examples
+def from_examples(examples):
+    return ArrayDataset([inp for inp, target in examples], [target for inp, target in examples])
@@ -0,0 +1,90 @@
+import numpy as np
+import os
+
+# Training examples kept on disk as .npy shards that are memory mapped
+# Shard i is inputs_<i>.npy, (num examples,) + input shape (for images: (N, depth, height, length)),
+# and targets_<i>.npy, (num examples,) + target shape. Examples are read by index, so training only
+# touches the pages of the examples in the current minibatch.
+class ShardedDataset:
+    # Args:
+    #   input_files (list of strings) - paths of the input shards
+    #   target_files (list of strings) - paths of the target shards, with the same number of examples as the inputs
+    def __init__(self, input_files, target_files):
+        if not input_files or len(input_files) != len(target_files):
+            raise ValueError("Need at least one shard and as many target shards as input shards, got %d and %d"
+                             % (len(input_files), len(target_files)))
+        self.inputs = [np.load(f, mmap_mode="r") for f in input_files]
+        self.targets = [np.load(f, mmap_mode="r") for f in target_files]
+        for inputs, targets in zip(self.inputs, self.targets):
+            if len(inputs) != len(targets):
+                raise ValueError("Shard has %d inputs but %d targets" % (len(inputs), len(targets)))
+
+        # Index of the first example of every shard, and the total number of examples at the end
+        self.offsets = np.cumsum([0] + [len(s) for s in self.inputs])
+        self.input_shape = self.inputs[0].shape[1:]
+        self.target_shape = self.targets[0].shape[1:]
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    # Returns one (input, target) example
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        shard = np.searchsorted(self.offsets, index, side="right") - 1
+        local = index - self.offsets[shard]
+        return np.asarray(self.inputs[shard][local], dtype=float), np.asarray(self.targets[shard][local], dtype=float)
+
+    def __iter__(self):
+        for inputs, targets in zip(self.inputs, self.targets):
+            for inp, target in zip(inputs, targets):
+                yield np.asarray(inp, dtype=float), np.asarray(target, dtype=float)
+
+    # Returns the (inputs, targets) arrays of the examples at the given indices, reading each shard once
+    # Args:
+    #   indices (1D np array of ints) - indices of the examples, in the order they should be returned
+    #   inputs_out, targets_out (np arrays) optional - arrays to write the examples into
+    def gather(self, indices, inputs_out=None, targets_out=None):
+        indices = np.asarray(indices)
+        if inputs_out is None:
+            inputs_out = np.empty((len(indices),) + self.input_shape)
+        if targets_out is None:
+            targets_out = np.empty((len(indices),) + self.target_shape)
+
+        shards = np.searchsorted(self.offsets, indices, side="right") - 1
+        for shard in np.unique(shards):
+            positions = np.nonzero(shards == shard)[0]
+            local = indices[positions] - self.offsets[shard]
+            # Reading the rows in file order keeps the page accesses sequential
+            by_row = np.argsort(local)
+            inputs_out[positions[by_row]] = self.inputs[shard][local[by_row]]
+            targets_out[positions[by_row]] = self.targets[shard][local[by_row]]
+        return inputs_out, targets_out
+
+# Writes inputs and targets into .npy shards and returns them as a ShardedDataset
+# The shards keep the dtype of the arrays (uint8 images stay a byte per value), examples are read as floats
+# Args:
+#   directory (string) - where the shards are written (created if needed)
+#   inputs (np array) - (num examples,) + input shape
+#   targets (np array) - (num examples,) + target shape
+#   shard_size (int) - number of examples per shard
+def write_shards(directory, inputs, targets, shard_size):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    input_files = []
+    target_files = []
+    for i, start in enumerate(range(0, len(inputs), shard_size)):
+        input_files.append(os.path.join(directory, "inputs_%05d.npy" % i))
+        target_files.append(os.path.join(directory, "targets_%05d.npy" % i))
+        np.save(input_files[-1], np.asarray(inputs[start:start+shard_size]))
+        np.save(target_files[-1], np.asarray(targets[start:start+shard_size]))
+    return ShardedDataset(input_files, target_files)
+
+# Opens the shards written by write_shards in a directory
+def load_shards(directory):
+    names = sorted(os.listdir(directory))
+    input_files = [os.path.join(directory, n) for n in names if n.startswith("inputs_") and n.endswith(".npy")]
+    target_files = [os.path.join(directory, n) for n in names if n.startswith("targets_") and n.endswith(".npy")]
+    if not input_files:
+        raise ValueError("No shards in %s" % directory)
+    return ShardedDataset(input_files, target_files)
@@ -0,0 +1,95 @@
+from array_dataset import ArrayDataset
+from array_dataset import from_examples
+
+from itertools import islice
+import threading
+import numpy as np
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+# Marks the end of the minibatches on the queue
+END = object()
+
+# Training examples read from any iterable, assembled into minibatches ahead of training
+# A background thread pulls examples from the source and stacks them into contiguous (inputs, outputs)
+# arrays, keeping up to prefetch minibatches ready, so reading and decoding examples overlaps with
+# training and the whole training set never has to be in memory. Examples are visited in the order the
+# source yields them.
+class Stream:
+    # Args:
+    #   source - a function returning a new iterator over (input, expected output) examples every time it is
+    #            called, or an iterable of them (a generator can only be read for one epoch)
+    #   prefetch (int) - number of minibatches assembled ahead
+    #   size (int) optional - number of examples per epoch, if known
+    def __init__(self, source, prefetch=4, size=None):
+        self.source = source
+        self.prefetch = prefetch
+        self.size = size
+
+    # Returns a new iterator over the examples of the source
+    def __iter__(self):
+        if callable(self.source):
+            return iter(self.source())
+        return iter(self.source)
+
+    # Yields (inputs, outputs) minibatch arrays, (batch size,) + input shape and (batch size,) + output shape
+    # Args:
+    #   mini_batch_size (int) - number of examples per minibatch (the last one may be smaller)
+    #   skip (int) - number of examples to skip first (to resume part way through an epoch)
+    def batches(self, mini_batch_size, skip=0):
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        worker = threading.Thread(target=self.assemble, args=(mini_batch_size, skip, ready, stop))
+        worker.daemon = True
+        worker.start()
+
+        try:
+            while True:
+                item = ready.get()
+                if item is END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            worker.join()
+
+    # Reads the source and puts minibatches on the ready queue (runs on the worker thread)
+    def assemble(self, mini_batch_size, skip, ready, stop):
+        try:
+            examples = islice(iter(self), skip, None)
+            while not stop.is_set():
+                chunk = list(islice(examples, mini_batch_size))
+                if len(chunk) == 0:
+                    break
+                inputs = np.array([inp for inp, outp in chunk], dtype=float)
+                outputs = np.array([outp for inp, outp in chunk], dtype=float)
+                if not put(ready, (inputs, outputs), stop):
+                    return
+            put(ready, END, stop)
+        except Exception as e:
+            put(ready, e, stop)
+
+# Puts an item on a bounded queue, giving up if stop is set while waiting for room
+def put(ready, item, stop):
+    while not stop.is_set():
+        try:
+            ready.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+# Returns training data the training loops can use: lists and tuples of (input, expected output) examples
+# are packed into an ArrayDataset, Streams and anything else with a length that can be indexed (such as a
+# ShardedDataset) are returned as they are, and any other iterable of examples is wrapped in a Stream
+def training_data(data):
+    if isinstance(data, (list, tuple)):
+        return from_examples(data)
+    if isinstance(data, (Stream, ArrayDataset)) or (hasattr(data, "__len__") and hasattr(data, "__getitem__")):
+        return data
+    return Stream(data)
@@ -4,4 +4,11 @@ from activation_functions import Sigmoid
 from activation_functions import RELU
 
 from cost_functions import QuadraticCost
-from cost_functions import NegativeLogLikelihood
\ No newline at end of file
+from cost_functions import NegativeLogLikelihood
+from cost_functions import reduce_costs
+from cost_functions import weight_deltas
+
+from regularizers import L1
+from regularizers import L2
+from regularizers import ElasticNet
+from regularizers import make_regularizer
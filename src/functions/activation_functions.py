@@ -16,6 +16,11 @@ class LeakyRELU:
             z[i] = LeakyRELU.func(zi)
         return z
 
+    # Vectorized function for an array of any shape (returns a new array)
+    @staticmethod
+    def batch_func(z):
+        return np.where(z > 0, z, 0.1*z)
+
     # Derivative for leaky relu
     @staticmethod
     def func_deriv(z):
@@ -27,6 +32,10 @@ class LeakyRELU:
             z[i] = LeakyRELU.func_deriv(zi)
         return z
 
+    @staticmethod
+    def batch_func_deriv(z):
+        return np.where(z > 0, 1.0, 0.1)
+
 class RELU:
     # function
     @staticmethod
@@ -42,6 +51,11 @@ class RELU:
             z[i] = RELU.func(zi)
         return z
 
+    # Vectorized function for an array of any shape (returns a new array)
+    @staticmethod
+    def batch_func(z):
+        return np.where(z > 0, z, 0.0)
+
     # Derivative for leaky relu
     @staticmethod
     def func_deriv(z):
@@ -53,6 +67,10 @@ class RELU:
             z[i] = RELU.func_deriv(zi)
         return z
 
+    @staticmethod
+    def batch_func_deriv(z):
+        return np.where(z > 0, 1.0, 0.0)
+
 class Sigmoid:
     # function
     @staticmethod
@@ -62,7 +80,7 @@ class Sigmoid:
                 return 0.999999999
             elif z < -15:
                 return 0.000000001
-            return np.exp(z)
+            return 1.0/(1.0+np.exp(-z))
         elif z.dtype == np.int:
             z = np.asfarray(z, dtype='float')
 
@@ -80,6 +98,16 @@ class Sigmoid:
             z[i] = Sigmoid.func_deriv(zi)
         return z
 
+    # Vectorized function for an array of any shape (returns a new array)
+    @staticmethod
+    def batch_func(z):
+        return 1.0/(1.0+np.exp(-np.clip(z, -15, 15)))
+
+    @staticmethod
+    def batch_func_deriv(z):
+        z = Sigmoid.batch_func(z)
+        return z*(1-z)
+
 # Softmax function
 class Softmax:
     # used to raise powers to e
@@ -105,3 +133,14 @@ class Softmax:
     def func_deriv(z):
         z = Softmax.func(z)
         return z*(1-z)
+
+    # Vectorized softmax over the last axis, so a (batch size, num neurons) array is squashed row by row
+    @staticmethod
+    def batch_func(z):
+        z = np.exp(z - np.max(z, axis=-1, keepdims=True))
+        return z / np.sum(z, axis=-1, keepdims=True)
+
+    @staticmethod
+    def batch_func_deriv(z):
+        z = Softmax.batch_func(z)
+        return z*(1-z)
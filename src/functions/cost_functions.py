@@ -1,10 +1,69 @@
 import numpy as np
 
+# Every cost function takes either one network output at a time (cost and delta) or a whole batch of them with
+# the batch on the first axis (batch_cost and batch_delta). The batched methods take optional sample weights,
+# one per example. batch_delta is delta for every example of the batch, with the deltas of every example scaled
+# by its weight, and batch_cost reduces the costs of the examples as asked:
+#   "none" - the (weighted) cost of every example, (batch size,)
+#   "sum" - the sum of the (weighted) costs
+#   "mean" - the weighted mean of the costs (the sum of the weighted costs over the sum of the weights)
+REDUCTIONS = ("none", "sum", "mean")
+
+# Returns a batch of network outputs and the expected outputs as 2D float arrays, (batch size, num outputs)
+# The expected output can be a single output shared by the whole batch
+def flatten_batch(network_output, expected_output):
+    network_output = np.asarray(network_output, dtype=float)
+    expected_output = np.broadcast_to(np.asarray(expected_output, dtype=float), network_output.shape)
+    return network_output.reshape(len(network_output), -1), expected_output.reshape(len(network_output), -1)
+
+# Weights and reduces the costs of the examples of a batch
+# Args:
+#   costs (1D np arr) - the cost of every example
+#   reduction (string) - "none", "sum" or "mean"
+#   sample_weights (1D np arr) optional - the weight of every example
+def reduce_costs(costs, reduction="none", sample_weights=None):
+    if reduction not in REDUCTIONS:
+        raise ValueError("Unknown reduction %r, expected one of %s" % (reduction, ", ".join(REDUCTIONS)))
+    if sample_weights is not None:
+        sample_weights = np.asarray(sample_weights, dtype=float)
+        costs = costs*sample_weights
+
+    if reduction == "none":
+        return costs
+    if reduction == "sum":
+        return np.sum(costs)
+    total_weight = len(costs) if sample_weights is None else np.sum(sample_weights)
+    if total_weight == 0:
+        return float("nan")
+    return np.sum(costs)/float(total_weight)
+
+# Returns a batch of deltas with the deltas of every example scaled by its weight
+# Args:
+#   deltas (np arr) - (batch size, ...)
+#   sample_weights (1D np arr) optional - the weight of every example
+def weight_deltas(deltas, sample_weights=None):
+    if sample_weights is None:
+        return deltas
+    sample_weights = np.asarray(sample_weights, dtype=float)
+    return deltas*sample_weights.reshape((len(sample_weights),) + (1,)*(deltas.ndim-1))
+
 # Quadratic cost function
 class QuadraticCost:
     @staticmethod
     def cost (network_output, expected_output):
-        return sum(0.5*(np.power(network_output-expected_output, 2)))
+        return 0.5*np.sum(np.power(network_output-expected_output, 2))
+
+    # Returns the costs of a batch, see the top of the file
+    # Args:
+    #   network_output, expected_output (np arrs) - with the batch on the first axis, the expected output can
+    #                                               also be one output for the whole batch
+    #   reduction (string) - "none", "sum" or "mean"
+    #   sample_weights (1D np arr) optional - the weight of every example
+    @staticmethod
+    def batch_cost(network_output, expected_output, reduction="none", sample_weights=None):
+        network_output, expected_output = flatten_batch(network_output, expected_output)
+        diff = network_output - expected_output
+        return reduce_costs(0.5*np.sum(diff*diff, axis=1), reduction, sample_weights)
 
     @staticmethod
     def delta (network_output, z_activation_deriv, expected_output):
@@ -12,16 +71,35 @@ class QuadraticCost:
             expected_output = np.asfarray(expected_output, dtype='float')
         return 0.5*(np.power(network_output-expected_output, 2)*z_activation_deriv)
 
+    @staticmethod
+    def batch_delta(network_output, z_activation_deriv, expected_output, sample_weights=None):
+        delta = QuadraticCost.delta(network_output, z_activation_deriv, np.asarray(expected_output, dtype=float))
+        return weight_deltas(delta, sample_weights)
+
 # Optimized with softmax
 class NegativeLogLikelihood:
     # returns the KL divergence
     @staticmethod
     def cost (network_output, expected_output):
-        totalsum = 0.0
-        for no, eo in zip(network_output,expected_output):
-            if eo > 0:
-                totalsum -= eo*np.log((no+0.0)/(eo+0.0))
-        return totalsum
+        network_output = np.asarray(network_output, dtype=float)
+        expected_output = np.asarray(expected_output, dtype=float)
+        positive = expected_output > 0
+        return -np.sum(expected_output[positive]*np.log(network_output[positive]/expected_output[positive]))
+
+    # Returns the costs of a batch, see the top of the file
+    # Args:
+    #   network_output, expected_output (np arrs) - with the batch on the first axis, the expected output can
+    #                                               also be one output for the whole batch
+    #   reduction (string) - "none", "sum" or "mean"
+    #   sample_weights (1D np arr) optional - the weight of every example
+    @staticmethod
+    def batch_cost(network_output, expected_output, reduction="none", sample_weights=None):
+        network_output, expected_output = flatten_batch(network_output, expected_output)
+        positive = expected_output > 0
+        # Outputs where nothing is expected do not count, so keep them out of the log
+        ratio = np.where(positive, network_output, 1.0) / np.where(positive, expected_output, 1.0)
+        costs = -np.sum(np.where(positive, expected_output*np.log(ratio), 0.0), axis=1)
+        return reduce_costs(costs, reduction, sample_weights)
 
     @staticmethod
     def delta (network_output, z_activation_deriv, expected_output):
@@ -30,3 +108,8 @@ class NegativeLogLikelihood:
         return network_output-expected_output
         #return -(expected_output/network_output)*z_activation_deriv
 
+    @staticmethod
+    def batch_delta(network_output, z_activation_deriv, expected_output, sample_weights=None):
+        delta = NegativeLogLikelihood.delta(network_output, z_activation_deriv,
+                                            np.asarray(expected_output, dtype=float))
+        return weight_deltas(delta, sample_weights)
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Weight regularizers
+#
+# A regularizer adds a penalty on the weights of a network (never on its biases) to the cost, and after every
+# update shrinks the weights by the gradient of that penalty. Every method works on whole arrays, and apply
+# changes the weights in place.
+# Args of the methods:
+#   weights - an iterable of np arrays, the weights of the network
+#   step_size (float) - the step size of the update
+#   training_set_size (int) - number of training examples, the penalty is spread over all of them
+
+# L1 regularization, the penalty is lmbda/n * sum(|w|)
+class L1:
+    def __init__(self, lmbda):
+        self.lmbda = lmbda
+
+    # Returns the penalty added to the cost
+    def cost(self, weights, training_set_size):
+        return self.lmbda/float(training_set_size) * sum(np.sum(np.abs(w)) for w in weights)
+
+    # Moves every weight towards 0 by step_size*lmbda/n
+    def apply(self, weights, step_size, training_set_size):
+        shrink = step_size*self.lmbda/float(training_set_size)
+        for w in weights:
+            w -= shrink*np.sign(w)
+
+# L2 regularization (weight decay), the penalty is lmbda/2n * sum(w^2)
+class L2:
+    def __init__(self, lmbda):
+        self.lmbda = lmbda
+
+    # Returns the penalty added to the cost
+    def cost(self, weights, training_set_size):
+        return self.lmbda/(2.0*training_set_size) * sum(np.vdot(w, w) for w in weights)
+
+    # Scales every weight by 1 - step_size*lmbda/n
+    def apply(self, weights, step_size, training_set_size):
+        decay = 1 - step_size*self.lmbda/float(training_set_size)
+        for w in weights:
+            w *= decay
+
+# Elastic net regularization, the sum of an L1 and an L2 penalty
+class ElasticNet:
+    def __init__(self, l1_lmbda, l2_lmbda):
+        self.l1 = L1(l1_lmbda)
+        self.l2 = L2(l2_lmbda)
+
+    # Returns the penalty added to the cost
+    def cost(self, weights, training_set_size):
+        weights = list(weights)
+        return self.l1.cost(weights, training_set_size) + self.l2.cost(weights, training_set_size)
+
+    # Shrinks every weight by both penalties
+    def apply(self, weights, step_size, training_set_size):
+        weights = list(weights)
+        self.l2.apply(weights, step_size, training_set_size)
+        self.l1.apply(weights, step_size, training_set_size)
+
+# Returns the regularizer for a regularization type
+# Args:
+#   regularization_type - None, "L1", "L2", or a regularizer (returned as it is)
+#   lmbda (float) - the regularization parameter for "L1" and "L2"
+def make_regularizer(regularization_type, lmbda):
+    if regularization_type is None:
+        return None
+    if regularization_type == "L1":
+        return L1(lmbda)
+    if regularization_type == "L2":
+        return L2(lmbda)
+    if hasattr(regularization_type, "apply"):
+        return regularization_type
+    raise ValueError("Unknown regularization type %r" % (regularization_type,))
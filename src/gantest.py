@@ -19,20 +19,24 @@ inp = [np.array([np.array([np.array([1, 1, 1]), np.array([1, 1, 1]), np.array([1
        np.array([np.array([np.array([0, 0, 1]), np.array([1, 0, 1]), np.array([1, 1, 1])])]),
        np.array([np.array([np.array([1, 1, 0]), np.array([0, 1, 0]), np.array([1, 0, 1])])])]
 
-noise = [np.random.randn(1,2,2) for i in range(1000)]
+noise = np.random.randn(1000,1,2,2)
 noise_set = [(n, np.array([1,0])) for n in noise]
-real_images = [(inp[i%10], np.array([1,0])) for i in range(1000)]
+real_images = np.array([inp[i%10] for i in range(1000)])
 
 storenets.save("testsaving", gan)
 
 for x in range (100):
-    generated_images = [(gan.generate_image(n), np.array([0,1])) for n in noise]
-
-    training_set = []
-    training_set.extend(real_images)
-    training_set.extend(generated_images)
-
     print gan.generator_feed_forward(inp[0])
 
-    gan.train_discriminator(5, 0.0001, 50, training_set)
-    gan.train_generator(20, 0.0002, 50, noise_set)
+    gan.train(rounds=1,
+              real_images=real_images,
+              noise_set=noise_set,
+              real_output=np.array([1,0]),
+              fake_output=np.array([0,1]),
+              buffer_capacity=1000,
+              refresh_fraction=0.25,
+              discriminator_epochs=5,
+              discriminator_step_size=0.0001,
+              generator_epochs=20,
+              generator_step_size=0.0002,
+              mini_batch_size=50)
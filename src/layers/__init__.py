@@ -3,4 +3,7 @@ from deconv_layer import DeconvLayer
 from dense_layer import DenseLayer
 from kernel import Kernel
 from softmax_layer import SoftmaxLayer
-from recurrent_layer import RecurrentLayer
\ No newline at end of file
+from recurrent_layer import RecurrentLayer
+from gru_layer import GRULayer
+from lstm_layer import LSTMLayer
+from lazy import LazyValue
@@ -1,14 +1,33 @@
 import numpy as np
+from numpy.lib.stride_tricks import as_strided
 from kernel import Kernel
 from layer import Layer
+from lazy import lazy_attribute
 
 from functions import LeakyRELU
 from functions import RELU
 
+# Returns a read-only (batch size, depth, out height, out length, kernel height, kernel length) view
+# of every kernel sized window of a batch of images, without copying them
+# Args:
+#   images (4D np arr) - (batch size, image depth, image height, image length)
+#   kernel_height, kernel_length (ints) - size of the window
+def image_windows(images, kernel_height, kernel_length):
+    n, d, h, l = images.shape
+    s = images.strides
+    return as_strided(images,
+                      shape=(n, d, h-kernel_height+1, l-kernel_length+1, kernel_height, kernel_length),
+                      strides=(s[0], s[1], s[2], s[3], s[2], s[3]),
+                      writeable=False)
+
 class ConvLayer(Layer):
+    # May be given as a LazyValue, loaded on first use
+    kernels = lazy_attribute("kernels")
+
     # Args:
     #   input_shape (3 tuple (ints)) - (input depth, input height, input length)
     #   kernel_shape (4 tuple (ints)) - (num kernels, kernel depth, kernel height, kernel length)
+    #   kernels (list of Kernels) optional - the kernels (or a LazyValue producing them)
     def __init__(self, input_shape, kernel_shape, kernels=None, activation_function=RELU):
         super(ConvLayer, self).__init__(input_shape=input_shape,
                                         output_shape=(kernel_shape[0],
@@ -39,6 +58,19 @@ class ConvLayer(Layer):
         new_img = self.getactivations(inputs)
         return self.activation_function.func(new_img)
 
+    # Same as getactivations for a whole batch of images, applying every kernel in one product
+    # Args: inputs (4D np arr) - (batch size, image depth, image height, image length)
+    def getactivations_batch(self, inputs):
+        weights = np.array([k.weights for k in self.kernels])
+        biases = np.array([k.bias for k in self.kernels])
+        windows = image_windows(np.asarray(inputs, dtype=float), self.kernel_shape[2], self.kernel_shape[3])
+        new_imgs = np.tensordot(windows, weights, axes=([1, 4, 5], [1, 2, 3]))
+        return np.transpose(new_imgs, (0, 3, 1, 2)) + biases[:, None, None]
+
+    # Same as feedforward for a whole batch of images
+    def feedforward_batch(self, inputs):
+        return self.activation_function.batch_func(self.getactivations_batch(inputs))
+
     # Returns the kernel errors (weights and biases) and the previous image error
     # Args:
     #   z-activations (3D np arr) - activations for the previous layer
@@ -63,6 +95,24 @@ class ConvLayer(Layer):
 
         return prevDeltas
 
+    # Same as getdeltas for a whole batch, without computing any kernel gradients
+    # The deltas are zero padded and correlated with the flipped kernels in one product
+    # Args:
+    #   d_prev_z_activations (4D np arr) - (batch size,) + input shape, derivatives of the previous activations
+    #   curr_deltas (4D np arr) - (batch size,) + output shape, errors of this layer
+    def getdeltas_batch(self, d_prev_z_activations, curr_deltas):
+        weights = np.array([k.weights for k in self.kernels])
+        kernel_height = self.kernel_shape[2]
+        kernel_length = self.kernel_shape[3]
+
+        n, num_kernels, out_height, out_length = curr_deltas.shape
+        padded_deltas = np.zeros((n, num_kernels, out_height+2*(kernel_height-1), out_length+2*(kernel_length-1)))
+        padded_deltas[:, :, kernel_height-1:kernel_height-1+out_height, kernel_length-1:kernel_length-1+out_length] = curr_deltas
+
+        windows = image_windows(padded_deltas, kernel_height, kernel_length)
+        prevDeltas = np.tensordot(windows, weights[:, :, ::-1, ::-1], axes=([1, 4, 5], [0, 2, 3]))
+        return np.transpose(prevDeltas, (0, 3, 1, 2)) * d_prev_z_activations
+
     # Update the kernels
     # Args:
     #   d_weights (4D np arr) - amount to change kernel weights
@@ -25,6 +25,24 @@ def pad(image, padded_image_shape, input_to_padded):
 def unpad(padded_image, input_image_shape, padded_to_input):
     return pad(padded_image, input_image_shape, padded_to_input)
 
+# Same as pad for a batch of images, moving every pixel with one indexed assignment
+# Args:
+#   images (4D np array) - (batch size, image depth, image height, image length)
+#   padded_image_shape (tuple) - the desired padded image shape (depth, height, length)
+#   input_to_padded (dictionary) - a mapping from a 2D coordinate (input) to a 2D coordinate on the padded image
+def pad_batch(images, padded_image_shape, input_to_padded):
+    padded_images = np.zeros((len(images),) + tuple(padded_image_shape))
+    incoords = list(input_to_padded.keys())
+    outcoords = [input_to_padded[c] for c in incoords]
+    in_y, in_x = np.array(incoords).T
+    out_y, out_x = np.array(outcoords).T
+    padded_images[:, :, out_y, out_x] = images[:, :, in_y, in_x]
+    return padded_images
+
+
+# Same as unpad for a batch of images
+def unpad_batch(padded_images, input_image_shape, padded_to_input):
+    return pad_batch(padded_images, input_image_shape, padded_to_input)
 
 class DeconvLayer(ConvLayer):
     # Args:
@@ -70,6 +88,12 @@ class DeconvLayer(ConvLayer):
         image = pad(image, self.padded_image_shape, self.input_to_padded)
         return super(DeconvLayer, self).getactivations(image)
 
+    # Same as getactivations for a whole batch of images
+    # Args: images - 4D np array (batch size, image depth, image height, image length)
+    def getactivations_batch(self, images):
+        images = pad_batch(np.asarray(images, dtype=float), self.padded_image_shape, self.input_to_padded)
+        return super(DeconvLayer, self).getactivations_batch(images)
+
     # Returns the new image created using padding and the current layers kernels squashed by an activation function
     # Args: image - 3D np array of the image
     def feed_forward(self, image):
@@ -85,9 +109,10 @@ class DeconvLayer(ConvLayer):
         kernelWeightDeltas = []
         kernelBiasDeltas = []
 
+        # Pad once, every kernel works on the same padded activations
+        prev_fz_activations = pad(prev_fz_activations, self.padded_image_shape, self.input_to_padded)
+        d_prev_z_activations = pad(d_prev_z_activations, self.padded_image_shape, self.input_to_padded)
         for k, d in zip(self.kernels, curr_deltas):
-            prev_fz_activations = pad(prev_fz_activations, self.padded_image_shape, self.input_to_padded)
-            d_prev_z_activations = pad(d_prev_z_activations, self.padded_image_shape, self.input_to_padded)
             wd, bd, pd = k.backprop(input_shape=self.padded_image_shape,
                                     output_shape=self.output_shape,
                                     prev_fz_activations=prev_fz_activations,
@@ -103,8 +128,8 @@ class DeconvLayer(ConvLayer):
 
     def getdeltas(self, d_prev_z_activations, curr_deltas):
         prevDeltas = np.zeros(self.padded_image_shape)
+        d_prev_z_activations = pad(d_prev_z_activations, self.padded_image_shape, self.input_to_padded)
         for k, d in zip(self.kernels, curr_deltas):
-            d_prev_z_activations = pad(d_prev_z_activations, self.padded_image_shape, self.input_to_padded)
             prevDeltas += k.getdeltas(input_shape=self.padded_image_shape,
                                      output_shape=self.output_shape,
                                      d_prev_z_activations=d_prev_z_activations,
@@ -112,4 +137,13 @@ class DeconvLayer(ConvLayer):
 
         prevDeltas = unpad(prevDeltas, self.input_shape, self.padded_to_input)
 
-        return prevDeltas
\ No newline at end of file
+        return prevDeltas
+
+    # Same as getdeltas for a whole batch, without computing any kernel gradients
+    # Args:
+    #   d_prev_z_activations (4D np arr) - (batch size,) + input shape, derivatives of the previous activations
+    #   curr_deltas (4D np arr) - (batch size,) + output shape, errors of this layer
+    def getdeltas_batch(self, d_prev_z_activations, curr_deltas):
+        d_prev_z_activations = pad_batch(d_prev_z_activations, self.padded_image_shape, self.input_to_padded)
+        prevDeltas = super(DeconvLayer, self).getdeltas_batch(d_prev_z_activations, curr_deltas)
+        return unpad_batch(prevDeltas, self.input_shape, self.padded_to_input)
@@ -2,12 +2,17 @@ import numpy as np
 from functions import LeakyRELU
 from functions import RELU
 from layer import Layer
+from lazy import lazy_attribute
 
 class DenseLayer(Layer):
+    # May be given as LazyValues, loaded on first use
+    weights = lazy_attribute("weights")
+    biases = lazy_attribute("biases")
+
     # Args:
     #   layer_shape - a 2-tuple of ints (number of neurons on current layer, number of neurons on previous layer)
-    #   weights (optional) - a 2D np array of the weights
-    #   biases (optional) a 1D np array of the biases
+    #   weights (optional) - a 2D np array of the weights (or a LazyValue producing it)
+    #   biases (optional) a 1D np array of the biases (or a LazyValue producing it)
     def __init__(self, input_shape, output_shape, weights=None, biases=None, activation_function=RELU):
         super(DenseLayer,self).__init__(input_shape=input_shape,
                                         output_shape=output_shape,
@@ -32,6 +37,16 @@ class DenseLayer(Layer):
     def feedforward(self, inputs):
         return self.activation_function.func(self.getactivations(inputs))
 
+    # Same as getactivations for a whole batch of inputs
+    # Args:
+    #   inputs - a 2D np array (batch size, num neurons on previous layer)
+    def getactivations_batch(self, inputs):
+        return np.dot(inputs, self.weights.T) + self.biases
+
+    # Same as feedforward for a whole batch of inputs
+    def feedforward_batch(self, inputs):
+        return self.activation_function.batch_func(self.getactivations_batch(inputs))
+
     # Returns the gradients for the weights, biases, and the deltas for the previous layer
     def backprop (self, prev_fz_activations, d_prev_z_activations, curr_deltas):
         biasDeltas = curr_deltas
@@ -45,6 +60,10 @@ class DenseLayer(Layer):
         prevDeltas = np.dot(self.weights.transpose(), curr_deltas) * d_prev_z_activations
         return prevDeltas
 
+    # Same as getdeltas for a whole batch, (batch size, num neurons) arrays
+    def getdeltas_batch(self, d_prev_z_activations, curr_deltas):
+        return np.dot(curr_deltas, self.weights) * d_prev_z_activations
+
     # Updates layers parameters
     # Args:
     #   d_weights - 2D np array determining how much to change the weights by
@@ -0,0 +1,115 @@
+from functions import LeakyRELU
+
+from copy import deepcopy
+import numpy as np
+
+# leaky relu function (used on the previous layer's activations, as in RecurrentLayer)
+def func (z):
+    return LeakyRELU.func(z)
+
+def func_deriv(z):
+    return LeakyRELU.func_deriv(z)
+
+# Vectorized sigmoid used by the gates
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+# Base class for recurrent layers whose gates share one stacked weight matrix
+# Every timestep costs one input product (weights) and one recurrent product (past_weights)
+# followed by elementwise gate math, the same as RecurrentLayer
+class GatedRecurrentLayer(object):
+    # Args:
+    #   layer_shape (2 tuple) - (num neurons on current layer, num neurons on previous layer)
+    #   num_gates (int) - number of gate blocks stacked in the weight matrices
+    #   weights (optional) - a (num_gates*num neurons, num inputs) np array of the stacked input weights
+    #   biases (optional) - a (num_gates*num neurons) np array of the stacked biases
+    #   past_weights (optional) - a (num_gates*num neurons, num neurons) np array of the stacked recurrent weights
+    def __init__(self, layer_shape, num_gates, weights=None, biases=None, past_weights=None):
+        self.layer_shape = layer_shape
+        self.output_shape = layer_shape[0]
+        self.num_gates = num_gates
+        self.past_state = np.zeros(layer_shape[0])
+        # Values saved by the last call to get_activations for use in backprop
+        self.gate_cache = None
+
+        if weights is not None:
+            self.weights = weights
+        else:
+            self.weights = np.random.randn(num_gates*layer_shape[0], layer_shape[1])/np.sqrt(layer_shape[1])
+
+        if biases is not None:
+            self.biases = biases
+        else:
+            self.biases = np.zeros(num_gates*layer_shape[0])
+
+        if past_weights is not None:
+            self.past_weights = past_weights
+        else:
+            self.past_weights = np.random.randn(num_gates*layer_shape[0], layer_shape[0])/np.sqrt(layer_shape[0])
+
+    # Splits a stacked gate array into one array per gate along the last axis
+    def split_gates(self, stacked):
+        return np.split(stacked, self.num_gates, axis=-1)
+
+    # Returns the gradients for the stacked weights, past weights, biases, and the deltas for the previous layer
+    # Args:
+    #   prev_z_activ (1D np arr) - the past state used by the last call to get_activations
+    #   z_activations (1D np arr) - unsquashed activations of the previous layer
+    #   deltas (1D np arr) - errors of this layers output
+    def backprop(self, prev_z_activ, z_activations, deltas):
+        d_gates, d_past_gates = self.gate_deltas(deltas)
+        prevDeltas = np.dot(self.weights.transpose(), d_gates) * func_deriv(deepcopy(z_activations))
+        weightDeltas = np.outer(d_gates, func(deepcopy(z_activations)))
+        pastWeightDeltas = np.outer(d_past_gates, prev_z_activ)
+
+        return weightDeltas, pastWeightDeltas, d_gates, prevDeltas
+
+    # Same as backprop for a whole sequence at once, using the gates saved by the last call
+    # to get_sequence_activations, with the parameter gradients summed over the sequence
+    def backprop_sequence(self, prev_z_activ, z_activations, deltas):
+        d_gates, d_past_gates = self.gate_deltas(deltas)
+        prevDeltas = np.dot(d_gates, self.weights) * LeakyRELU.batch_func_deriv(z_activations)
+        weightDeltas = np.dot(d_gates.T, LeakyRELU.batch_func(z_activations))
+        pastWeightDeltas = np.dot(d_past_gates.T, prev_z_activ)
+
+        return weightDeltas, pastWeightDeltas, np.sum(d_gates, axis=0), prevDeltas
+
+    # Feeds a whole sequence through the layer, saving the last state
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs)
+    def feed_forward_sequence(self, input_sequence):
+        ps, cs = self.get_sequence_activations(input_sequence)
+        self.advance_state(deepcopy(cs[-1]))
+        return LeakyRELU.batch_func(cs)
+
+    # Feeds the input through the layer, storing the new state
+    # Args:
+    #   input_activations - a 1D np array of the previous activations
+    def feed_forward(self, input_activations):
+        ps, cs = self.get_activations(input_activations)
+        self.past_state = cs
+        return func(deepcopy(self.past_state))
+
+    # Updates layers parameters
+    # Args:
+    #   d_weights - 2D np array determining how much to change the stacked weights by
+    #   d_past_weights - 2D np array determining how much to change the stacked past weights by
+    #   d_biases - 1D np array determining how much to change the stacked biases by
+    def update(self, d_weights, d_past_weights, d_biases):
+        self.weights += d_weights
+        self.past_weights += d_past_weights
+        self.biases += d_biases
+
+    # Makes the state returned by the last call to get_activations the past state
+    def advance_state(self, curr_state):
+        self.past_state = curr_state
+
+    def forget_past(self):
+        self.past_state = np.zeros(self.layer_shape[0])
+
+    # Returns the current past state as a batch of size 1 (used to seed a batched state cache)
+    def get_batch_state(self):
+        return np.array([self.past_state])
+
+    def get_output_shape(self):
+        return self.output_shape
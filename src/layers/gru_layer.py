@@ -0,0 +1,73 @@
+from functions import LeakyRELU
+from gated_recurrent_layer import GatedRecurrentLayer
+from gated_recurrent_layer import sigmoid
+
+from copy import deepcopy
+import numpy as np
+
+# Gated recurrent unit layer
+# Gates are stacked in the order (update, reset, candidate); the reset gate is applied to the
+# recurrent product of the candidate so the whole timestep needs a single recurrent product
+class GRULayer(GatedRecurrentLayer):
+    # Args:
+    #   layer_shape (2 tuple) - (num neurons on current layer, num neurons on previous layer)
+    #   weights, biases, past_weights (optional) - stacked parameters, see GatedRecurrentLayer
+    def __init__(self, layer_shape, weights=None, biases=None, past_weights=None):
+        super(GRULayer, self).__init__(layer_shape, 3, weights, biases, past_weights)
+
+    # Computes the gates and new state for a batch (or a single example) of projected inputs
+    # Args:
+    #   input_proj (np arr) - weights dot inputs plus biases, (..., 3*num neurons)
+    #   past_states (np arr) - the previous states, (..., num neurons)
+    def step(self, input_proj, past_states):
+        xu, xr, xc = self.split_gates(input_proj)
+        hu, hr, hc = self.split_gates(np.dot(past_states, self.past_weights.T))
+
+        update = sigmoid(xu + hu)
+        reset = sigmoid(xr + hr)
+        candidate = np.tanh(xc + reset*hc)
+        curr_states = (1 - update)*candidate + update*past_states
+        return curr_states, (past_states, update, reset, candidate, hc)
+
+    # Feed forward without saving the new state
+    def get_activations(self, input_activations):
+        curr_states, self.gate_cache = self.step(np.dot(self.weights, input_activations) + self.biases,
+                                                 self.past_state)
+        return deepcopy(self.past_state), curr_states
+
+    # Feeds a whole sequence through the layer without saving, projecting every input with one product
+    # so only the past_weights recurrence is computed timestep by timestep
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs) squashed inputs
+    # Returns the past state used at every timestep and the new states, both (sequence length, num neurons)
+    def get_sequence_activations(self, input_sequence):
+        input_proj = np.dot(input_sequence, self.weights.T) + self.biases
+        states = np.zeros((len(input_sequence)+1, self.layer_shape[0]))
+        states[0] = self.past_state
+        gates = []
+        for t in range(len(input_sequence)):
+            states[t+1], g = self.step(input_proj[t], states[t])
+            gates.append(g)
+        self.gate_cache = tuple(np.array(g) for g in zip(*gates))
+        return states[:-1], states[1:]
+
+    # Returns the errors of the stacked input gates and the stacked recurrent gates
+    # for the errors of the state returned by the last call to get_activations
+    def gate_deltas(self, deltas):
+        past_states, update, reset, candidate, hc = self.gate_cache
+
+        d_candidate = deltas*(1 - update)*(1 - candidate*candidate)
+        d_update = deltas*(past_states - candidate)*update*(1 - update)
+        d_reset = d_candidate*hc*reset*(1 - reset)
+
+        d_gates = np.concatenate((d_update, d_reset, d_candidate), axis=-1)
+        d_past_gates = np.concatenate((d_update, d_reset, d_candidate*reset), axis=-1)
+        return d_gates, d_past_gates
+
+    # Feeds a batch of inputs through the layer without touching the stored past state
+    # Args:
+    #   input_activations (2D np arr) - (batch size, num inputs)
+    #   past_states (2D np arr) - (batch size, num neurons)
+    def feed_forward_batch(self, input_activations, past_states):
+        curr_states, gates = self.step(np.dot(input_activations, self.weights.T) + self.biases, past_states)
+        return curr_states, LeakyRELU.batch_func(curr_states)
@@ -106,7 +106,7 @@ class Kernel:
     def getdeltas(self, input_shape, output_shape, d_prev_z_activations, curr_deltas):
         deltaPrevs = []
         for w, dzs in zip(self.weights, d_prev_z_activations):
-            w_err, b_err, d_err = prev_delta(input_shape[1:], output_shape[1:], dzs, w, curr_deltas)
+            d_err = prev_delta(input_shape[1:], output_shape[1:], dzs, w, curr_deltas)
             deltaPrevs.append(d_err)
         return np.array(deltaPrevs)
 
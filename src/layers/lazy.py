@@ -0,0 +1,39 @@
+# Layer parameters that are produced on first use
+#
+# A layer attribute declared as a lazy_attribute can be given a LazyValue instead of its value.
+# The first time the attribute is read the LazyValue is loaded and replaced by its result,
+# so layers that are never used never pay for their parameters.
+
+class LazyValue(object):
+    # Args:
+    #   load (function) - takes no arguments and returns the value
+    def __init__(self, load):
+        self.load = load
+
+# Returns the value of a possibly lazy value, loading it if needed
+def resolve(value):
+    if isinstance(value, LazyValue):
+        return value.load()
+    return value
+
+class lazy_attribute(object):
+    # Args:
+    #   name (string) - name of the attribute, the value is kept in the instance dictionary under it
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name]
+        if isinstance(value, LazyValue):
+            value = value.load()
+            instance.__dict__[self.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+    # Returns True if the attribute of instance has not been loaded yet
+    def is_pending(self, instance):
+        return isinstance(instance.__dict__.get(self.name), LazyValue)
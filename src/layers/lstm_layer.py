@@ -0,0 +1,107 @@
+from functions import LeakyRELU
+from gated_recurrent_layer import GatedRecurrentLayer
+from gated_recurrent_layer import sigmoid
+
+from copy import deepcopy
+import numpy as np
+
+# Long short-term memory layer
+# Gates are stacked in the order (input, forget, cell, output); past_state holds the hidden
+# state and past_cell holds the cell state
+class LSTMLayer(GatedRecurrentLayer):
+    # Args:
+    #   layer_shape (2 tuple) - (num neurons on current layer, num neurons on previous layer)
+    #   weights, biases, past_weights (optional) - stacked parameters, see GatedRecurrentLayer
+    def __init__(self, layer_shape, weights=None, biases=None, past_weights=None):
+        super(LSTMLayer, self).__init__(layer_shape, 4, weights, biases, past_weights)
+        self.past_cell = np.zeros(layer_shape[0])
+
+        # Start with the forget gate open so the cell state is carried forward early in training
+        if biases is None:
+            self.biases[layer_shape[0]:2*layer_shape[0]] = 1.0
+
+    # Computes the gates and new hidden and cell states for a batch (or a single example) of projected inputs
+    # Args:
+    #   input_proj (np arr) - weights dot inputs plus biases, (..., 4*num neurons)
+    #   past_states (np arr) - the previous hidden states, (..., num neurons)
+    #   past_cells (np arr) - the previous cell states, (..., num neurons)
+    def step(self, input_proj, past_states, past_cells):
+        gates = input_proj + np.dot(past_states, self.past_weights.T)
+        inp, forget, cell, outp = self.split_gates(gates)
+
+        inp = sigmoid(inp)
+        forget = sigmoid(forget)
+        cell = np.tanh(cell)
+        outp = sigmoid(outp)
+
+        curr_cells = forget*past_cells + inp*cell
+        squashed_cells = np.tanh(curr_cells)
+        curr_states = outp*squashed_cells
+        return curr_states, curr_cells, (past_cells, inp, forget, cell, outp, squashed_cells)
+
+    # Feed forward without saving the new state
+    def get_activations(self, input_activations):
+        curr_states, self.curr_cell, self.gate_cache = self.step(np.dot(self.weights, input_activations) + self.biases,
+                                                                 self.past_state,
+                                                                 self.past_cell)
+        return deepcopy(self.past_state), curr_states
+
+    # Feeds a whole sequence through the layer without saving, projecting every input with one product
+    # so only the past_weights recurrence is computed timestep by timestep
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs) squashed inputs
+    # Returns the past hidden state used at every timestep and the new hidden states, both (sequence length, num neurons)
+    def get_sequence_activations(self, input_sequence):
+        input_proj = np.dot(input_sequence, self.weights.T) + self.biases
+        states = np.zeros((len(input_sequence)+1, self.layer_shape[0]))
+        states[0] = self.past_state
+        cells = self.past_cell
+        gates = []
+        for t in range(len(input_sequence)):
+            states[t+1], cells, g = self.step(input_proj[t], states[t], cells)
+            gates.append(g)
+        self.curr_cell = cells
+        self.gate_cache = tuple(np.array(g) for g in zip(*gates))
+        return states[:-1], states[1:]
+
+    # Feeds the input through the layer, storing the new hidden and cell states
+    def feed_forward(self, input_activations):
+        outp = super(LSTMLayer, self).feed_forward(input_activations)
+        self.past_cell = self.curr_cell
+        return outp
+
+    # Returns the errors of the stacked gates for the errors of the hidden state
+    # returned by the last call to get_activations (the recurrent gates share them)
+    def gate_deltas(self, deltas):
+        past_cells, inp, forget, cell, outp, squashed_cells = self.gate_cache
+
+        d_cells = deltas*outp*(1 - squashed_cells*squashed_cells)
+        d_gates = np.concatenate((d_cells*cell*inp*(1 - inp),
+                                  d_cells*past_cells*forget*(1 - forget),
+                                  d_cells*inp*(1 - cell*cell),
+                                  deltas*squashed_cells*outp*(1 - outp)), axis=-1)
+        return d_gates, d_gates
+
+    # Makes the hidden and cell states from the last call to get_activations the past states
+    def advance_state(self, curr_state):
+        self.past_state = curr_state
+        self.past_cell = self.curr_cell
+
+    def forget_past(self):
+        super(LSTMLayer, self).forget_past()
+        self.past_cell = np.zeros(self.layer_shape[0])
+
+    # Returns the current hidden and cell states as a batch of size 1, concatenated along the last axis
+    def get_batch_state(self):
+        return np.array([np.concatenate((self.past_state, self.past_cell))])
+
+    # Feeds a batch of inputs through the layer without touching the stored past state
+    # Args:
+    #   input_activations (2D np arr) - (batch size, num inputs)
+    #   past_states (2D np arr) - (batch size, 2*num neurons) hidden states followed by cell states
+    def feed_forward_batch(self, input_activations, past_states):
+        past_hidden, past_cells = np.split(past_states, 2, axis=-1)
+        curr_states, curr_cells, gates = self.step(np.dot(input_activations, self.weights.T) + self.biases,
+                                                   past_hidden,
+                                                   past_cells)
+        return np.concatenate((curr_states, curr_cells), axis=-1), LeakyRELU.batch_func(curr_states)
@@ -44,15 +44,59 @@ class RecurrentLayer:
         self.past_state = cs
         return func(deepcopy(self.past_state))
 
+    # Returns the current past state as a batch of size 1 (used to seed a batched state cache)
+    def get_batch_state(self):
+        return np.array([self.past_state])
+
+    # Feeds a batch of inputs through the layer without touching the stored past state
+    # Args:
+    #   input_activations (2D np arr) - (batch size, num inputs)
+    #   past_states (2D np arr) - (batch size, num neurons) unsquashed states from the previous timestep
+    # Returns the new unsquashed states and the squashed outputs, both (batch size, num neurons)
+    def feed_forward_batch(self, input_activations, past_states):
+        curr_states = np.dot(input_activations, self.weights.T) + np.dot(past_states, self.past_weights.T) + self.biases
+        return curr_states, LeakyRELU.batch_func(curr_states)
+
+    # Feeds a whole sequence through the layer without saving, projecting every input with one product
+    # so only the past_weights recurrence is computed timestep by timestep
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs) squashed inputs
+    # Returns the past state used at every timestep and the new unsquashed states, both (sequence length, num neurons)
+    def get_sequence_activations(self, input_sequence):
+        input_proj = np.dot(input_sequence, self.weights.T) + self.biases
+        states = np.zeros((len(input_sequence)+1, self.layer_shape[0]))
+        states[0] = self.past_state
+        for t in range(len(input_sequence)):
+            states[t+1] = input_proj[t] + np.dot(self.past_weights, states[t])
+        return states[:-1], states[1:]
+
+    # Feeds a whole sequence through the layer, saving the last state
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs)
+    def feed_forward_sequence(self, input_sequence):
+        ps, cs = self.get_sequence_activations(input_sequence)
+        self.past_state = deepcopy(cs[-1])
+        return LeakyRELU.batch_func(cs)
+
     # Returns the gradients for the weights, biases, and the deltas for the previous layer
     def backprop(self, prev_z_activ, z_activations, deltas):
-        prevDeltas = np.dot(self.weights.transpose(), deltas) * func_deriv(z_activations)
+        prevDeltas = np.dot(self.weights.transpose(), deltas) * func_deriv(deepcopy(z_activations))
         biasDeltas = deltas
-        weightDeltas = np.dot(np.array([deltas]).transpose(), np.array([func(z_activations)]))
+        weightDeltas = np.dot(np.array([deltas]).transpose(), np.array([func(deepcopy(z_activations))]))
         pastWeightDeltas = np.dot(np.array([deltas]).transpose(), np.array([prev_z_activ]))
 
         return weightDeltas, pastWeightDeltas, biasDeltas, prevDeltas
 
+    # Same as backprop for a whole sequence at once (arguments have a leading sequence axis),
+    # with the parameter gradients summed over the sequence
+    def backprop_sequence(self, prev_z_activ, z_activations, deltas):
+        prevDeltas = np.dot(deltas, self.weights) * LeakyRELU.batch_func_deriv(z_activations)
+        biasDeltas = np.sum(deltas, axis=0)
+        weightDeltas = np.dot(deltas.T, LeakyRELU.batch_func(z_activations))
+        pastWeightDeltas = np.dot(deltas.T, prev_z_activ)
+
+        return weightDeltas, pastWeightDeltas, biasDeltas, prevDeltas
+
     # Updates layers parameters
     # Args:
     #   d_weights - 2D np array determining how much to change the weights by
@@ -62,6 +106,10 @@ class RecurrentLayer:
         self.past_weights += d_past_weights
         self.biases += d_biases
 
+    # Makes the state returned by the last call to get_activations the past state
+    def advance_state(self, curr_state):
+        self.past_state = curr_state
+
     def forget_past(self):
         self.past_state = np.zeros(self.layer_shape[0])
 
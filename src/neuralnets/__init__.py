@@ -1,5 +1,13 @@
 from convolutional import ConvolutionalNet
-# from fullyconnected import FullyConnectedNet
-# from recurrent import RecurrentNet
-#
-# from gan import GAN
\ No newline at end of file
+from fullyconnected import FullyConnectedNet
+from recurrent import RecurrentNet
+from generator import Generator
+from discriminator import Discriminator
+from gan import GAN
+from replay_buffer import ReplayBuffer
+from training_state import TrainingState
+from progress import print_progress
+from evaluation import evaluate_batches
+from profiling import LayerProfiler
+from memory import memory_report
+from memory import format_memory_report
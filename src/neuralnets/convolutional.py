@@ -11,8 +11,17 @@ from functions import QuadraticCost
 from functions import NegativeLogLikelihood
 
 from convolutional_framework import ConvolutionalFramework
+from profiling import FORWARD
+from profiling import BACKWARD
+from profiling import UPDATE
+from training_state import start_training
+from progress import print_progress
+from progress import evaluation_due
+from progress import evaluation_examples
+from datasets import training_data
+from datasets import ArrayDataset
+from datasets import Stream
 
-from random import shuffle
 from copy import deepcopy
 
 # Makes a 3D np array into a 1D np array
@@ -49,7 +58,7 @@ class ConvolutionalNet(ConvolutionalFramework):
         self.input_shape = input_shape
         self.layer_types=[]
 
-    # This function calculates the gradients for one training example
+    # This function calculates the gradients and the cost for one training example
     # Args:
     #   network_input - (np arr) the input being used
     #   expected_output - (np arr) the expected output
@@ -59,12 +68,15 @@ class ConvolutionalNet(ConvolutionalFramework):
         dzs_list = [network_input]
 
         is_conv = False
-        if self.layer_types[0] is "conv" or self.layer_types[0] is "deconv":
+        if self.layer_types[0] == "conv" or self.layer_types[0] == "deconv":
             is_conv = True
 
+        profiler = self.profiler
         for i, lt, lyr in zip(range(1, self.num_layers+1), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
             # Squash to 1D np array
-            if lt is not "conv" and lt is not "deconv" and is_conv:
+            if lt != "conv" and lt != "deconv" and is_conv:
                 is_conv = False
                 curr_z = flatten_image(curr_z)
 
@@ -73,6 +85,8 @@ class ConvolutionalNet(ConvolutionalFramework):
 
             curr_z = lyr.activation_function.func(curr_z)
             fzs_list.append(deepcopy(curr_z))
+            if profiler is not None:
+                profiler.record(i-1, FORWARD, start)
 
         # Errors for the last layer
         delta = self.cost_function.delta(fzs_list[-1],
@@ -80,20 +94,23 @@ class ConvolutionalNet(ConvolutionalFramework):
                                          expected_output)
 
         is_conv = True
-        if self.layer_types[-1] is not "conv" \
-                and self.layer_types[-1] is not "deconv":
+        if self.layer_types[-1] != "conv" \
+                and self.layer_types[-1] != "deconv":
             is_conv = False
 
         delta_w = []
         delta_b = []
 
         # Append all the errors for each layer
-        for lt, lyr, fzs, dzs in reversed(zip(self.layer_types, self.layers, fzs_list[:-1], dzs_list[:-1])):
-            if lt is "conv" or lt is "deconv":
+        for i, lt, lyr, fzs, dzs in reversed(zip(range(self.num_layers), self.layer_types, self.layers,
+                                                 fzs_list[:-1], dzs_list[:-1])):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "conv" or lt == "deconv":
                 if not is_conv:
                     delta = convert_to_image(delta, lyr.get_output_shape())
                     is_conv = True
-            elif lt is "dense" or lt is "soft":
+            elif lt == "dense" or lt == "soft":
                 fzs = flatten_image(fzs)
                 dzs = flatten_image(dzs)
             dw, db, dlt = lyr.backprop(fzs, dzs, delta)
@@ -101,20 +118,24 @@ class ConvolutionalNet(ConvolutionalFramework):
             delta_b.insert(0, db)
 
             delta = dlt
+            if profiler is not None:
+                profiler.record(i, BACKWARD, start)
 
-        return np.array(delta_w), np.array(delta_b)
+        return np.array(delta_w), np.array(delta_b), self.cost_function.cost(fzs_list[-1], expected_output)
 
     # Updates the network given a specific minibatch (done by averaging gradients over the minibatch)
+    # and returns the total cost of the minibatch, measured by the same forward passes
     # Args:
     #   mini_batch - a list of tuples, (input, expected output)
     #   step_size - the amount the network should change its parameters by relative to the gradients
     def update_network(self, step_size, mini_batch, is_momentum_based, friction):
-        gradient_w, gradient_b = self.backprop(mini_batch[0][0], mini_batch[0][1])
+        gradient_w, gradient_b, total_cost = self.backprop(mini_batch[0][0], mini_batch[0][1])
 
         for inp, outp in mini_batch[1:]:
-            dgw, dgb = self.backprop(inp, outp)
+            dgw, dgb, cost = self.backprop(inp, outp)
             gradient_w += dgw
             gradient_b += dgb
+            total_cost += cost
 
         # Average the gradients
         gradient_w *= step_size/(len(mini_batch)+0.00)
@@ -128,39 +149,67 @@ class ConvolutionalNet(ConvolutionalFramework):
 
         # Update weights and biases in opposite direction of gradients
         if is_momentum_based:
-            for gw, gb, lyr in zip(self.velocity[0], self.velocity[1], self.layers):
-                lyr.update(-gw, -gb)
-        else:
-            for gw, gb, lyr in zip(gradient_w, gradient_b, self.layers):
-                lyr.update(-gw, -gb)
+            gradient_w, gradient_b = self.velocity
+        profiler = self.profiler
+        for i, gw, gb, lyr in zip(range(self.num_layers), gradient_w, gradient_b, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
+            lyr.update(-gw, -gb)
+            if profiler is not None:
+                profiler.record(i, UPDATE, start)
+        return total_cost
 
     # Performs SGD on the network
     # Args:
     #   epochs - (int), number of times to loop over the entire batch
     #   step_size - (float), amount network should change its parameters per update
     #   mini_batch_size - (int), number of training examples per mini batch
-    #   training_inputs - (list), the list of training inputs
+    #   training_inputs - (list), the list of training inputs, or a ShardedDataset, Stream, or any other
+    #                     iterable of (input, expected output) examples if expected_outputs is None
     #   expected_outputs - (list), the list of expected outputs for each input
+    #   checkpointer - (BackgroundCheckpointer or IncrementalCheckpointer) optional, stepped after every update
+    #                  to checkpoint the network
+    #   progress - (function) optional, called with a report (a dictionary) after every epoch, see progress.py
+    #   evaluate_every - (int) optional, also evaluate on the training set every this many epochs
+    #   evaluation_size - (int) optional, evaluate on a fixed random subsample of this many examples
+    #   regularizer - (L1, L2, ElasticNet) optional, regularizes the weights after every update
+    #                 (a Stream has to be given its size)
+    # If the network holds a training state (restored from a checkpoint taken during training) it resumes from it
     def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_inputs, expected_outputs,
-                                    is_momentum_based=False, friction=0.9):
-        training_set = []
-        for inp, outp in zip(training_inputs, expected_outputs):
-            training_set.append((inp, outp))
+                                    is_momentum_based=False, friction=0.9, checkpointer=None,
+                                    progress=print_progress, evaluate_every=None, evaluation_size=None,
+                                    regularizer=None):
+        if expected_outputs is None:
+            training_set = training_data(training_inputs)
+        else:
+            training_set = ArrayDataset(training_inputs, expected_outputs)
+        training_set_size = training_set.size if isinstance(training_set, Stream) else len(training_set)
+        if training_set_size is None and regularizer is not None:
+            raise ValueError("Regularization needs the size of the training stream")
 
         # Train
-        for ep in range(epochs):
-            shuffle(training_set)
-            for x in range(0, len(training_set), mini_batch_size):
-                self.update_network(step_size=step_size,
-                                    mini_batch=training_set[x:x+mini_batch_size],
-                                    is_momentum_based=is_momentum_based,
-                                    friction=friction)
-            # # Update with progress
-            print("Epoch: %d   Average cost: %f" % (ep+1, self.evaluate_cost(training_set)))
+        state = start_training(self)
+        while state.epoch < epochs:
+            for mini_batch in state.minibatches(training_set, mini_batch_size):
+                state.cost += self.update_network(step_size=step_size,
+                                                  mini_batch=mini_batch,
+                                                  is_momentum_based=is_momentum_based,
+                                                  friction=friction)
+                if regularizer is not None:
+                    regularizer.apply(self.weight_arrays(), step_size, training_set_size)
+                if checkpointer is not None:
+                    checkpointer.step(self)
+            # Update with progress
+            report = {"network": "", "epoch": state.epoch+1, "cost": state.average_cost()}
+            if evaluation_due(state.epoch, evaluate_every):
+                report["evaluation_cost"] = self.evaluate_cost(evaluation_examples(training_set, evaluation_size))
+            progress(report)
+            state.end_epoch()
             # print "kernel0"
             # print self.layers[0].kernels[0].weights[0]
             # print "softweights0"
             # print self.layers[4].weights[0]
 
+        self.training_state = None
         self.reset_velocity()
 
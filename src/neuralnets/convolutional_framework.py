@@ -9,6 +9,7 @@ from functions import QuadraticCost
 from functions import NegativeLogLikelihood
 
 from neural_network import NeuralNetwork
+from profiling import FORWARD
 
 from abc import abstractmethod
 
@@ -44,6 +45,9 @@ def convert_to_image(arr, image_shape):
 class ConvolutionalFramework(NeuralNetwork):
     def __init__(self, network_type, cost_function, layers=None):
        super(ConvolutionalFramework, self).__init__(network_type, cost_function, layers)
+       # Squashed activations and activation derivatives of every layer from the last
+       # feedforward_batch called with store_state=True
+       self.forward_cache = None
 
     # Adds a new layer to the network
     # Args:
@@ -63,31 +67,31 @@ class ConvolutionalFramework(NeuralNetwork):
            input_shape = self.layers[-1].get_output_shape()
            is_first_layer = False
 
-       if layer_type is "conv" or layer_type is "deconv":
+       if layer_type == "conv" or layer_type == "deconv":
            # Order kernel shape (num kernels, kernel depth, kernel height, kernel length)
            kernel_shape = (kernel_size[0], input_shape[0], kernel_size[1], kernel_size[2])
 
-           if layer_type is "conv":
+           if layer_type == "conv":
                self.layers.append(ConvLayer(input_shape=input_shape,
                                             kernel_shape=kernel_shape))
-           elif layer_type is "deconv":
+           elif layer_type == "deconv":
                # Order output shape (image depth, image height, image length)
                output_shape = (kernel_size[0], output_size[0], output_size[1])
                self.layers.append(DeconvLayer(input_shape=input_shape,
                                               output_shape=output_shape,
                                               kernel_shape=kernel_shape))
-       elif layer_type is "dense" or layer_type is "soft":
+       elif layer_type == "dense" or layer_type == "soft":
            # Assume last layer was softmax or dense
            num_prev_neurons = input_shape
            # If it is a deconv or conv, calculate number of previous neurons
            if not is_first_layer:
-               if self.layer_types[-1] is "conv" or self.layer_types[-1] is "deconv":
+               if self.layer_types[-1] == "conv" or self.layer_types[-1] == "deconv":
                    num_prev_neurons = input_shape[0] * input_shape[1] * input_shape[2]
 
-           if layer_type is "dense":
+           if layer_type == "dense":
                self.layers.append(DenseLayer(input_shape=num_prev_neurons,
                                              output_shape=output_size))
-           elif layer_type is "soft":
+           elif layer_type == "soft":
                self.layers.append(SoftmaxLayer(input_shape=num_prev_neurons,
                                                output_shape=output_size))
 
@@ -100,6 +104,17 @@ class ConvolutionalFramework(NeuralNetwork):
        else:
             self.cost_function = QuadraticCost
 
+    # Returns the weight arrays of every layer (the kernel weights of conv and deconv layers), which are
+    # what regularization acts on, biases are not included
+    def weight_arrays(self):
+        arrays = []
+        for lt, lyr in zip(self.layer_types, self.layers):
+            if lt == "conv" or lt == "deconv":
+                arrays.extend(k.weights for k in lyr.kernels)
+            else:
+                arrays.append(lyr.weights)
+        return arrays
+
     # Feeds an input through the network, returning the output
     # Args: network_input - (np arr) the input
     def feedforward(self, network_input):
@@ -109,13 +124,55 @@ class ConvolutionalFramework(NeuralNetwork):
             if len(network_input.shape) == 2:
                 network_input = np.array([network_input])
 
-
-        for lt, lyr in zip(self.layer_types, self.layers):
+        profiler = self.profiler
+        for i, lt, lyr in zip(range(self.num_layers), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
             # Squash to 1D np array
-            if lt is not "conv" and lt is not "deconv" and is_conv:
+            if lt != "conv" and lt != "deconv" and is_conv:
                 is_conv = False
                 network_input = flatten_image(network_input)
 
             network_input = lyr.feedforward(network_input)
+            if profiler is not None:
+                profiler.record(i, FORWARD, start)
+
+        return network_input
+
+    # Feeds a whole batch of inputs through the network at once, returning the batch of outputs
+    # Args:
+    #   network_input - (np arr) batch of inputs with the batch on the first axis,
+    #                   (batch size, image depth, image height, image length) for images
+    #   store_state - (bool) if True, keep every layers activations and derivatives in forward_cache
+    #                 for a following backward pass, otherwise nothing is kept
+    def feedforward_batch(self, network_input, store_state=False):
+        network_input = np.asarray(network_input, dtype=float)
+        is_conv = False
+        if self.layer_types[0] == "conv" or self.layer_types[0] == "deconv":
+            is_conv = True
+            if len(network_input.shape) == 3:
+                network_input = network_input[:, None]
+
+        fzs_list = [network_input]
+        dzs_list = [network_input]
+
+        profiler = self.profiler
+        for i, lt, lyr in zip(range(self.num_layers), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
+            # Squash each image to a 1D np array
+            if lt != "conv" and lt != "deconv" and is_conv:
+                is_conv = False
+                network_input = network_input.reshape(len(network_input), -1)
+
+            z = lyr.getactivations_batch(network_input)
+            network_input = lyr.activation_function.batch_func(z)
+
+            if store_state:
+                dzs_list.append(lyr.activation_function.batch_func_deriv(z))
+                fzs_list.append(network_input)
+            if profiler is not None:
+                profiler.record(i, FORWARD, start)
 
+        self.forward_cache = (fzs_list, dzs_list) if store_state else None
         return network_input
@@ -11,8 +11,14 @@ from functions import QuadraticCost
 from functions import NegativeLogLikelihood
 
 from convolutional import ConvolutionalNet
+from profiling import FORWARD
+from profiling import BACKWARD
+from training_state import start_training
+from progress import print_progress
+from progress import evaluation_due
+from progress import evaluation_examples
+from datasets import training_data
 
-from random import shuffle
 from copy import deepcopy
 
 # Makes a 3D np array into a 1D np array
@@ -47,17 +53,30 @@ class Discriminator (ConvolutionalNet):
     def __init__(self, input_shape, layers=None, cost_func=QuadraticCost):
         super(Discriminator, self).__init__(input_shape, layers, cost_func)
 
+    # Returns the deltas at the input of the discriminator for one input
     def getdeltas(self, network_input, expected_output):
+        return self.cost_and_deltas(network_input, expected_output)[1]
+
+    # Returns the cost of one input and the deltas at the input, sharing a single forward pass
+    # Args:
+    #   network_input - (np arr) the input image
+    #   expected_output - (np arr) the expected output
+    #   d_input - (np arr) optional, derivative of the activation that produced the input (such as the
+    #             generators last layer), the input itself is used if not given
+    def cost_and_deltas(self, network_input, expected_output, d_input=None):
         curr_z = network_input
-        dzs_list = [network_input]
+        dzs_list = [network_input if d_input is None else d_input]
 
         is_conv = False
-        if self.layer_types[0] is "conv" or self.layer_types[0] is "deconv":
+        if self.layer_types[0] == "conv" or self.layer_types[0] == "deconv":
             is_conv = True
 
+        profiler = self.profiler
         for i, lt, lyr in zip(range(1, self.num_layers + 1), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
             # Squash to 1D np array
-            if lt is not "conv" and lt is not "deconv" and is_conv:
+            if lt != "conv" and lt != "deconv" and is_conv:
                 is_conv = False
                 curr_z = flatten_image(curr_z)
 
@@ -65,6 +84,10 @@ class Discriminator (ConvolutionalNet):
             dzs_list.append(lyr.activation_function.func_deriv(deepcopy(curr_z)))
 
             curr_z = lyr.activation_function.func(curr_z)
+            if profiler is not None:
+                profiler.record(i-1, FORWARD, start)
+
+        cost = self.cost_function.cost(curr_z, expected_output)
 
         # Errors for the last layer
         delta = self.cost_function.delta(curr_z,
@@ -72,34 +95,155 @@ class Discriminator (ConvolutionalNet):
                                          expected_output)
 
         is_conv = True
-        if self.layer_types[-1] is not "conv" \
-                and self.layer_types[-1] is not "deconv":
+        if self.layer_types[-1] != "conv" \
+                and self.layer_types[-1] != "deconv":
             is_conv = False
 
         # Append all the errors for each layer
-        for lt, lyr, dzs in reversed(zip(self.layer_types, self.layers, dzs_list[:-1])):
-            if lt is "conv" or lt is "deconv":
+        for i, lt, lyr, dzs in reversed(zip(range(self.num_layers), self.layer_types, self.layers, dzs_list[:-1])):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "conv" or lt == "deconv":
                 if not is_conv:
                     delta = convert_to_image(delta, lyr.get_output_shape())
                     is_conv = True
-            elif lt is "dense" or lt is "soft":
+            elif lt == "dense" or lt == "soft":
                 dzs = flatten_image(dzs)
             delta = lyr.getdeltas(dzs, delta)
+            if profiler is not None:
+                profiler.record(i, BACKWARD, start)
+
+        return cost, delta
+
+    # Returns the cost of every input in a batch and the deltas at the inputs, d cost / d input
+    # Only the activation derivatives of the forward pass are kept and no weight gradients are
+    # computed, so this is the fast path for training a generator against this discriminator
+    # Args:
+    #   network_input - (np arr) batch of images, (batch size, image depth, image height, image length)
+    #   expected_output - (np arr) expected output, either one for the whole batch or (batch size, num outputs)
+    #   d_input - (np arr) optional, derivatives of the activation that produced the inputs (such as the
+    #             generators last layer), the inputs themselves are used if not given
+    def cost_and_deltas_batch(self, network_input, expected_output, d_input=None):
+        curr_z = np.asarray(network_input, dtype=float)
+        dzs_list = [curr_z if d_input is None else d_input]
+
+        is_conv = False
+        if self.layer_types[0] == "conv" or self.layer_types[0] == "deconv":
+            is_conv = True
+
+        profiler = self.profiler
+        for i, lt, lyr in zip(range(self.num_layers), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
+            # Squash each image to a 1D np array
+            if lt != "conv" and lt != "deconv" and is_conv:
+                is_conv = False
+                curr_z = curr_z.reshape(len(curr_z), -1)
+
+            z = lyr.getactivations_batch(curr_z)
+            dzs_list.append(lyr.activation_function.batch_func_deriv(z))
+            curr_z = lyr.activation_function.batch_func(z)
+            if profiler is not None:
+                profiler.record(i, FORWARD, start)
 
-        return delta
+        expected_output = np.broadcast_to(np.asarray(expected_output, dtype=float), curr_z.shape)
+        costs = self.cost_function.batch_cost(curr_z, expected_output)
+
+        # Errors for the last layer
+        delta = self.cost_function.batch_delta(curr_z, dzs_list[-1], expected_output)
+
+        for i, lt, lyr, dzs in reversed(list(zip(range(self.num_layers), self.layer_types, self.layers,
+                                                 dzs_list[:-1]))):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "conv" or lt == "deconv":
+                if len(delta.shape) == 2:
+                    delta = delta.reshape((len(delta),) + tuple(lyr.get_output_shape()))
+            else:
+                dzs = dzs.reshape(len(dzs), -1)
+            delta = lyr.getdeltas_batch(dzs, delta)
+            if profiler is not None:
+                profiler.record(i, BACKWARD, start)
+
+        return costs, delta
 
     # Performs SGD on the network
     # Args:
     #   epochs - (int), number of times to loop over the entire batch
     #   step_size - (float), amount network should change its parameters per update
     #   mini_batch_size - (int), number of training examples per mini batch
-    #   training_inputs - (list), the list of training inputs
-    #   expected_outputs - (list), the list of expected outputs for each input
-    def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_set):
+    #   training_set - (list of tuples), (input, expected output) examples, or a ShardedDataset, Stream,
+    #                  or any other iterable of them
+    #   checkpointer - (BackgroundCheckpointer or IncrementalCheckpointer) optional, stepped after every update
+    #                  to checkpoint the network
+    #   progress - (function) optional, called with a report (a dictionary) after every epoch, see progress.py
+    #   evaluate_every - (int) optional, also evaluate on the training set every this many epochs
+    #   evaluation_size - (int) optional, evaluate on a fixed random subsample of this many examples
+    # If the network holds a training state (restored from a checkpoint taken during training) it resumes from it
+    def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_set, checkpointer=None,
+                                    progress=print_progress, evaluate_every=None, evaluation_size=None):
+        training_set = training_data(training_set)
+
         # Train
-        for ep in range(epochs):
-            shuffle(training_set)
-            for x in range(0, len(training_set), mini_batch_size):
-                self.update_network(training_set[x:x+mini_batch_size], step_size)
+        state = start_training(self)
+        while state.epoch < epochs:
+            for mini_batch in state.minibatches(training_set, mini_batch_size):
+                state.cost += self.update_network(step_size=step_size,
+                                                  mini_batch=mini_batch,
+                                                  is_momentum_based=False,
+                                                  friction=0.0)
+                if checkpointer is not None:
+                    checkpointer.step(self)
+            # Update with progress
+            report = {"network": "Discriminator", "epoch": state.epoch+1, "cost": state.average_cost()}
+            if evaluation_due(state.epoch, evaluate_every):
+                report["evaluation_cost"] = self.evaluate_cost(evaluation_examples(training_set, evaluation_size))
+            progress(report)
+            state.end_epoch()
+        self.training_state = None
+
+    # Performs SGD on real images and the generated images held in a replay buffer
+    # Minibatches are drawn by index from both sets, so no combined training list is built
+    # Args:
+    #   epochs - (int), number of times to loop over the real images and the buffer
+    #   step_size - (float), amount network should change its parameters per update
+    #   mini_batch_size - (int), number of training examples per mini batch
+    #   real_images - (4D np arr), (num real images, image depth, image height, image length)
+    #   real_output - (np arr), expected output for every real image
+    #   replay_buffer - (ReplayBuffer), generated images
+    #   fake_output - (np arr), expected output for every generated image
+    #   checkpointer - (BackgroundCheckpointer or IncrementalCheckpointer) optional, stepped after every update
+    #                  to checkpoint the network
+    #   progress - (function) optional, called with a report (a dictionary) after every epoch, see progress.py
+    #   evaluate_every - (int) optional, also evaluate on every real and buffered image every this many epochs
+    # If the network holds a training state (restored from a checkpoint taken during training) it resumes from it
+    def train_with_replay(self, epochs, step_size, mini_batch_size, real_images, real_output, replay_buffer, fake_output,
+                          checkpointer=None, progress=print_progress, evaluate_every=None):
+        num_real = len(real_images)
+
+        state = start_training(self)
+        while state.epoch < epochs:
+            order = state.begin_epoch(num_real + len(replay_buffer))
+            for x in range(state.position, len(order), mini_batch_size):
+                mini_batch = [(real_images[i], real_output) if i < num_real
+                              else (replay_buffer.get(i - num_real), fake_output)
+                              for i in order[x:x+mini_batch_size]]
+                state.cost += self.update_network(step_size=step_size,
+                                                  mini_batch=mini_batch,
+                                                  is_momentum_based=False,
+                                                  friction=0.0)
+                state.position = min(x + mini_batch_size, len(order))
+                if checkpointer is not None:
+                    checkpointer.step(self)
+
             # Update with progress
-            print("Discriminator Epoch: %d   Average cost: %f" % (ep+1, self.evaluate_cost(training_set)))
+            report = {"network": "Discriminator", "epoch": state.epoch+1, "cost": state.average_cost()}
+            if evaluation_due(state.epoch, evaluate_every):
+                # Score each set with one batched pass
+                total = 0.0
+                for images, outp in ((real_images, real_output), (replay_buffer.get(slice(0, len(replay_buffer))), fake_output)):
+                    total += self.cost_function.batch_cost(self.feedforward_batch(images), outp, reduction="sum")
+                report["evaluation_cost"] = total/len(order)
+            progress(report)
+            state.end_epoch()
+        self.training_state = None
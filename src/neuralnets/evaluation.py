@@ -0,0 +1,112 @@
+from datasets import Stream
+from datasets import ArrayDataset
+from datasets import ShardedDataset
+
+from itertools import islice
+import numpy as np
+
+# Batched evaluation of a network over a set of examples
+#
+# The examples are stacked into chunks of at most chunk_size examples, each chunk is run through the network
+# with one batched forward pass, and the metrics are accumulated over the chunks with array operations, so
+# memory is bounded by the chunk size and not by the number of examples.
+#
+# evaluate_batches returns a dictionary:
+#   "count" (int) - number of examples evaluated
+#   "cost" (float) - mean cost of the examples (only with a cost function)
+#   "accuracy" (float) - fraction of the examples whose largest output is the expected class
+#   "top_k_accuracy" (float) - fraction of the examples whose expected class is among the k largest outputs
+#                              (only with top_k)
+#   "confusion_matrix" (2D np arr of ints) - (num classes, num classes), rows are the expected classes and
+#                                            columns the predicted ones (only with confusion=True)
+# Every mean is nan if there are no examples
+
+# Number of examples per batched forward pass
+DEFAULT_CHUNK_SIZE = 256
+
+# Yields the examples as (inputs, expected outputs) arrays of at most chunk_size examples each, in order
+# Args:
+#   examples - an ArrayDataset, a ShardedDataset, a Stream, or any other iterable of (input, expected output)
+#   chunk_size (int) - number of examples per chunk
+def example_chunks(examples, chunk_size=DEFAULT_CHUNK_SIZE):
+    if isinstance(examples, Stream):
+        for inputs, outputs in examples.batches(chunk_size):
+            yield np.asarray(inputs, dtype=float), np.asarray(outputs, dtype=float)
+    elif isinstance(examples, (ArrayDataset, ShardedDataset)):
+        for start in range(0, len(examples), chunk_size):
+            yield examples.gather(np.arange(start, min(start + chunk_size, len(examples))))
+    else:
+        examples = iter(examples)
+        while True:
+            chunk = list(islice(examples, chunk_size))
+            if len(chunk) == 0:
+                return
+            yield (np.array([inp for inp, outp in chunk], dtype=float),
+                   np.array([outp for inp, outp in chunk], dtype=float))
+
+# Returns the class of every example of a batch, the index of its largest output, (batch size,)
+def predicted_classes(outputs):
+    return np.argmax(outputs.reshape(len(outputs), -1), axis=1)
+
+# Returns the expected class of every example of a batch, (batch size,)
+# Args:
+#   expected_outputs (np arr) - one hot (or probability) vectors, or a batch of class indices
+#   outputs (np arr) - the network outputs of the batch
+def expected_classes(expected_outputs, outputs):
+    if expected_outputs.ndim == 1 and outputs.ndim > 1:
+        return expected_outputs.astype(int)
+    return predicted_classes(expected_outputs)
+
+# Returns whether the expected class of every example of a batch is among its k largest outputs, (batch size,)
+def top_k_hits(outputs, classes, k):
+    outputs = outputs.reshape(len(outputs), -1)
+    if k >= outputs.shape[1]:
+        return np.ones(len(outputs), dtype=bool)
+    top = np.argpartition(outputs, -k, axis=1)[:, -k:]
+    return np.any(top == classes[:, None], axis=1)
+
+# Returns the confusion matrix of a batch, rows are the expected classes and columns the predicted ones
+def confusion_matrix(predicted, classes, num_classes):
+    counts = np.bincount(classes*num_classes + predicted, minlength=num_classes*num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+# Evaluates a network on a set of examples with batched forward passes, see the top of the file
+# Args:
+#   forward (function) - runs a batch of inputs through the network, returning the batch of outputs
+#   examples - an ArrayDataset, a ShardedDataset, a Stream, or any other iterable of (input, expected output)
+#   cost_function (class) optional - a cost function with batch_cost, for the mean cost
+#   chunk_size (int) - number of examples per forward pass
+#   top_k (int) optional - also measure the top k accuracy
+#   confusion (bool) - also build the confusion matrix
+def evaluate_batches(forward, examples, cost_function=None, chunk_size=DEFAULT_CHUNK_SIZE, top_k=None,
+                     confusion=False):
+    count = 0
+    total_cost = 0.0
+    correct = 0
+    top_k_correct = 0
+    matrix = None
+
+    for inputs, expected_outputs in example_chunks(examples, chunk_size):
+        outputs = forward(inputs)
+        count += len(outputs)
+        if cost_function is not None:
+            total_cost += cost_function.batch_cost(outputs, expected_outputs, reduction="sum")
+
+        predicted = predicted_classes(outputs)
+        classes = expected_classes(expected_outputs, outputs)
+        correct += np.count_nonzero(predicted == classes)
+        if top_k is not None:
+            top_k_correct += np.count_nonzero(top_k_hits(outputs, classes, top_k))
+        if confusion:
+            num_classes = outputs[0].size
+            chunk_matrix = confusion_matrix(predicted, classes, num_classes)
+            matrix = chunk_matrix if matrix is None else matrix + chunk_matrix
+
+    report = {"count": count, "accuracy": float(correct) / count if count else float("nan")}
+    if cost_function is not None:
+        report["cost"] = total_cost / count if count else float("nan")
+    if top_k is not None:
+        report["top_k_accuracy"] = float(top_k_correct) / count if count else float("nan")
+    if confusion:
+        report["confusion_matrix"] = matrix
+    return report
@@ -1,7 +1,21 @@
-import random
 import math
 import fullyconnected_functions as fn
 import numpy as np
+from training_state import start_training
+from progress import print_progress
+from progress import evaluation_due
+from progress import evaluation_examples
+from datasets import training_data
+from datasets import ArrayDataset
+from datasets import Stream
+from functions import make_regularizer
+from evaluation import evaluate_batches
+from evaluation import DEFAULT_CHUNK_SIZE
+from profiling import LayerProfiler
+from profiling import layer_names
+from profiling import FORWARD
+from profiling import BACKWARD
+from profiling import UPDATE
 
 # -- Class for the neural network
 class FullyConnectedNet:
@@ -28,6 +42,22 @@ class FullyConnectedNet:
         # connecting neuron z on layer x-1 to neuron y in layer x
         self.__weights = [np.random.randn(cl, pl)/np.sqrt(cl) for pl, cl in zip(self.__layer_sizes[:self.__n_layers-1], self.__layer_sizes[1:])]
 
+        # Position of the training loop while training (TrainingState)
+        self.training_state = None
+        # Per layer timings (LayerProfiler) while profiling, see profiling.py
+        self.profiler = None
+
+    # Starts timing every layer of weights of the network, returning the LayerProfiler the timings go to,
+    # see profiling.py
+    def enable_profiling(self):
+        self.profiler = LayerProfiler(layer_names(["dense"]*(self.__n_layers-1)), "FullyConnectedNet")
+        return self.profiler
+
+    # Stops timing the layers, returning the LayerProfiler that was used (None if profiling was off)
+    def disable_profiling(self):
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
     # Returns next activation, the z value
     # Args:
     #   curr_activations (np array) - a 1D np array of the current activations
@@ -39,10 +69,28 @@ class FullyConnectedNet:
     # Args:
     #   input_layer (np array) - 1D np array of inputs
     def feed_forward (self, input_layer):
+        profiler = self.profiler
         for l in range(0, self.__n_layers-1):
+            if profiler is not None:
+                start = profiler.clock()
             input_layer = self.__logistic_func.func(self.__next_activation(input_layer, l))
+            if profiler is not None:
+                profiler.record(l, FORWARD, start)
         return input_layer
 
+    # Returns the outputs of the neural net for a batch of inputs, one matrix product per layer
+    # Args:
+    #   inputs (np array) - 2D np array, (batch size, num inputs)
+    def feed_forward_batch(self, inputs):
+        profiler = self.profiler
+        for l in range(0, self.__n_layers-1):
+            if profiler is not None:
+                start = profiler.clock()
+            inputs = self.__logistic_func.func(np.dot(inputs, self.__weights[l].T) + self.__biases[l])
+            if profiler is not None:
+                profiler.record(l, FORWARD, start)
+        return inputs
+
     # Returns nabla_b and nabla_w, gradients of biases and weights by back propagation
     # Error (l) = hadamard(weights_transpose(l+1)*error(l+1), sig_prime(activations(l))
     # Args:
@@ -54,12 +102,17 @@ class FullyConnectedNet:
         # 2D arrays storing activations of each neuron on each layer
         activation_vecs = [network_input]
         activation_vecs_prime = [np.zeros(self.__layer_sizes[0])]
+        profiler = self.profiler
         for l in range(0, self.__n_layers-1):
+            if profiler is not None:
+                start = profiler.clock()
             z = self.__next_activation(z, l)
             z_s.append(z)
             activation_vecs.append(self.__logistic_func.func(z))
             activation_vecs_prime.append(self.__logistic_func.func_deriv(z))
             z = self.__logistic_func.func(z)
+            if profiler is not None:
+                profiler.record(l, FORWARD, start)
         # Gradient of biases are a 2D array and weights are a 3D array
         # Gradient of biases is a 2D array b[l][n] storing the bias of layer l-1 and neuron n-1
         grad_b = [np.zeros(b.shape) for b in self.__biases]
@@ -68,126 +121,141 @@ class FullyConnectedNet:
         grad_w = [np.zeros(w.shape) for w in self.__weights]
 
         # Initial error hadamard(d_cost, sig_prime)
+        if profiler is not None:
+            start = profiler.clock()
         error = self.__cost.delta(activation_vecs[self.__n_layers-1], expected_out, z_s[self.__n_layers-1])
 
         grad_b[self.__n_layers-2] = error
         grad_w[self.__n_layers-2] = np.dot(np.array([error]).transpose(), np.array([activation_vecs[self.__n_layers-2]]))
+        if profiler is not None:
+            profiler.record(self.__n_layers-2, BACKWARD, start)
 
         for l in reversed(range(1, self.__n_layers-1)):
+            if profiler is not None:
+                start = profiler.clock()
             error = np.dot(self.__weights[l].transpose(), error)*activation_vecs_prime[l]
             grad_b[l-1] = error
             grad_w[l-1] = np.dot(np.array([error]).transpose(), np.array([activation_vecs[l-1]]))
-        return grad_b, grad_w
+            if profiler is not None:
+                profiler.record(l-1, BACKWARD, start)
+        return grad_b, grad_w, activation_vecs[self.__n_layers-1]
 
-    # Updates networks weights and biases based on gradients, lambda, and size of training set through regularization
+    # Updates networks weights and biases in place based on gradients, then regularizes the weights, and returns
+    # the number of examples of the mini batch the network classified correctly before the update
     # Args:
     #   mini_batch (list) - the mini batch to be used to update the network
     #   step_size (float) - the step size, which determines how much the weights and biases should be modified
-    #   lmbda (float) - a regularization variable
     #   training_set_size (int) - the total number of training inputs in the training set
-    #   regularization_type (string) optional - which regularization should be used (None, "L1", "L2")
-    def __update_net_weights_biases (self, mini_batch, step_size, lmbda, training_set_size, regularization_type=None):
+    #   regularizer (L1, L2, ElasticNet) optional - the regularizer of the weights
+    def __update_net_weights_biases (self, mini_batch, step_size, training_set_size, regularizer=None):
         grad_b = [np.zeros(l) for l in self.__layer_sizes[1:]]
         grad_w = [np.zeros((cl, pl)) for pl, cl in zip(self.__layer_sizes[:self.__n_layers-1], self.__layer_sizes[1:])]
 
         # Calculate the gradients for the mini-batch
+        correct = 0
         for i, o in mini_batch:
-            d_grad_b, d_grad_w = self.__back_prop(i, o)
+            d_grad_b, d_grad_w, output = self.__back_prop(i, o)
             grad_b = [gb + dgb for gb, dgb in zip(grad_b, d_grad_b)]
             grad_w = [gw + dgw for gw, dgw in zip(grad_w, d_grad_w)]
+            if np.argmax(output) == np.argmax(o):
+                correct += 1
 
         # Since a "mini_batch_size" number of gradients are calculated, multiply by step size and divide by the number
         # of cases (average gradient)
         avg_step = step_size/(len(mini_batch)+0.0)
 
         # No regularization for biases
-        self.__biases = [b - avg_step*gb for b, gb in zip(self.__biases, grad_b)]
-
-        if regularization_type == 'L1':
-            #L1 Regularization
-            self.__weights = [w - avg_step*gw for w, gw in zip(self.__weights, grad_w)]
-
-            reg = lmbda/(training_set_size+0.0)
-            for x in range(len(self.__weights)):
-                for y in range(len(self.__weights[x])):
-                    for z in range(len(self.__weights[x][y])):
-                        self.__weights[x][y][z] -= fn.sign(self.__weights[x][y][z])*reg
-        elif regularization_type == 'L2':
-            #L2 Regularization
-            reg = lmbda/(training_set_size+0.0)
-            self.__weights = [(1-step_size*reg)*w-step_size*gw for w, gw in zip (self.__weights, grad_w)]
-        else:
-            # Unregularized
-            self.__weights = [w-avg_step*gw for w, gw in zip(self.__weights, grad_w)]
+        profiler = self.profiler
+        for l, b, gb, w, gw in zip(range(self.__n_layers-1), self.__biases, grad_b, self.__weights, grad_w):
+            if profiler is not None:
+                start = profiler.clock()
+            b -= avg_step*gb
+            w -= avg_step*gw
+            if profiler is not None:
+                profiler.record(l, UPDATE, start)
+
+        if regularizer is not None:
+            regularizer.apply(self.__weights, step_size, training_set_size)
+        return correct
+
+    # Evaluates the neural net on test data with batched forward passes of chunk_size examples, returning the mean
+    # cost, the accuracy, and optionally the top k accuracy and the confusion matrix (see evaluation.py)
+    # Args:
+    #   test_data - a list of tuples (network_input, expected_output), an ArrayDataset, a ShardedDataset or a Stream
+    #   chunk_size (int) - number of examples per forward pass
+    #   top_k (int) optional - also measure the top k accuracy
+    #   confusion (bool) - also build the confusion matrix
+    def evaluate_metrics(self, test_data, chunk_size=DEFAULT_CHUNK_SIZE, top_k=None, confusion=False):
+        return evaluate_batches(self.feed_forward_batch, test_data, self.__cost, chunk_size, top_k, confusion)
 
     # Returns the fraction of test cases correctly guessed by the neural net for "test_data"
     # Args:
     #   test_data (list of tuples) - a list of tuples (network_input, expected_output)
     def evaluate(self, test_data):
-        n_tests = len(test_data)
-        tests = [0 for x in range(n_tests)]
-        expected = [0 for x in range(n_tests)]
-
-        for a in range(n_tests):
-            tests[a] = test_data[a][0]
-            expected[a] = test_data[a][1]
-        results = []
-
-        for t in range(n_tests):
-            results.append(self.feed_forward(tests[t]))
-        correct = 0.0
-
-        for t in range(n_tests):
-            max = -1
-            ind = 0
-            for c in range(0, len(results[t])):
-                if results[t][c] > max:
-                    max = results[t][c]
-                    ind = c
-            res = 0
-            for c in range(1, len(expected[t])):
-                if expected[t][c] == 1:
-                    res = c
-            if res == ind:
-                correct += 1
-
-        return correct / n_tests
+        return self.evaluate_metrics(test_data)["accuracy"]
 
     # Performs SGD to network
     # Args:
     #   epochs - number of times to train network with on the entire training set
     #   mini_batch_size - how large each random batch of test cases should be before performing back propagation
-    #   training_inputs - a list of inputs (1D vectors) for the network
+    #   training_inputs - a list of inputs (1D vectors) for the network, or a ShardedDataset, Stream, or any other
+    #                     iterable of (input, expected output) examples if expected_outputs is None (with regularization,
+    #                     the Stream has to be given its size)
     #   expected_outputs - a list of expected outputs (1D vectors) for the network, in the order of th training inputs
     #   step_size - step size to be used while performing SGD
+    #   lmbda - the regularization parameter for "L1" and "L2" regularization
+    #   regularization_type - None, "L1", "L2", or a regularizer (such as ElasticNet) from functions
+    #   checkpointer - (BackgroundCheckpointer or IncrementalCheckpointer) optional, stepped after every update
+    #                  to checkpoint the network
+    #   progress - (function) optional, called with a report (a dictionary) after every epoch, see progress.py
+    #   evaluate_every - (int) optional, also evaluate on the test data (or the training set without it) every this
+    #                    many epochs, every epoch if test data is given and this is None
+    #   evaluation_size - (int) optional, evaluate on a fixed random subsample of this many training examples
+    # If the network holds a training state (restored from a checkpoint taken during training) it resumes from it
     def stochastic_gradient_descent(self, epochs, mini_batch_size, training_inputs, expected_outputs,
-                                    step_size, lmbda=0, regularization_type=None, test_input=None, test_output=None):
+                                    step_size, lmbda=0, regularization_type=None, test_input=None, test_output=None,
+                                    checkpointer=None, progress=print_progress, evaluate_every=None,
+                                    evaluation_size=None):
+        regularizer = make_regularizer(regularization_type, lmbda)
+
         # Bind input with its expected output
-        training_set_size = len(training_inputs)
-        training_data = []
-        for t in range(len(training_inputs)):
-            training_data.append([training_inputs[t], expected_outputs[t]])
-        if len(training_data) == 0:
-            return
+        if expected_outputs is None:
+            training_set = training_data(training_inputs)
+            training_set_size = training_set.size if isinstance(training_set, Stream) else len(training_set)
+            if training_set_size is None and regularizer is not None:
+                raise ValueError("Regularization needs the size of the training stream")
+        else:
+            training_set_size = len(training_inputs)
+            if training_set_size == 0:
+                return
+            training_set = ArrayDataset(training_inputs, expected_outputs)
 
         # If validation data exists, do the same with the validation set
         test_data = []
         if test_input:
             for i, o in zip(test_input, test_output):
                 test_data.append([i, o])
+            if evaluate_every is None:
+                evaluate_every = 1
 
         # Perform SGD
-        for iters in range(epochs):
-            random.shuffle(training_data)
-            mini_batches = [training_data[curr:curr+mini_batch_size] for curr in
-                            range(0, len(training_data), mini_batch_size)]
-            for batch in mini_batches:
-                self.__update_net_weights_biases(batch, step_size, lmbda, training_set_size, regularization_type)
-
-            if test_input:
-                print("Epoch:", iters+1, ", Percent correct:", self.evaluate(test_data))
-            else:
-                print("Epoch:", iters+1, ", Percent correct:", self.evaluate(mini_batches[0]))
+        state = start_training(self)
+        while state.epoch < epochs:
+            for batch in state.minibatches(training_set, mini_batch_size):
+                state.correct += self.__update_net_weights_biases(batch, step_size, training_set_size, regularizer)
+                if checkpointer is not None:
+                    checkpointer.step(self)
+
+            # Update with progress, using the outputs already computed by the training passes
+            report = {"network": "", "epoch": state.epoch+1, "accuracy": state.average_accuracy()}
+            if evaluation_due(state.epoch, evaluate_every):
+                if test_input:
+                    report["evaluation_accuracy"] = self.evaluate(test_data)
+                else:
+                    report["evaluation_accuracy"] = self.evaluate(evaluation_examples(training_set, evaluation_size))
+            progress(report)
+            state.end_epoch()
+        self.training_state = None
 
     # Returns all weights in the neural network (3D Array)
     def get_weights(self):
@@ -201,6 +269,14 @@ class FullyConnectedNet:
     def get_layer_sizes(self):
         return self.__layer_sizes
 
+    # Returns the cost function used by the network
+    def get_cost_function(self):
+        return self.__cost
+
+    # Returns the logistic function used by the network
+    def get_logistic_function(self):
+        return self.__logistic_func
+
     # Sets the network objects weights and biases as long as they are formatted correctly
     # Returns failure message if improper array sizes or returns 1D array of layer sizes if
     # the loading of the network is successful
@@ -221,8 +297,9 @@ class FullyConnectedNet:
                         return "Failed to set network due to improper weight and bias array sizes"
             else:
                 return "Failed to set network due to improper weight and bias array sizes"
+        # The updates change the weights and biases in place, so they have to be float arrays
         self.__n_layers = n_layers
-        self.__weights = weights
-        self.__biases = biases
+        self.__weights = [np.asarray(w, dtype=float) for w in weights]
+        self.__biases = [np.asarray(b, dtype=float) for b in biases]
         self.__layer_sizes = layer_sizes
         return layer_sizes
\ No newline at end of file
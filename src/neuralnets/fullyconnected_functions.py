@@ -1,8 +1,11 @@
 import numpy as np
+from functions import L2
+from functions import reduce_costs
+from functions import weight_deltas
 
 # Returns -1 if number is negative, 1 if positive, 0 if 0
 def sign (num):
-    return 1 if num > 0 else 0
+    return 1 if num > 0 else -1 if num < 0 else 0
 
 # -- TanH logistic function
 class TanH:
@@ -34,7 +37,7 @@ class SoftMax:
     @staticmethod
     def func(a):
         a = np.exp(a)
-        a /= sum(a)
+        a /= np.sum(a, axis=-1, keepdims=True)
         return a
 
     @staticmethod
@@ -50,9 +53,7 @@ class LeakyReLU:
     @staticmethod
     def func(a):
         if type(a) is np.ndarray:
-            for x in range(len(a)):
-                if a[x] < 0:
-                    a[x] *= 0.001
+            np.multiply(a, 0.001, out=a, where=a < 0)
         else:
             if a < 0:
                 a *= .001
@@ -61,8 +62,7 @@ class LeakyReLU:
     @staticmethod
     def func_deriv(a):
         if type(a) is np.ndarray:
-            for x in range(len(a)):
-                a[x] = 1 if a[x] > 0 else 0.001
+            a[...] = np.where(a > 0, 1, 0.001)
         else:
             if a < 0:
                 return 0.001
@@ -74,8 +74,7 @@ class ReLU:
     @staticmethod
     def func(a):
         if type(a) is np.ndarray:
-            for x in range(len(a)):
-                a[x] = max(0, a[x])
+            np.maximum(a, 0, out=a)
         else:
             if a < 0:
                 a = 0
@@ -84,8 +83,7 @@ class ReLU:
     @staticmethod
     def func_deriv(a):
         if type(a) is np.ndarray:
-            for x in range(len(a)):
-                a[x] = 1 if a[x] > 0 else 0
+            a[...] = a > 0
         else:
             if a < 0:
                 return 0
@@ -93,73 +91,96 @@ class ReLU:
         return a
 
 
+# The cost functions take a whole batch too, with the batched API of functions/cost_functions.py
+# (batch_cost and batch_delta, the batch on the first axis, optional sample weights)
 
 # -- Class defining quadratic cost
 class QuadraticCost:
     # Returns the cost for given vectors output and expected by C = sum(norm_sqrd(exp-out))/2(num_tests)
     @staticmethod
     def cost(outs, expected):
-        sum = 0;
-        for o, e in zip(outs, expected):
-            sum += (e-o)*(e-o)
-        return sum/(2*len(outs))
+        diff = np.asarray(expected) - outs
+        return np.sum(diff*diff)/(2.0*len(outs))
+
+    # Returns the costs of a batch of output and expected vectors, (batch size, num outputs), reduced by
+    # reduction ("none", "sum" or "mean") and weighted by sample_weights (see functions/cost_functions.py)
+    @staticmethod
+    def batch_cost(outs, expected, reduction="none", sample_weights=None):
+        diff = np.asarray(expected) - outs
+        return reduce_costs(np.sum(diff*diff, axis=1)/(2.0*outs.shape[1]), reduction, sample_weights)
 
     # Returns the cost for given network with L2 regularization
     @staticmethod
     def cost_with_L2_regularization(outs, expected, weights, lmbda, training_set_size):
-        sum = QuadraticCost.cost(outs, expected)
-        regularization_term = 0
-        for l1 in weights:
-            for l2 in l1:
-                for l3 in l2:
-                    regularization_term += l3*l3
-        regularization_term *= lmbda/(2*training_set_size)
-        return sum + regularization_term
+        return QuadraticCost.cost(outs, expected) + L2(lmbda).cost(weights, training_set_size)
 
     # Returns the error vector for the output layer by d = (a-y)*sig_p(z)
     @staticmethod
     def delta(a, y, z):
         return (a-y)*Sigmoid.func_deriv(z)
 
+    @staticmethod
+    def batch_delta(a, y, z, sample_weights=None):
+        return weight_deltas(QuadraticCost.delta(a, y, z), sample_weights)
+
 # -- Class defining cross entropy
 class CrossEntropy:
     # Returns the cost for given output and expected vectors by C = sum(y*ln(a) + (1-y)*ln(1-a))/num_tests
     @staticmethod
     def cost(outs, expected):
-        sum = 0
-        for o, e in zip(outs, expected):
-            sum += e*np.log(o) + (1-e)*np.log(1-o)
-        return sum/len(outs)
+        expected = np.asarray(expected)
+        return np.sum(expected*np.log(outs) + (1-expected)*np.log(1-outs))/float(len(outs))
+
+    # Returns the costs of a batch of output and expected vectors, (batch size, num outputs), reduced by
+    # reduction ("none", "sum" or "mean") and weighted by sample_weights (see functions/cost_functions.py)
+    @staticmethod
+    def batch_cost(outs, expected, reduction="none", sample_weights=None):
+        expected = np.asarray(expected)
+        costs = np.sum(expected*np.log(outs) + (1-expected)*np.log(1-outs), axis=1)/float(outs.shape[1])
+        return reduce_costs(costs, reduction, sample_weights)
 
     # Returns the cost with L2 regularization
     @staticmethod
     def cost_with_L2_regularization(outs, expected, weights, lmbda, training_set_size):
-        sum = CrossEntropy.cost(outs, expected)
-        regularization_term = 0
-        for l1 in weights:
-            for l2 in l1:
-                for l3 in l2:
-                    regularization_term += l3 * l3
-        regularization_term *= lmbda / (2 * training_set_size)
-        return sum + regularization_term
+        return CrossEntropy.cost(outs, expected) + L2(lmbda).cost(weights, training_set_size)
 
     # Returns the error vector for the output layer by d = a-y
     @staticmethod
     def delta(a, y, z):
         return (a-y)
 
+    @staticmethod
+    def batch_delta(a, y, z, sample_weights=None):
+        return weight_deltas(a-y, sample_weights)
+
 # -- Cost function
 class NegativeLogLikelihood:
     # Returns negative log likelihood cost for output a and expected output y
     @staticmethod
     def cost (a, y):
-        for o, e in zip (a, y):
-            if e == 1:
-                if o == 0:
-                    o += 0.0000000000000001
-                return -np.log(o)
+        hits = np.flatnonzero(np.asarray(y) == 1)
+        if len(hits) == 0:
+            return None
+        o = a[hits[0]]
+        if o == 0:
+            o += 0.0000000000000001
+        return -np.log(o)
+
+    # Returns the costs of a batch of outputs a and expected outputs y, (batch size, num outputs), reduced by
+    # reduction ("none", "sum" or "mean") and weighted by sample_weights (see functions/cost_functions.py)
+    # The cost of an example with no expected class is nan
+    @staticmethod
+    def batch_cost(a, y, reduction="none", sample_weights=None):
+        hits = np.asarray(y) == 1
+        o = a[np.arange(len(a)), np.argmax(hits, axis=1)]
+        o = np.where(o == 0, 0.0000000000000001, o)
+        return reduce_costs(np.where(np.any(hits, axis=1), -np.log(o), np.nan), reduction, sample_weights)
 
     # Returns the first error layer for the negative log likelihood function with out a and expected y
     @staticmethod
     def delta (a, y, z):
-        return (a-y)
\ No newline at end of file
+        return (a-y)
+
+    @staticmethod
+    def batch_delta(a, y, z, sample_weights=None):
+        return weight_deltas(a-y, sample_weights)
\ No newline at end of file
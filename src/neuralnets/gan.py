@@ -1,5 +1,10 @@
 from generator import Generator
 from discriminator import Discriminator
+from replay_buffer import ReplayBuffer
+from training_state import start_training
+from progress import print_progress
+
+import numpy as np
 
 class GAN:
     # Args:
@@ -14,6 +19,9 @@ class GAN:
 
         self.generator = Generator(generator_input_shape)
         self.discriminator = Discriminator(image_shape)
+        self.replay_buffer = None
+        # Round of train while training (TrainingState)
+        self.training_state = None
 
     # Trains the generator against the discriminator using stochastic gradient descent
     # Args:
@@ -22,29 +30,88 @@ class GAN:
     #   mini_batch_size (int) - number of training inputs per mini batch
     #   training set (list of tuples) - a list of tuples
     #                                   (training input (noise), desired output (fool the discriminator))
-    def train_generator(self, epochs, step_size, mini_batch_size, training_set):
+    #   progress (function) optional - called with a report (a dictionary) after every epoch, see progress.py
+    def train_generator(self, epochs, step_size, mini_batch_size, training_set, progress=print_progress):
         self.generator.stochastic_gradient_descent(epochs,
                                                    step_size,
                                                    mini_batch_size,
                                                    training_set,
-                                                   self.discriminator)
+                                                   self.discriminator,
+                                                   progress=progress)
 
     # Trains discriminator against the discriminator against real images and the generated images
     # Args:
     #   ...
     #   training_set (list of tuples) - list of tuples,
     #                                   (generated image/real image, expected output (from discriminator))
-    def train_discriminator(self, epochs, step_size, mini_batch_size, training_set):
+    #   progress (function) optional - called with a report (a dictionary) after every epoch, see progress.py
+    def train_discriminator(self, epochs, step_size, mini_batch_size, training_set, progress=print_progress):
         self.discriminator.stochastic_gradient_descent(epochs,
                                                        step_size,
                                                        mini_batch_size,
-                                                       training_set)
+                                                       training_set,
+                                                       progress=progress)
+
+    # Trains the discriminator and generator in alternating rounds, keeping generated images in a replay buffer
+    # Each round only refresh_fraction of the buffer is regenerated, then the discriminator trains on minibatches
+    # drawn by index from the real images and the buffer, and the generator trains against the discriminator
+    # Args:
+    #   rounds (int) - number of discriminator/generator rounds
+    #   real_images (4D np array) - (num real images, image depth, image height, image length)
+    #   noise_set (list of tuples) - the generator training set, (noise, desired output (fool the discriminator))
+    #   real_output (np array) - expected discriminator output for real images
+    #   fake_output (np array) - expected discriminator output for generated images
+    #   buffer_capacity (int) - number of generated images kept
+    #   refresh_fraction (float) - fraction of the buffer replaced by new generated images every round
+    #   discriminator_epochs, generator_epochs (int) - epochs per round for each network
+    #   discriminator_step_size, generator_step_size (float)
+    #   mini_batch_size (int) - number of training inputs per mini batch for both networks
+    #   checkpointer (BackgroundCheckpointer or IncrementalCheckpointer) optional - stepped after every round to
+    #                  checkpoint the whole GAN
+    #   progress (function) optional - called with a report (a dictionary) after every epoch of either network
+    # A GAN restored from a checkpoint taken during train (which holds the replay buffer) resumes at the next round
+    def train(self, rounds, real_images, noise_set, real_output, fake_output, buffer_capacity, refresh_fraction=0.25,
+              discriminator_epochs=1, discriminator_step_size=0.0001, generator_epochs=1, generator_step_size=0.0002,
+              mini_batch_size=50, checkpointer=None, progress=print_progress):
+        if self.replay_buffer is None or self.replay_buffer.capacity != buffer_capacity:
+            self.replay_buffer = ReplayBuffer(buffer_capacity, self.image_shape)
+        real_images = np.asarray(real_images, dtype=float)
+        num_refresh = max(1, int(buffer_capacity*refresh_fraction))
+
+        state = start_training(self)
+        while state.epoch < rounds:
+            # Fill the buffer on the first round, afterwards only replace the oldest part of it
+            num_new = num_refresh if self.replay_buffer.is_full() else buffer_capacity - len(self.replay_buffer)
+            noise = np.random.randn(*((num_new,) + tuple(self.generator_input_shape)))
+            self.replay_buffer.add(self.generate_images(noise))
+
+            self.discriminator.train_with_replay(discriminator_epochs,
+                                                 discriminator_step_size,
+                                                 mini_batch_size,
+                                                 real_images,
+                                                 real_output,
+                                                 self.replay_buffer,
+                                                 fake_output,
+                                                 progress=progress)
+            self.train_generator(generator_epochs, generator_step_size, mini_batch_size, noise_set, progress=progress)
+            state.end_epoch()
+            if checkpointer is not None:
+                checkpointer.step(self)
+        self.training_state = None
 
     # Generates an image from noise using the current generator
     # Args:
     #   noise (3D np array)
     def generate_image(self, noise):
-        return self.generator.feed_forward(noise)
+        return self.generator.feedforward(noise)
+
+    # Generates a batch of images from a batch of noise in one pass through the generator
+    # Args:
+    #   noise_batch (4D np array) - (batch size, noise depth, noise height, noise length)
+    #   store_state (bool) - if False, no activations are kept for backprop
+    # Returns a contiguous (batch size, image depth, image height, image length) np array
+    def generate_images(self, noise_batch, store_state=False):
+        return np.ascontiguousarray(self.generator.feedforward_batch(noise_batch, store_state))
 
     # Adds layer to generator
     # Args:
@@ -52,7 +119,7 @@ class GAN:
     #   output_size (tuple) - input None if conv layer, else desired output image shape
     #   kernel_size (tuple) - (num of kernels, kernel height, kernel length)
     def add_layer_to_generator(self, layer_type, output_size, kernel_size):
-        self.generator.add(layer_type, output_size, kernel_size)
+        self.generator.addlayer(layer_type, output_size, kernel_size)
 
     # Adds layer to discriminator
     # Args:
@@ -61,15 +128,24 @@ class GAN:
     #                               number of neurons if dense/soft
     #   kernel_size (tuple) - if soft/dense, None, else (num of kernels, kernel height, kernel length)
     def add_layer_to_discriminator(self, layer_type, output_size, kernel_size=None):
-        self.discriminator.add(layer_type, output_size, kernel_size)
+        self.discriminator.addlayer(layer_type, output_size, kernel_size)
+
+    # Starts timing every layer of both networks, returning their LayerProfilers (generator, discriminator),
+    # see profiling.py
+    def enable_profiling(self):
+        return self.generator.enable_profiling(), self.discriminator.enable_profiling()
+
+    # Stops timing the layers of both networks, returning the LayerProfilers that were used
+    def disable_profiling(self):
+        return self.generator.disable_profiling(), self.discriminator.disable_profiling()
 
     # Feeds image through generator
     def generator_feed_forward (self, network_input):
-        return self.generator.feed_forward(network_input)
+        return self.generator.feedforward(network_input)
 
     # Feeds image through discriminator
     def discriminator_feed_forward(self, network_input):
-        return self.discriminator.feed_forward(network_input)
+        return self.discriminator.feedforward(network_input)
 
     def get_image_shape(self):
         return self.image_shape
@@ -12,10 +12,19 @@ from functions import NegativeLogLikelihood
 from functions import LeakyRELU
 from functions import Softmax
 
-from random import shuffle
 from copy import deepcopy
 
 from convolutional import ConvolutionalNet
+from profiling import FORWARD
+from profiling import BACKWARD
+from profiling import UPDATE
+from training_state import start_training
+from progress import print_progress
+from progress import evaluation_due
+from progress import evaluation_examples
+from datasets import training_data
+from evaluation import evaluate_batches
+from evaluation import DEFAULT_CHUNK_SIZE
 
 # Makes a 3D np array into a 1D np array
 def flatten_image(image):
@@ -51,10 +60,15 @@ class Generator (ConvolutionalNet):
         self.layer_types = []
         self.num_layers = 0
         self.layers = []
+        self.forward_cache = None
+        self.training_state = None
+        self.profiler = None
         if layers is not None:
             self.layers = layers
+            self.num_layers = len(layers)
 
-    # This function calculates the gradients for one training example
+    # This function calculates the gradients and the discriminators cost for one training example
+    # The discriminator is run forward once, and that pass gives both the cost and the deltas
     # Args:
     #   network_input - (np arr) the input being used
     #   discriminator_network (object)
@@ -64,12 +78,15 @@ class Generator (ConvolutionalNet):
         dzs_list = [network_input]
 
         is_conv = False
-        if self.layer_types[0] is "conv" or self.layer_types[0] is "deconv":
+        if self.layer_types[0] == "conv" or self.layer_types[0] == "deconv":
             is_conv = True
 
+        profiler = self.profiler
         for i, lt, lyr in zip(range(1, self.num_layers + 1), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
             # Squash to 1D np array
-            if lt is not "conv" and lt is not "deconv" and is_conv:
+            if lt != "conv" and lt != "deconv" and is_conv:
                 is_conv = False
                 curr_z = flatten_image(curr_z)
 
@@ -78,24 +95,39 @@ class Generator (ConvolutionalNet):
 
             curr_z = lyr.activation_function.func(curr_z)
             fzs_list.append(deepcopy(curr_z))
+            if profiler is not None:
+                profiler.record(i-1, FORWARD, start)
 
-        delta = discriminator_network.getdeltas(deepcopy(curr_z), expected_output)
+        cost, delta = discriminator_network.cost_and_deltas(deepcopy(curr_z), expected_output, dzs_list[-1])
+        delta_w, delta_b = self.backprop_deltas(fzs_list, dzs_list, delta)
 
+        return delta_w, delta_b, cost
+
+    # Returns the gradients for one training example given its activations and the deltas of the last layer
+    # Args:
+    #   fzs_list - (list of np arrs) the input and the squashed activations of every layer
+    #   dzs_list - (list of np arrs) the input and the activation derivatives of every layer
+    #   delta - (np arr) errors of the last layer
+    def backprop_deltas(self, fzs_list, dzs_list, delta):
         is_conv = True
-        if self.layer_types[-1] is not "conv" \
-                and self.layer_types[-1] is not "deconv":
+        if self.layer_types[-1] != "conv" \
+                and self.layer_types[-1] != "deconv":
             is_conv = False
 
         delta_w = []
         delta_b = []
 
         # Append all the errors for each layer
-        for lt, lyr, fzs, dzs in reversed(zip(self.layer_types, self.layers, fzs_list[:-1], dzs_list[:-1])):
-            if lt is "conv" or lt is "deconv":
+        profiler = self.profiler
+        for i, lt, lyr, fzs, dzs in reversed(zip(range(self.num_layers), self.layer_types, self.layers,
+                                                 fzs_list[:-1], dzs_list[:-1])):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "conv" or lt == "deconv":
                 if not is_conv:
                     delta = convert_to_image(delta, lyr.get_output_shape())
                     is_conv = True
-            elif lt is "dense" or lt is "soft":
+            elif lt == "dense" or lt == "soft":
                 fzs = flatten_image(fzs)
                 dzs = flatten_image(dzs)
             dw, db, dlt = lyr.backprop(fzs, dzs, delta)
@@ -103,50 +135,92 @@ class Generator (ConvolutionalNet):
             delta_b.insert(0, db)
 
             delta = dlt
+            if profiler is not None:
+                profiler.record(i, BACKWARD, start)
 
         return np.array(delta_w), np.array(delta_b)
 
     # Updates the network given a specific minibatch (done by averaging gradients over the minibatch)
+    # Returns the total discriminator cost of the minibatch, measured before the update
     # Args:
     #   mini_batch - a list of np arrays (inputs)
     #   step_size - the amount the network should change its parameter`s by relative to the gradients
     def update_network(self, mini_batch, step_size, discriminator_network):
-        gradient_w, gradient_b = self.backprop(mini_batch[0][0], mini_batch[0][1], discriminator_network)
-
-        for inp, outp in mini_batch[1:]:
-            dgw, dgb = self.backprop(inp, outp, discriminator_network)
+        # Run the whole minibatch through the generator, then get the deltas at the discriminators
+        # input for every generated image at once
+        images = self.feedforward_batch([inp for inp, outp in mini_batch], store_state=True)
+        fzs_list, dzs_list = self.forward_cache
+        self.forward_cache = None
+        costs, deltas = discriminator_network.cost_and_deltas_batch(images,
+                                                                    [outp for inp, outp in mini_batch],
+                                                                    dzs_list[-1])
+
+        gradient_w, gradient_b = self.backprop_deltas([f[0] for f in fzs_list], [d[0] for d in dzs_list], deltas[0])
+        for i in range(1, len(mini_batch)):
+            dgw, dgb = self.backprop_deltas([f[i] for f in fzs_list], [d[i] for d in dzs_list], deltas[i])
             gradient_w += dgw
             gradient_b += dgb
+        total_cost = np.sum(costs)
 
         # Average the gradients
         gradient_w *= step_size/(len(mini_batch)+0.00)
         gradient_b *= step_size/(len(mini_batch)+0.00)
 
         # Update weights and biases in opposite direction of gradients
-        for gw, gb, lyr in zip(gradient_w, gradient_b, self.layers):
+        profiler = self.profiler
+        for i, gw, gb, lyr in zip(range(self.num_layers), gradient_w, gradient_b, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
             lyr.update(-gw, -gb)
+            if profiler is not None:
+                profiler.record(i, UPDATE, start)
+
+        return total_cost
+
+    # Evaluates the generator against the discriminator with batched forward passes through both networks,
+    # the metrics are those of the discriminator outputs (see evaluation.py)
+    # Args:
+    #   examples - an iterable of (input (noise), desired output (from the discriminator)) examples
+    #   discriminator_network (Discriminator)
+    #   chunk_size, top_k, confusion - as for NeuralNetwork.evaluate_metrics
+    def evaluate_metrics(self, examples, discriminator_network, chunk_size=DEFAULT_CHUNK_SIZE, top_k=None,
+                         confusion=False):
+        def forward(noise):
+            return discriminator_network.feedforward_batch(self.feedforward_batch(noise))
+        return evaluate_batches(forward, examples, discriminator_network.cost_function, chunk_size, top_k, confusion)
 
     # Evaluates the average cost across the training set
     def evaluate_cost(self, training_set, discriminator_network):
-        total = 0.0
-        for inp, outp in training_set:
-            net_outp = self.feedforward(inp)
-            total += discriminator_network.cost_function.cost(discriminator_network.feedforward(net_outp), outp)
-
-        return total/len(training_set)
+        return self.evaluate_metrics(training_set, discriminator_network)["cost"]
 
     # Performs SGD on the network
     # Args:
     #   epochs - (int), number of times to loop over the entire batch
     #   step_size - (float), amount network should change its parameters per update
     #   mini_batch_size - (int), number of training examples per mini batch
-    #   training_inputs - (list), the list of training inputs
-    #   expected_outputs - (list), the list of expected outputs for each input
-    def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_set, discriminator_network):
+    #   training_set - (list of tuples), (input, expected output) examples, or a Stream or any other iterable of them
+    #   checkpointer - (BackgroundCheckpointer or IncrementalCheckpointer) optional, stepped after every update
+    #                  to checkpoint the network
+    #   progress - (function) optional, called with a report (a dictionary) after every epoch, see progress.py
+    #   evaluate_every - (int) optional, also evaluate on the training set every this many epochs
+    #   evaluation_size - (int) optional, evaluate on a fixed random subsample of this many examples
+    # If the network holds a training state (restored from a checkpoint taken during training) it resumes from it
+    def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_set, discriminator_network,
+                                    checkpointer=None, progress=print_progress, evaluate_every=None, evaluation_size=None):
+        training_set = training_data(training_set)
+
         # Train
-        for ep in range(epochs):
-            shuffle(training_set)
-            for x in range(0, len(training_set), mini_batch_size):
-                self.update_network(training_set[x:x+mini_batch_size], step_size, discriminator_network)
-            # Update with progress
-            print("Generator Epoch: %d   Average cost: %f" % (ep+1, self.evaluate_cost(training_set, discriminator_network)))
\ No newline at end of file
+        state = start_training(self)
+        while state.epoch < epochs:
+            for mini_batch in state.minibatches(training_set, mini_batch_size):
+                state.cost += self.update_network(mini_batch, step_size, discriminator_network)
+                if checkpointer is not None:
+                    checkpointer.step(self)
+            # Update with progress, using the costs already computed by the training passes
+            report = {"network": "Generator", "epoch": state.epoch+1, "cost": state.average_cost()}
+            if evaluation_due(state.epoch, evaluate_every):
+                report["evaluation_cost"] = self.evaluate_cost(evaluation_examples(training_set, evaluation_size),
+                                                               discriminator_network)
+            progress(report)
+            state.end_epoch()
+        self.training_state = None
\ No newline at end of file
@@ -0,0 +1,195 @@
+from convolutional_framework import ConvolutionalFramework
+from gan import GAN
+from generator import Generator
+from recurrent import RecurrentNet
+from fullyconnected import FullyConnectedNet
+from profiling import layer_names
+
+import numpy as np
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Memory accounting of one training step
+#
+# memory_report works out from the shapes of a network, without running it, how many bytes every layer
+# holds during one update of a minibatch of batch_size examples:
+#   "parameters" - weights and biases
+#   "gradients" - the gradients of the update (for the networks that backprop one example at a time, the
+#                 running sum over the minibatch and the gradients of the example being added)
+#   "activations" - what the forward pass keeps for the backward pass, for as many examples as the network
+#                   keeps at once: one for ConvolutionalNet, Discriminator and FullyConnectedNet (which backprop
+#                   one example at a time), the whole minibatch for Generator (batched forward pass) and for
+#                   RecurrentNet (a minibatch is one sequence of timesteps)
+#   "optimizer_state" - the velocity ConvolutionalNet and Discriminator keep between updates
+#   "total" - all of the above
+# A Generator step also runs the minibatch through the discriminator it trains against, which keeps the
+# derivatives of every layer for the whole minibatch until the deltas reach its input. Given that discriminator
+# the report adds a "discriminator ..." row per layer for that cache and for its parameters and velocity, which
+# stay in memory without being updated. A GAN report has the rows of a generator step for the generator layers,
+# and for every discriminator layer the larger of what a generator step and a discriminator step keep of it;
+# the two steps alternate, so its total is an upper bound of either step.
+# Temporary copies that only live inside one layer (padded images, deep copies of activations) are not
+# counted, so a real step peaks somewhat higher. Given a step function, memory_report also measures the
+# peak of a real step, see measure_step_memory.
+
+# Bytes of one value, every network holds float64 arrays
+ITEMSIZE = np.dtype(float).itemsize
+
+# Activations cached per neuron per timestep by the layers of a RecurrentNet, the layer input and past
+# state for every layer plus the gates kept by the gated layers
+RECURRENT_CACHE = {"soft": 1, "recurr": 2, "gru": 7, "lstm": 8}
+
+# Returns (number of parameters, number of outputs) of a layer of a ConvolutionalFramework
+def framework_layer_size(layer_type, layer):
+    if layer_type == "conv" or layer_type == "deconv":
+        num_kernels, depth, height, length = layer.kernel_shape
+        return num_kernels*(depth*height*length + 1), int(np.prod(layer.get_output_shape()))
+    return layer.output_shape*(layer.input_shape + 1), layer.output_shape
+
+# Returns (number of parameters, number of outputs) of a layer of a RecurrentNet
+def recurrent_layer_size(layer_type, layer):
+    if layer_type == "soft":
+        return layer.output_shape*(layer.input_shape + 1), layer.output_shape
+    num_neurons, num_inputs = layer.layer_shape
+    num_gates = getattr(layer, "num_gates", 1)
+    return num_gates*num_neurons*(num_inputs + num_neurons + 1), num_neurons
+
+# Returns a row of the report, every count is a number of values
+def layer_row(name, parameters, gradients, activations, optimizer_state):
+    row = {"name": name,
+           "parameters": parameters*ITEMSIZE,
+           "gradients": gradients*ITEMSIZE,
+           "activations": activations*ITEMSIZE,
+           "optimizer_state": optimizer_state*ITEMSIZE}
+    row["total"] = row["parameters"] + row["gradients"] + row["activations"] + row["optimizer_state"]
+    return row
+
+# Returns the rows of the discriminator layers during a generator step, see the top of the file
+def discriminator_cache_rows(discriminator, batch_size):
+    rows = []
+    for name, lt, lyr in zip(layer_names(discriminator.layer_types), discriminator.layer_types, discriminator.layers):
+        parameters, outputs = framework_layer_size(lt, lyr)
+        rows.append(layer_row("discriminator " + name, parameters, 0, outputs*batch_size, parameters))
+    return rows
+
+# Returns the rows of every layer of a network
+# Args:
+#   discriminator (Discriminator) optional - for a Generator, the discriminator it trains against
+def layer_rows(network, batch_size, discriminator=None):
+    rows = []
+    if isinstance(network, GAN):
+        for row in layer_rows(network.generator, batch_size):
+            row["name"] = "generator " + row["name"]
+            rows.append(row)
+        for generator_step, discriminator_step in zip(discriminator_cache_rows(network.discriminator, batch_size),
+                                                      layer_rows(network.discriminator, batch_size)):
+            row = {"name": generator_step["name"]}
+            for key in ("parameters", "gradients", "activations", "optimizer_state"):
+                row[key] = max(generator_step[key], discriminator_step[key])
+            row["total"] = row["parameters"] + row["gradients"] + row["activations"] + row["optimizer_state"]
+            rows.append(row)
+    elif isinstance(network, Generator):
+        # Gradients are summed one example at a time, the forward pass keeps the squashed activations and
+        # their derivatives of the whole minibatch
+        for name, lt, lyr in zip(layer_names(network.layer_types), network.layer_types, network.layers):
+            parameters, outputs = framework_layer_size(lt, lyr)
+            rows.append(layer_row(name, parameters, 2*parameters, 2*outputs*batch_size, 0))
+        if discriminator is not None:
+            rows += discriminator_cache_rows(discriminator, batch_size)
+    elif isinstance(network, ConvolutionalFramework):
+        # Backprop keeps the squashed activations and their derivatives of one example, and update_network
+        # keeps a velocity between updates whether momentum is used or not
+        for name, lt, lyr in zip(layer_names(network.layer_types), network.layer_types, network.layers):
+            parameters, outputs = framework_layer_size(lt, lyr)
+            rows.append(layer_row(name, parameters, 2*parameters, 2*outputs, parameters))
+    elif isinstance(network, RecurrentNet):
+        # The minibatch is one sequence, backprop_sequence returns the gradients summed over it
+        for name, lt, lyr in zip(layer_names(network.layer_types), network.layer_types, network.layers):
+            parameters, outputs = recurrent_layer_size(lt, lyr)
+            rows.append(layer_row(name, parameters, parameters, RECURRENT_CACHE[lt]*outputs*batch_size, 0))
+    elif isinstance(network, FullyConnectedNet):
+        # Backprop keeps the activations, squashed activations and derivatives of one example
+        sizes = network.get_layer_sizes()
+        for name, num_inputs, num_neurons in zip(layer_names(["dense"]*(len(sizes)-1)), sizes[:-1], sizes[1:]):
+            parameters = num_neurons*(num_inputs + 1)
+            rows.append(layer_row(name, parameters, 2*parameters, 3*num_neurons, 0))
+    else:
+        raise TypeError("No memory accounting for %s" % network.__class__.__name__)
+    return rows
+
+# Returns the peak memory of a real step, {"peak_bytes": bytes allocated at the peak above the start,
+# "method": how it was measured}
+# With tracemalloc (Python 3) every allocation is traced ("tracemalloc"), otherwise the peak resident memory
+# of the process is reset and read from /proc (Linux, "rss"), which is coarser as small arrays reuse memory
+# that was already resident
+# Args:
+#   step (function) - runs the step, called without arguments
+def measure_step_memory(step):
+    if tracemalloc is not None:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.clear_traces()
+        step()
+        current, peak = tracemalloc.get_traced_memory()
+        if not was_tracing:
+            tracemalloc.stop()
+        return {"peak_bytes": peak, "method": "tracemalloc"}
+
+    try:
+        # Writing 5 resets the peak resident memory (VmHWM) to the current resident memory
+        clear_refs = open("/proc/self/clear_refs", "w")
+        clear_refs.write("5")
+        clear_refs.close()
+        start = process_memory("VmRSS")
+        step()
+        return {"peak_bytes": max(process_memory("VmHWM") - start, 0), "method": "rss"}
+    except (IOError, OSError):
+        raise RuntimeError("Measuring a step needs tracemalloc (Python 3) or /proc (Linux)")
+
+# Returns a memory figure of this process from /proc/self/status in bytes ("VmRSS", "VmHWM", ...)
+def process_memory(field):
+    status = open("/proc/self/status")
+    try:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])*1024
+    finally:
+        status.close()
+    raise RuntimeError("/proc/self/status has no %s" % field)
+
+# Returns the memory one training step of a network needs, per layer, see the top of the file:
+#   {"network": class name, "batch_size": batch_size, "layers": [row per layer], "total": row of the sums}
+#   every row holds "parameters", "gradients", "activations", "optimizer_state" and "total" in bytes
+#   and "measured" is added if a step is given
+# Args:
+#   network - a GAN, ConvolutionalNet, Generator, Discriminator, RecurrentNet or FullyConnectedNet
+#   batch_size (int) - number of examples per minibatch (timesteps per sequence for a RecurrentNet)
+#   step (function) optional - runs one real training step of the network, to measure its peak
+#   discriminator (Discriminator) optional - for a Generator, the discriminator it trains against
+def memory_report(network, batch_size, step=None, discriminator=None):
+    rows = layer_rows(network, batch_size, discriminator)
+    total = {"name": "total"}
+    for key in ("parameters", "gradients", "activations", "optimizer_state", "total"):
+        total[key] = sum(row[key] for row in rows)
+
+    report = {"network": network.__class__.__name__, "batch_size": batch_size, "layers": rows, "total": total}
+    if step is not None:
+        report["measured"] = measure_step_memory(step)
+    return report
+
+# Returns a memory report as a printable table, sizes in KB
+def format_memory_report(report):
+    keys = ("parameters", "gradients", "activations", "optimizer_state", "total")
+    width = max([len(row["name"]) for row in report["layers"]] + [len("layer"), len("total")])
+    lines = ["%s, batch size %d (KB)" % (report["network"], report["batch_size"]),
+             "%-*s" % (width, "layer") + "".join("  %15s" % key for key in keys)]
+    for row in report["layers"] + [report["total"]]:
+        lines.append("%-*s" % (width, row["name"]) + "".join("  %15.1f" % (row[key]/1024.0) for key in keys))
+    if "measured" in report:
+        lines.append("measured peak of a step (%s): %.1f KB" % (report["measured"]["method"],
+                                                                report["measured"]["peak_bytes"]/1024.0))
+    return "\n".join(lines)
@@ -1,4 +1,8 @@
 from abc import ABCMeta, abstractmethod
+from evaluation import evaluate_batches
+from evaluation import DEFAULT_CHUNK_SIZE
+from profiling import LayerProfiler
+from profiling import layer_names
 class NeuralNetwork(object):
     def __init__(self, network_type, cost_function, layers=None):
         __metaclass__ = ABCMeta
@@ -7,6 +11,10 @@ class NeuralNetwork(object):
         self.layers=[]
         self.num_layers=0
         self.velocity=None
+        # Position of the training loop while training (TrainingState)
+        self.training_state=None
+        # Per layer timings (LayerProfiler) while profiling, see profiling.py
+        self.profiler=None
 
         if layers is not None:
             self.layers=layers
@@ -15,13 +23,31 @@ class NeuralNetwork(object):
     def reset_velocity(self):
         self.velocity=None
 
-    # Evaluates the average cost across the training set
+    # Starts timing every layer of the network (after the layers have been added), returning the LayerProfiler
+    # the timings go to, see profiling.py
+    def enable_profiling(self):
+        self.profiler = LayerProfiler(layer_names(self.layer_types), type(self).__name__)
+        return self.profiler
+
+    # Stops timing the layers, returning the LayerProfiler that was used (None if profiling was off)
+    def disable_profiling(self):
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
+    # Evaluates the network on a set of examples with batched forward passes of chunk_size examples, returning
+    # the mean cost, the accuracy, and optionally the top k accuracy and the confusion matrix (see evaluation.py)
+    # Args:
+    #   examples - an ArrayDataset, a ShardedDataset, a Stream, or any other iterable of (input, expected output)
+    #   chunk_size (int) - number of examples per forward pass
+    #   top_k (int) optional - also measure the top k accuracy
+    #   confusion (bool) - also build the confusion matrix
+    def evaluate_metrics(self, examples, chunk_size=DEFAULT_CHUNK_SIZE, top_k=None, confusion=False):
+        return evaluate_batches(self.feedforward_batch, examples, self.cost_function, chunk_size, top_k, confusion)
+
+    # Evaluates the average cost across the training set (any iterable of (input, expected output) tuples),
+    # nan if it is empty (as a generator is once it has been read)
     def evaluate_cost(self, training_set):
-        total = 0.0
-        for inp, outp in training_set:
-            net_outp = self.feedforward(inp)
-            total += self.cost_function.cost(net_outp, outp)
-        return total/len(training_set)
+        return self.evaluate_metrics(training_set)["cost"]
 
     @abstractmethod
     def feedforward(self, inputs):
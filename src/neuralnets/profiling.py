@@ -0,0 +1,77 @@
+import timeit
+
+# Per layer profiling of the forward, backward, and update passes of a network
+#
+# Profiling is off by default. network.enable_profiling() gives the network a LayerProfiler, and from then
+# on its passes time every layer they run and count the calls, until network.disable_profiling(). While it is
+# off the passes only check that the network has no profiler, one comparison per layer.
+#
+# A forward call of a layer covers its activations and activation function (and their derivatives when
+# training), a backward call the gradients and the deltas of one example (or one batch/sequence on the
+# batched paths), and an update call the change of its parameters. Work done for the whole network (the
+# cost, averaging gradients, momentum, regularization) is not part of any layer.
+
+FORWARD = 0
+BACKWARD = 1
+UPDATE = 2
+PHASES = ("forward", "backward", "update")
+
+class LayerProfiler:
+    # Args:
+    #   layer_names (list of strings) - a name for every layer of the network, in order
+    #   network (string) optional - name of the network, shown in the summary
+    def __init__(self, layer_names, network=""):
+        self.layer_names = list(layer_names)
+        self.network = network
+        self.clock = timeit.default_timer
+        self.reset()
+
+    # Clears every time and count
+    def reset(self):
+        self.seconds = [[0.0]*len(PHASES) for name in self.layer_names]
+        self.calls = [[0]*len(PHASES) for name in self.layer_names]
+
+    # Adds one call of a layer in a phase that started at start (a time from clock)
+    # Args:
+    #   layer (int) - index of the layer
+    #   phase (int) - FORWARD, BACKWARD, or UPDATE
+    #   start (float) - the clock when the call started
+    def record(self, layer, phase, start):
+        self.seconds[layer][phase] += self.clock() - start
+        self.calls[layer][phase] += 1
+
+    # Returns the measurements as a dictionary:
+    #   "network" (string) - name of the network
+    #   "seconds" (float) - time spent in the layers, all phases together
+    #   "layers" (list of dictionaries) - for every layer in order, its "name", its total "seconds", and for
+    #                                     every phase ("forward", "backward", "update") {"calls", "seconds"}
+    def summary(self):
+        layers = []
+        for name, seconds, calls in zip(self.layer_names, self.seconds, self.calls):
+            layer = {"name": name, "seconds": sum(seconds)}
+            for p, phase in enumerate(PHASES):
+                layer[phase] = {"calls": calls[p], "seconds": seconds[p]}
+            layers.append(layer)
+        return {"network": self.network, "seconds": sum(layer["seconds"] for layer in layers), "layers": layers}
+
+    # Returns the measurements as a printable table, one row per layer, times in milliseconds
+    def table(self):
+        summary = self.summary()
+        width = max([len(name) for name in self.layer_names] + [len("layer")])
+        lines = []
+        if self.network:
+            lines.append(self.network)
+        lines.append("%-*s" % (width, "layer") + "".join("  %9s %11s" % (phase + " n", "ms")
+                                                         for phase in PHASES) + "  %11s  %6s" % ("total ms", "share"))
+        for layer in summary["layers"]:
+            line = "%-*s" % (width, layer["name"])
+            for phase in PHASES:
+                line += "  %9d %11.3f" % (layer[phase]["calls"], layer[phase]["seconds"]*1e3)
+            share = layer["seconds"] / summary["seconds"] if summary["seconds"] else 0.0
+            line += "  %11.3f  %5.1f%%" % (layer["seconds"]*1e3, share*100)
+            lines.append(line)
+        return "\n".join(lines)
+
+# Returns a name for every layer of a network with layer types, "<index> <type>"
+def layer_names(layer_types):
+    return ["%d %s" % (i, lt) for i, lt in enumerate(layer_types)]
@@ -0,0 +1,50 @@
+from datasets import Stream
+
+from itertools import islice
+import numpy as np
+
+# Progress reporting of the training loops
+#
+# After every epoch the training loops call a progress function with a dictionary:
+#   "network" (string) - which network is training ("Generator", "Discriminator", or "" for a standalone network)
+#   "epoch" (int) - the epoch that just finished, counting from 1
+#   "cost" (float) - average cost of the examples of the epoch, accumulated during the training pass
+#   "accuracy" (float) - for FullyConnectedNet instead of cost, the fraction of the examples of the epoch
+#                        classified correctly during the training pass
+#   "evaluation_cost" / "evaluation_accuracy" (float) - only on epochs where a full evaluation was asked for
+#                                                       (every evaluate_every epochs), the same measured on the
+#                                                       training set (or a subsample of it) after the epoch
+
+# Default progress function, prints the report on one line
+def print_progress(report):
+    line = "Epoch: %d" % report["epoch"]
+    if report.get("network"):
+        line = report["network"] + " " + line
+    for key, name in (("cost", "Average cost"), ("accuracy", "Percent correct"),
+                      ("evaluation_cost", "Evaluation cost"), ("evaluation_accuracy", "Evaluation percent correct")):
+        if key in report:
+            line += "   %s: %f" % (name, report[key])
+    print(line)
+
+# Returns whether the epoch that just finished (counting from 0) should be fully evaluated
+# Args:
+#   evaluate_every (int) optional - evaluate every this many epochs, never if None
+def evaluation_due(epoch, evaluate_every):
+    return evaluate_every is not None and (epoch + 1) % evaluate_every == 0
+
+# Returns the examples a full evaluation runs on
+# The subsample is drawn with its own fixed seed, so it is the same every epoch (and the numbers are comparable)
+# and drawing it does not change the random numbers training uses
+# Args:
+#   training_set - the training set (ArrayDataset, ShardedDataset, Stream, or list of examples)
+#   evaluation_size (int) optional - number of examples to evaluate, all of them if None
+#   contiguous (bool) - take the first evaluation_size examples instead of a random subsample (for sequences)
+def evaluation_examples(training_set, evaluation_size=None, contiguous=False):
+    if evaluation_size is None:
+        return training_set
+    if isinstance(training_set, Stream) or contiguous:
+        return list(islice(iter(training_set), evaluation_size))
+    if evaluation_size >= len(training_set):
+        return training_set
+    indices = np.random.RandomState(0).choice(len(training_set), evaluation_size, replace=False)
+    return [training_set[i] for i in np.sort(indices)]
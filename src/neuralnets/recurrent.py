@@ -1,14 +1,74 @@
 from layers import SoftmaxLayer
 from layers import RecurrentLayer
+from layers import GRULayer
+from layers import LSTMLayer
 
 from functions import NegativeLogLikelihood
 from functions import Softmax
 from functions import LeakyRELU
 
+from training_state import start_training
+from progress import print_progress
+from progress import evaluation_due
+from progress import evaluation_examples
+from datasets import training_data
+from datasets import Stream
+from evaluation import evaluate_batches
+from evaluation import DEFAULT_CHUNK_SIZE
+from profiling import LayerProfiler
+from profiling import layer_names
+from profiling import FORWARD
+from profiling import BACKWARD
+from profiling import UPDATE
+
 from copy import deepcopy
 import numpy as np
 from random import shuffle
 
+# Layer types whose layers carry a past state
+recurrent_layer_types = ("recurr", "gru", "lstm")
+
+# Numerically stable softmax over the last axis of a batch of activations
+def batch_softmax(z):
+    z = np.exp(z - np.max(z, axis=-1, keepdims=True))
+    return z / np.sum(z, axis=-1, keepdims=True)
+
+# Numerically stable log softmax over the last axis of a batch of activations
+def batch_log_softmax(z):
+    z = z - np.max(z, axis=-1, keepdims=True)
+    return z - np.log(np.sum(np.exp(z), axis=-1, keepdims=True))
+
+# Samples one token index per row of a batch of logits
+# Args:
+#   logits (2D np arr) - (batch size, num tokens) unnormalized log probabilities
+#   temperature (float) - values below 1 sharpen the distribution, values above 1 flatten it
+#   top_k (int) optional - if given, only the k most likely tokens of each row can be sampled
+def sample_tokens(logits, temperature=1.0, top_k=None):
+    logits = logits / float(temperature)
+    if top_k is not None and top_k < logits.shape[1]:
+        kth_largest = np.partition(logits, -top_k, axis=1)[:, -top_k]
+        logits = np.where(logits < kth_largest[:, None], -np.inf, logits)
+
+    cumulative = np.cumsum(batch_softmax(logits), axis=1)
+    draws = np.random.random_sample((len(logits), 1)) * cumulative[:, -1:]
+    return np.minimum(np.sum(cumulative < draws, axis=1), logits.shape[1]-1)
+
+# Hidden states of every recurrent layer for a batch of sequences being decoded in parallel
+class StateCache:
+    # Args:
+    #   states (list of 2D np arrs) - one (batch size, state size) array per recurrent layer
+    #   batch_size (int) - number of sequences held in the cache
+    def __init__(self, states, batch_size):
+        self.states = states
+        self.batch_size = batch_size
+
+    # Returns a new cache whose rows are copied from the given rows of this cache, used to
+    # share one encoded prompt across samples or to reorder hidden states between beams
+    # Args:
+    #   indices (1D np arr of ints) - the row of this cache each row of the new cache comes from
+    def fork(self, indices):
+        return StateCache([s[indices] for s in self.states], len(indices))
+
 class RecurrentNet:
     def __init__(self, num_inputs, layers=None, cost_func=NegativeLogLikelihood):
         self.num_inputs = num_inputs
@@ -24,10 +84,18 @@ class RecurrentNet:
                     self.layer_types.append("soft")
                 elif isinstance(l, RecurrentLayer):
                     self.layer_types.append("recurr")
+                elif isinstance(l, GRULayer):
+                    self.layer_types.append("gru")
+                elif isinstance(l, LSTMLayer):
+                    self.layer_types.append("lstm")
         else:
             self.layers = []
 
         self.cost_func = cost_func
+        # Position of the training loop while training (TrainingState)
+        self.training_state = None
+        # Per layer timings (LayerProfiler) while profiling, see profiling.py
+        self.profiler = None
 
     def add(self, layer_type, output_size):
         op = self.num_inputs
@@ -35,52 +103,203 @@ class RecurrentNet:
             op = self.layers[-1].get_output_shape()
 
         layer_shape = (output_size, op)
-        if layer_type is "soft":
-            self.layers.append(SoftmaxLayer(layer_shape))
-        elif layer_type is "recurr":
+        if layer_type == "soft":
+            self.layers.append(SoftmaxLayer(input_shape=op, output_shape=output_size))
+        elif layer_type == "recurr":
             self.layers.append(RecurrentLayer(layer_shape))
+        elif layer_type == "gru":
+            self.layers.append(GRULayer(layer_shape))
+        elif layer_type == "lstm":
+            self.layers.append(LSTMLayer(layer_shape))
 
         self.layer_types.append(layer_type)
 
         self.num_layers+=1
 
     def forget_past(self):
-        for l in self.layers:
-            if isinstance(l, RecurrentLayer):
+        for lt, l in zip(self.layer_types, self.layers):
+            if lt in recurrent_layer_types:
                 l.forget_past()
 
+    # Starts timing every layer of the network (after the layers have been added), returning the LayerProfiler
+    # the timings go to, see profiling.py
+    def enable_profiling(self):
+        self.profiler = LayerProfiler(layer_names(self.layer_types), "RecurrentNet")
+        return self.profiler
+
+    # Stops timing the layers, returning the LayerProfiler that was used (None if profiling was off)
+    def disable_profiling(self):
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
     def feed_forward(self, network_input):
-        for l in self.layers:
-            network_input = l.feed_forward(network_input)
+        profiler = self.profiler
+        for i, lt, l in zip(range(self.num_layers), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "soft":
+                network_input = l.feedforward(network_input)
+            else:
+                network_input = l.feed_forward(network_input)
+            if profiler is not None:
+                profiler.record(i, FORWARD, start)
         return network_input
 
+    # Returns the weight arrays of every layer (and the past weights of recurrent layers), which are what
+    # regularization acts on, biases are not included
+    def weight_arrays(self):
+        arrays = []
+        for lt, lyr in zip(self.layer_types, self.layers):
+            arrays.append(lyr.weights)
+            if lt in recurrent_layer_types:
+                arrays.append(lyr.past_weights)
+        return arrays
+
+    # Feeds a whole sequence through the network one layer at a time, saving the final states
+    # Each layer projects all of its inputs with a single product
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs)
+    # Returns the network outputs for every timestep, (sequence length, num outputs)
+    def feed_forward_sequence(self, input_sequence):
+        curr = np.asarray(input_sequence, dtype=float)
+        profiler = self.profiler
+        for i, lt, lyr in zip(range(self.num_layers), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "soft":
+                curr = batch_softmax(np.dot(curr, lyr.weights.T) + lyr.biases)
+            else:
+                curr = lyr.feed_forward_sequence(curr)
+            if profiler is not None:
+                profiler.record(i, FORWARD, start)
+        return curr
+
+    # Creates a state cache of batch size 1 seeded with the current past state of each recurrent layer
+    def init_state_cache(self):
+        states = [lyr.get_batch_state() for lt, lyr in zip(self.layer_types, self.layers) if lt != "soft"]
+        return StateCache(states, 1)
+
+    # Feeds one token per sequence through the network, updating the state cache in place
+    # Args:
+    #   tokens (1D np arr of ints) - the current token index of every sequence in the cache
+    #   cache (StateCache) - the hidden states of every sequence
+    # Returns the output logits of the network, (batch size, num outputs)
+    def step_batch(self, tokens, cache):
+        curr = np.zeros((len(tokens), self.num_inputs))
+        curr[np.arange(len(tokens)), tokens] = 1.0
+
+        cnt = 0
+        for i, lt, lyr in zip(range(1, self.num_layers + 1), self.layer_types, self.layers):
+            if lt == "soft":
+                curr = np.dot(curr, lyr.weights.T) + lyr.biases
+                if not i == self.num_layers:
+                    curr = batch_softmax(curr)
+            else:
+                cache.states[cnt], curr = lyr.feed_forward_batch(curr, cache.states[cnt])
+                cnt += 1
+        return curr
+
+    # Encodes a prompt once, returning the logits following its last token and its state cache
+    # Args:
+    #   prompt (list of ints) - token indices of the prompt (at least one token)
+    def encode_prompt(self, prompt):
+        if len(prompt) == 0:
+            raise ValueError("Prompt must contain at least one token")
+        cache = self.init_state_cache()
+        for token in prompt:
+            logits = self.step_batch(np.array([token]), cache)
+        return logits, cache
+
+    # Generates num_samples continuations of a prompt in parallel, by sampling or greedy decoding
+    # The prompt is encoded once and its hidden states are shared by every sample
+    # Args:
+    #   prompt (list of ints) - token indices of the prompt
+    #   num_steps (int) - number of tokens to generate per sample
+    #   num_samples (int) - number of continuations to generate
+    #   temperature (float) - sampling temperature
+    #   top_k (int) optional - restricts sampling to the k most likely tokens
+    #   greedy (bool) - if True, always pick the most likely token
+    # Returns a (num_samples, num_steps) np array of generated token indices
+    def generate(self, prompt, num_steps, num_samples=1, temperature=1.0, top_k=None, greedy=False):
+        logits, cache = self.encode_prompt(prompt)
+        shared = np.zeros(num_samples, dtype=int)
+        cache = cache.fork(shared)
+        logits = logits[shared]
+
+        sequences = np.zeros((num_samples, num_steps), dtype=int)
+        for t in range(num_steps):
+            if greedy:
+                tokens = np.argmax(logits, axis=1)
+            else:
+                tokens = sample_tokens(logits, temperature, top_k)
+            sequences[:, t] = tokens
+            if t < num_steps - 1:
+                logits = self.step_batch(tokens, cache)
+        return sequences
+
+    # Finds the most likely continuations of a prompt using beam search
+    # Args:
+    #   prompt (list of ints) - token indices of the prompt
+    #   num_steps (int) - number of tokens to generate
+    #   beam_width (int) - number of candidate sequences kept after every step
+    # Returns a (beam width, num_steps) np array of token indices, best first, and their log probabilities
+    def beam_search(self, prompt, num_steps, beam_width):
+        logits, cache = self.encode_prompt(prompt)
+        num_tokens = logits.shape[1]
+
+        scores = np.zeros(1)
+        sequences = np.zeros((1, 0), dtype=int)
+        for t in range(num_steps):
+            candidates = (scores[:, None] + batch_log_softmax(logits)).ravel()
+            k = min(beam_width, len(candidates))
+            best = np.argpartition(-candidates, k-1)[:k]
+            best = best[np.argsort(-candidates[best])]
+
+            parents = best // num_tokens
+            tokens = best % num_tokens
+            sequences = np.hstack((sequences[parents], tokens[:, None]))
+            scores = candidates[best]
+
+            if t < num_steps - 1:
+                # Fork the hidden states of the surviving beams instead of re-running them
+                cache = cache.fork(parents)
+                logits = self.step_batch(tokens, cache)
+        return sequences, scores
+
     def backprop(self, network_input, expected_output):
         curr_z = network_input
         z_activations = [network_input]
         p_z_activations = []
 
+        profiler = self.profiler
         for i, lt, lyr in zip(range(1, self.num_layers + 1), self.layer_types, self.layers):
-            if lt == "recurr":
+            if profiler is not None:
+                start = profiler.clock()
+            if lt in recurrent_layer_types:
                 prev_z, curr_z = lyr.get_activations(curr_z)
                 z_activations.append(deepcopy(curr_z))
                 p_z_activations.append(prev_z)
+                # Carry the state on to the next example of the sequence
+                lyr.advance_state(deepcopy(curr_z))
             elif lt == "soft":
-                curr_z = lyr.get_activations(curr_z)
+                curr_z = lyr.getactivations(curr_z)
                 z_activations.append(deepcopy(curr_z))
 
             if not i == self.num_layers:
                 # Use softmax for SM layers, otherwise leaky relu
-                if lt is "soft":
+                if lt == "soft":
                     curr_z = Softmax.func(curr_z)
                 else:
                     curr_z = LeakyRELU.func(curr_z)
+            if profiler is not None:
+                profiler.record(i-1, FORWARD, start)
 
         # Store derivatives and activation for output layer
-        if self.layer_types[-1] is "soft":
+        if self.layer_types[-1] == "soft":
             squashed_activations = Softmax.func(deepcopy(curr_z))
             squashed_activations_deriv = Softmax.func_deriv(deepcopy(curr_z))
         else:
-            squashed_activations = LeakyRELU.func_deriv(deepcopy(curr_z))
+            squashed_activations = LeakyRELU.func(deepcopy(curr_z))
             squashed_activations_deriv = LeakyRELU.func_deriv(deepcopy(curr_z))
 
         # Errors for the last layer
@@ -89,8 +308,8 @@ class RecurrentNet:
                                      expected_output)
 
         is_conv = True
-        if self.layer_types[self.num_layers - 1] is not "conv" \
-                and self.layer_types[self.num_layers - 1] is not "deconv":
+        if self.layer_types[self.num_layers - 1] != "conv" \
+                and self.layer_types[self.num_layers - 1] != "deconv":
             is_conv = False
 
         delta_w = []
@@ -100,13 +319,17 @@ class RecurrentNet:
         cnt = -1
         # Append all the errors for each layer
         for i, lt, lyr, zprev in reversed(zip(range(self.num_layers), self.layer_types, self.layers, z_activations[:-1])):
-            if lt is "soft":
-                dw, db, dlt = lyr.backprop(zprev, delta)
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "soft":
+                dw, db, dlt = lyr.backprop(LeakyRELU.func(deepcopy(zprev)),
+                                           LeakyRELU.func_deriv(deepcopy(zprev)),
+                                           delta)
                 delta_w.insert(0, dw)
                 delta_b.insert(0, db)
 
                 delta = dlt
-            elif lt is "recurr":
+            elif lt in recurrent_layer_types:
                 dw, dpw, db, dlt = lyr.backprop(p_z_activations[cnt], zprev, delta)
                 delta_w.insert(0, dw)
                 delta_pw.insert(0, dpw)
@@ -115,26 +338,94 @@ class RecurrentNet:
                 delta = dlt
 
                 cnt-=1
+            if profiler is not None:
+                profiler.record(i, BACKWARD, start)
 
         return np.array(delta_w), np.array(delta_pw), np.array(delta_b)
 
+    # Same as backprop summed over every example of a sequence, with each layer run over the
+    # whole sequence at once, also returns the total cost of the sequence
+    # Args:
+    #   input_sequence (2D np arr) - (sequence length, num inputs)
+    #   expected_outputs (2D np arr) - (sequence length, num outputs)
+    def backprop_sequence(self, input_sequence, expected_outputs):
+        curr_z = np.asarray(input_sequence, dtype=float)
+        z_activations = [curr_z]
+        p_z_activations = []
+
+        profiler = self.profiler
+        for i, lt, lyr in zip(range(1, self.num_layers + 1), self.layer_types, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt in recurrent_layer_types:
+                prev_z, curr_z = lyr.get_sequence_activations(curr_z)
+                p_z_activations.append(prev_z)
+                # Carry the state on to the next sequence
+                lyr.advance_state(deepcopy(curr_z[-1]))
+            elif lt == "soft":
+                curr_z = np.dot(curr_z, lyr.weights.T) + lyr.biases
+            z_activations.append(curr_z)
+
+            if not i == self.num_layers:
+                if lt == "soft":
+                    curr_z = batch_softmax(curr_z)
+                else:
+                    curr_z = LeakyRELU.batch_func(curr_z)
+            if profiler is not None:
+                profiler.record(i-1, FORWARD, start)
+
+        # Store derivatives and activation for output layer
+        if self.layer_types[-1] == "soft":
+            squashed_activations = batch_softmax(curr_z)
+            squashed_activations_deriv = squashed_activations*(1-squashed_activations)
+        else:
+            squashed_activations = LeakyRELU.batch_func(curr_z)
+            squashed_activations_deriv = LeakyRELU.batch_func_deriv(curr_z)
+
+        # Errors for the last layer at every timestep
+        delta = self.cost_func.batch_delta(squashed_activations,
+                                           squashed_activations_deriv,
+                                           expected_outputs)
+        cost = self.cost_func.batch_cost(squashed_activations, expected_outputs, reduction="sum")
+
+        delta_w = []
+        delta_pw = []
+        delta_b = []
+
+        cnt = -1
+        for i, lt, lyr, zprev in reversed(list(zip(range(self.num_layers), self.layer_types, self.layers,
+                                                   z_activations[:-1]))):
+            if profiler is not None:
+                start = profiler.clock()
+            if lt == "soft":
+                delta_w.insert(0, np.dot(delta.T, LeakyRELU.batch_func(zprev)))
+                delta_b.insert(0, np.sum(delta, axis=0))
+                delta = np.dot(delta, lyr.weights) * LeakyRELU.batch_func_deriv(zprev)
+            elif lt in recurrent_layer_types:
+                dw, dpw, db, dlt = lyr.backprop_sequence(p_z_activations[cnt], zprev, delta)
+                delta_w.insert(0, dw)
+                delta_pw.insert(0, dpw)
+                delta_b.insert(0, db)
+
+                delta = dlt
+
+                cnt-=1
+            if profiler is not None:
+                profiler.record(i, BACKWARD, start)
+
+        return np.array(delta_w), np.array(delta_pw), np.array(delta_b), cost
+
     # Updates the network given a specific minibatch (done by averaging gradients over the minibatch)
+    # and returns the total cost of the minibatch
     # Args:
     #   mini_batch - a list of tuples, (input, expected output)
     #   step_size - the amount the network should change its parameters by relative to the gradients
     def update_network(self, mini_batch, step_size):
-        recurrent_indicies = [False for i in range(self.num_layers)]
-        for i, l in enumerate(self.layers):
-            if isinstance(l, RecurrentLayer):
-                recurrent_indicies[i] = True
+        recurrent_indicies = [lt in recurrent_layer_types for lt in self.layer_types]
 
-        gradient_w, gradient_pw, gradient_b = self.backprop(mini_batch[0][0], mini_batch[0][1])
-
-        for inp, outp in mini_batch[1:]:
-            dgw, dgpw, dgb = self.backprop(inp, outp)
-            gradient_w += dgw
-            gradient_pw += dgpw
-            gradient_b += dgb
+        # The examples of a minibatch are consecutive timesteps, so run them as one sequence
+        gradient_w, gradient_pw, gradient_b, cost = self.backprop_sequence([inp for inp, outp in mini_batch],
+                                                                           [outp for inp, outp in mini_batch])
 
         # Average the gradients
         gradient_w *= step_size / (len(mini_batch) + 0.00)
@@ -142,34 +433,76 @@ class RecurrentNet:
         gradient_b *= step_size / (len(mini_batch) + 0.00)
 
         cnt = 0
+        profiler = self.profiler
         # Update weights and biases in opposite direction of gradients
         for i, gw, gb, lyr in zip(range(self.num_layers), gradient_w, gradient_b, self.layers):
+            if profiler is not None:
+                start = profiler.clock()
             if recurrent_indicies[i]:
                 lyr.update(-gw, -gradient_pw[cnt], -gb)
                 cnt+=1
             else:
                 lyr.update(-gw, -gb)
+            if profiler is not None:
+                profiler.record(i, UPDATE, start)
+        return cost
+
+    # Evaluates the network on a set of examples, returning the mean cost, the accuracy, and optionally the top k
+    # accuracy and the confusion matrix (see evaluation.py)
+    # The examples are consecutive timesteps of one sequence, run chunk_size timesteps at a time with the states
+    # carried from one chunk to the next (and left in the recurrent layers afterwards)
+    # Args:
+    #   examples - an iterable of (input, expected output) examples, or a Stream
+    #   chunk_size (int) - number of timesteps per forward pass
+    #   top_k (int) optional - also measure the top k accuracy
+    #   confusion (bool) - also build the confusion matrix
+    def evaluate_metrics(self, examples, chunk_size=DEFAULT_CHUNK_SIZE, top_k=None, confusion=False):
+        return evaluate_batches(self.feed_forward_sequence, examples, self.cost_func, chunk_size, top_k, confusion)
 
     # Evaluates the average cost across the training set
     def evaluate_cost(self, training_set):
-        total = 0.0
-        for inp, outp in training_set:
-            net_outp = self.feed_forward(inp)
-            total += self.cost_func.cost(net_outp, outp)
-        return total / len(training_set)
+        return self.evaluate_metrics(training_set)["cost"]
 
     # Performs SGD on the network
     # Args:
     #   epochs - (int), number of times to loop over the entire batch
     #   step_size - (float), amount network should change its parameters per update
     #   mini_batch_size - (int), number of training examples per mini batch
-    #   training_inputs - (list), the list of training inputs
-    #   expected_outputs - (list), the list of expected outputs for each input
-    def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_set):
+    #   training_set - (list of tuples), (input, expected output) examples, or a Stream or any other iterable of them
+    #   checkpointer - (BackgroundCheckpointer or IncrementalCheckpointer) optional, stepped after every update
+    #                  to checkpoint the network
+    #   progress - (function) optional, called with a report (a dictionary) after every epoch, see progress.py
+    #   evaluate_every - (int) optional, also evaluate on the training set every this many epochs
+    #   evaluation_size - (int) optional, evaluate on the first this many examples of the training set
+    #   regularizer - (L1, L2, ElasticNet) optional, regularizes the weights after every update
+    #                 (a Stream has to be given its size)
+    # If the network holds a training state (restored from a checkpoint taken during training) it resumes from it,
+    # the checkpoint also holds the past state of every recurrent layer
+    def stochastic_gradient_descent(self, epochs, step_size, mini_batch_size, training_set, checkpointer=None,
+                                    progress=print_progress, evaluate_every=None, evaluation_size=None,
+                                    regularizer=None):
+        training_set = training_data(training_set)
+        training_set_size = training_set.size if isinstance(training_set, Stream) else len(training_set)
+        if training_set_size is None and regularizer is not None:
+            raise ValueError("Regularization needs the size of the training stream")
+
         # Train
-        for ep in range(epochs):
-            for x in range(0, len(training_set), mini_batch_size):
-                self.update_network(training_set[x:x + mini_batch_size], step_size)
+        state = start_training(self)
+        while state.epoch < epochs:
+            # The examples are consecutive timesteps, so they are always visited in order
+            for mini_batch in state.minibatches(training_set, mini_batch_size, shuffle=False):
+                state.cost += self.update_network(mini_batch, step_size)
+                if regularizer is not None:
+                    regularizer.apply(self.weight_arrays(), step_size, training_set_size)
+                if checkpointer is not None:
+                    checkpointer.step(self)
             # Update with progress
-            print("Epoch: %d   Average cost: %f" % (ep + 1, self.evaluate_cost(training_set)))
+            report = {"network": "", "epoch": state.epoch + 1, "cost": state.average_cost()}
+            if evaluation_due(state.epoch, evaluate_every):
+                # The examples form one sequence, so evaluate on a contiguous run of them
+                report["evaluation_cost"] = self.evaluate_cost(evaluation_examples(training_set, evaluation_size,
+                                                                                   contiguous=True))
+            progress(report)
             self.forget_past()
+            state.end_epoch()
+        self.training_state = None
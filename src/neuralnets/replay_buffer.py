@@ -0,0 +1,37 @@
+import numpy as np
+
+# Fixed capacity ring buffer of generated samples, stored in one preallocated array
+# Once full, new samples overwrite the oldest ones
+class ReplayBuffer:
+    # Args:
+    #   capacity (int) - the maximum number of samples held
+    #   sample_shape (tuple) - the shape of one sample (for images: (image depth, image height, image length))
+    def __init__(self, capacity, sample_shape):
+        self.capacity = capacity
+        self.sample_shape = tuple(sample_shape)
+        self.samples = np.zeros((capacity,) + self.sample_shape)
+        self.size = 0
+        self.position = 0
+
+    # Writes a batch of samples over the oldest samples in the buffer
+    # Args:
+    #   samples (np arr) - (num samples,) + sample shape
+    def add(self, samples):
+        samples = samples[-self.capacity:]
+        indices = (self.position + np.arange(len(samples))) % self.capacity
+        self.samples[indices] = samples
+
+        self.position = (self.position + len(samples)) % self.capacity
+        self.size = min(self.size + len(samples), self.capacity)
+
+    # Returns the samples at the given indices
+    # Args:
+    #   indices (int or 1D np arr of ints) - indices into the filled part of the buffer
+    def get(self, indices):
+        return self.samples[indices]
+
+    def is_full(self):
+        return self.size == self.capacity
+
+    def __len__(self):
+        return self.size
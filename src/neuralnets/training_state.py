@@ -0,0 +1,113 @@
+from datasets import Stream
+from datasets import ShardedDataset
+from datasets import ArrayDataset
+
+import random
+import numpy as np
+
+# Position of a training loop: the epoch, how many examples of the epoch have been trained on, and the
+# order of the examples in the epoch
+# A network holds one in training_state while it trains, so a checkpoint taken during training has
+# everything needed to continue with the exact same sequence of updates. Calling the training method
+# again with the same arguments on a network restored from such a checkpoint resumes where it stopped.
+# Only a state restored from a checkpoint is resumed, a state left behind by an interrupted run is not.
+class TrainingState:
+    # Args:
+    #   epoch (int) - the current epoch (or round)
+    #   position (int) - number of examples of the current epoch already trained on
+    #   order (1D np array of ints) optional - order of the examples in the current epoch, drawn when the epoch starts
+    #   cost (float) - running cost of the current epoch
+    #   correct (int) - running number of examples of the current epoch classified correctly
+    #   rng_state (tuple) optional - (python random state, numpy random state) to restore when training resumes
+    #   restored (bool) - whether the state was restored from a checkpoint, so the next training call resumes it
+    def __init__(self, epoch=0, position=0, order=None, cost=0.0, correct=0, rng_state=None, restored=False):
+        self.epoch = epoch
+        self.position = position
+        self.order = order
+        self.cost = cost
+        self.correct = correct
+        self.rng_state = rng_state
+        self.restored = restored
+
+    # Returns the order of the examples in the current epoch, drawing it when the epoch starts
+    # Args:
+    #   num_examples (int) - size of the training set
+    #   shuffle (bool) - whether to visit the examples in a random order
+    def begin_epoch(self, num_examples, shuffle=True):
+        if self.order is None:
+            self.order = np.random.permutation(num_examples) if shuffle else np.arange(num_examples)
+        elif len(self.order) != num_examples:
+            raise ValueError("Resuming a training state of %d examples with %d examples" % (len(self.order), num_examples))
+        return self.order
+
+    # Yields the remaining minibatches of the current epoch as lists of (input, expected output) tuples,
+    # moving position past each one
+    # The minibatches of an ArrayDataset or ShardedDataset are gathered into the same two arrays every time,
+    # so their examples are only valid until the next minibatch is drawn
+    # Args:
+    #   training_set - an ArrayDataset, a ShardedDataset, a Stream, or a list of (input, expected output) tuples
+    #   mini_batch_size (int) - number of examples per minibatch
+    #   shuffle (bool) - whether to visit the examples of a list in a random order (Streams are read in order)
+    # Raises ValueError if a Stream has no examples for an epoch (such as a generator read by an earlier epoch)
+    def minibatches(self, training_set, mini_batch_size, shuffle=True):
+        if isinstance(training_set, Stream):
+            for inputs, outputs in training_set.batches(mini_batch_size, skip=self.position):
+                self.position += len(inputs)
+                yield list(zip(inputs, outputs))
+            if self.position == 0:
+                raise ValueError("The training stream has no examples for epoch %d, a generator can only be read "
+                                 "for one epoch (give the Stream a function returning a new iterator)" % (self.epoch+1))
+            return
+
+        order = self.begin_epoch(len(training_set), shuffle)
+        gathered = isinstance(training_set, (ArrayDataset, ShardedDataset))
+        if gathered:
+            inputs = np.empty((mini_batch_size,) + training_set.input_shape)
+            outputs = np.empty((mini_batch_size,) + training_set.target_shape)
+
+        for x in range(self.position, len(order), mini_batch_size):
+            self.position = min(x + mini_batch_size, len(order))
+            if gathered:
+                indices = order[x:x+mini_batch_size]
+                training_set.gather(indices, inputs[:len(indices)], outputs[:len(indices)])
+                yield list(zip(inputs[:len(indices)], outputs[:len(indices)]))
+            else:
+                yield [training_set[i] for i in order[x:x+mini_batch_size]]
+
+    # Returns the running average cost of the current epoch, nan if no examples have been trained on
+    def average_cost(self):
+        if self.position == 0:
+            return float("nan")
+        return self.cost / self.position
+
+    # Returns the running fraction of the examples of the current epoch classified correctly, nan if no
+    # examples have been trained on
+    def average_accuracy(self):
+        if self.position == 0:
+            return float("nan")
+        return float(self.correct) / self.position
+
+    def end_epoch(self):
+        self.epoch += 1
+        self.position = 0
+        self.order = None
+        self.cost = 0.0
+        self.correct = 0
+
+    # Restores the random number generators to the state they were in when this state was checkpointed
+    def restore_rng(self):
+        if self.rng_state is not None:
+            random.setstate(self.rng_state[0])
+            np.random.set_state(self.rng_state[1])
+            self.rng_state = None
+
+# Returns the training state of a network, resuming the one it holds if it was restored from a checkpoint,
+# otherwise starting a new one (replacing any state an interrupted run left behind)
+def start_training(network):
+    state = network.training_state
+    if state is None or not state.restored:
+        network.training_state = TrainingState()
+    else:
+        state.restored = False
+        state.restore_rng()
+    return network.training_state
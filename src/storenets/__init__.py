@@ -1 +1,8 @@
-from save import save
\ No newline at end of file
+from save import save
+from checkpoint import save_checkpoint
+from checkpoint import load_checkpoint
+from checkpoint import load
+from checkpoint import export_checkpoint
+from background import BackgroundCheckpointer
+from incremental import IncrementalCheckpointer
+from incremental import load_incremental
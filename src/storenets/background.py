@@ -0,0 +1,97 @@
+from checkpoint import snapshot
+from checkpoint import write_checkpoint
+
+import threading
+import time
+
+# Periodically checkpoints a network while it trains
+# Training only pays for copying the parameters in memory; a background thread writes
+# the copy to disk while training continues. If a new checkpoint is taken before the last
+# one has been written, only the newest is kept.
+class BackgroundCheckpointer:
+    # Args:
+    #   filename (string) - path of the checkpoint file, replaced atomically on every write
+    #   every_steps (int) optional - checkpoint after this many training steps
+    #   every_seconds (float) optional - checkpoint once this many seconds have passed since the last one
+    def __init__(self, filename, every_steps=None, every_seconds=None):
+        self.filename = filename
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+
+        self.steps = 0
+        self.last_checkpoint_step = 0
+        self.last_checkpoint_time = time.time()
+
+        self.pending = None
+        self.writing = False
+        self.closed = False
+        self.error = None
+        self.condition = threading.Condition()
+
+        self.writer = threading.Thread(target=self.write_loop)
+        self.writer.daemon = True
+        self.writer.start()
+
+    # Called by the training loops after every update, checkpoints the network when an interval has passed
+    # Args:
+    #   network (object) - the network being trained
+    def step(self, network):
+        self.steps += 1
+        due = False
+        if self.every_steps is not None and self.steps - self.last_checkpoint_step >= self.every_steps:
+            due = True
+        if self.every_seconds is not None and time.time() - self.last_checkpoint_time >= self.every_seconds:
+            due = True
+        if due:
+            self.checkpoint(network)
+
+    # Snapshots the network now and hands the snapshot to the writer thread
+    def checkpoint(self, network):
+        if self.error is not None:
+            raise self.error
+        state = snapshot(network)
+
+        with self.condition:
+            self.pending = state
+            self.condition.notify()
+
+        self.last_checkpoint_step = self.steps
+        self.last_checkpoint_time = time.time()
+
+    # Writes snapshots as they are handed over (runs on the writer thread)
+    def write_loop(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                architecture, tensors = self.pending
+                self.pending = None
+                self.writing = True
+
+            try:
+                write_checkpoint(self.filename, architecture, tensors)
+            except Exception as e:
+                self.error = e
+
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    # Blocks until every snapshot handed over so far has been written
+    def wait(self):
+        with self.condition:
+            while self.pending is not None or self.writing:
+                self.condition.wait()
+        if self.error is not None:
+            raise self.error
+
+    # Writes any remaining snapshot and stops the writer thread
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.writer.join()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,516 @@
+from neuralnets import GAN
+from neuralnets import Generator
+from neuralnets import Discriminator
+from neuralnets import ConvolutionalNet
+from neuralnets import FullyConnectedNet
+from neuralnets import RecurrentNet
+from neuralnets import ReplayBuffer
+from neuralnets import TrainingState
+import neuralnets.fullyconnected_functions as fn
+from layers import Kernel
+from layers import DenseLayer
+from layers import SoftmaxLayer
+from layers import DeconvLayer
+from layers import ConvLayer
+from layers import RecurrentLayer
+from layers import GRULayer
+from layers import LSTMLayer
+from layers import LazyValue
+from layers.lazy import resolve
+from quantize import quantize
+from quantize import dequantize
+from quantize import dequantize_tensors
+from quantize import QUANTIZED_DTYPES
+from quantize import SCALE_SUFFIX
+import functions
+
+import numpy as np
+import random
+import json
+import os
+import struct
+
+# Single file binary checkpoints
+#
+# File layout:
+#   magic (8 bytes) - MAGIC
+#   header length (little-endian uint64)
+#   header (utf-8 json) - the architecture of the network and a table of every tensor
+#                         (name, dtype, shape, offset from the start of the file)
+#   tensors - raw little-endian buffers, each starting on an ALIGNMENT byte boundary
+#             (float64, except for the quantized weights of exported models)
+
+MAGIC = b"NNETCKPT"
+ALIGNMENT = 64
+DTYPE = "<f8"
+
+# Functions that can be named in a checkpoint header, by network family
+activation_functions = {f.__name__: f for f in (functions.LeakyRELU, functions.RELU, functions.Sigmoid, functions.Softmax)}
+cost_functions = {f.__name__: f for f in (functions.QuadraticCost, functions.NegativeLogLikelihood)}
+fullyconnected_functions = {f.__name__: f for f in (fn.TanH, fn.Sigmoid, fn.SoftMax, fn.LeakyReLU, fn.ReLU,
+                                                    fn.QuadraticCost, fn.CrossEntropy, fn.NegativeLogLikelihood)}
+
+# Returns the number of bytes needed to move offset up to the next aligned position
+def padding(offset):
+    return (ALIGNMENT - offset % ALIGNMENT) % ALIGNMENT
+
+# Returns the header entry for a layer and appends its parameters to tensors
+# Args:
+#   layer_type (string) - conv, deconv, dense, soft, recurr, gru, or lstm
+#   layer (object) - the layer
+#   prefix (string) - name prefix of the layers tensors
+#   tensors (list of tuples) - (name, np array) pairs to be written
+def describe_layer(layer_type, layer, prefix, tensors):
+    entry = {"type": layer_type}
+    if layer_type in ("conv", "deconv"):
+        entry["input_shape"] = list(layer.input_shape)
+        entry["kernel_shape"] = list(layer.kernel_shape)
+        entry["activation"] = layer.activation_function.__name__
+        if layer_type == "deconv":
+            entry["output_shape"] = list(layer.output_shape)
+        # All kernels of a layer are stacked into one (num kernels, kernel depth, height, length) tensor
+        tensors.append((prefix + "weights", np.array([k.weights for k in layer.kernels])))
+        tensors.append((prefix + "biases", np.array([k.bias for k in layer.kernels])))
+    elif layer_type in ("dense", "soft"):
+        entry["input_shape"] = layer.input_shape
+        entry["output_shape"] = layer.output_shape
+        entry["activation"] = layer.activation_function.__name__
+        tensors.append((prefix + "weights", layer.weights))
+        tensors.append((prefix + "biases", layer.biases))
+    else:
+        entry["layer_shape"] = list(layer.layer_shape)
+        tensors.append((prefix + "weights", layer.weights))
+        tensors.append((prefix + "past_weights", layer.past_weights))
+        tensors.append((prefix + "biases", layer.biases))
+    return entry
+
+# Returns the header entry for a network and appends its parameters to tensors
+# Args:
+#   network (object) - GAN, Generator, Discriminator, ConvolutionalNet, FullyConnectedNet, or RecurrentNet
+#   prefix (string) - name prefix of the networks tensors
+#   tensors (list of tuples) - (name, np array) pairs to be written
+#   optimizer_state (bool) - whether to include the momentum of the optimizer and the training state
+def describe_network(network, prefix, tensors, optimizer_state=True):
+    if isinstance(network, GAN):
+        entry = {"type": "gan",
+                 "image_shape": list(network.image_shape),
+                 "generator_input_shape": list(network.generator_input_shape),
+                 "discriminator_output_shape": network.discriminator_output_shape,
+                 "generator": describe_network(network.get_generator(), prefix + "generator.", tensors, optimizer_state),
+                 "discriminator": describe_network(network.get_discriminator(), prefix + "discriminator.", tensors, optimizer_state)}
+        if optimizer_state:
+            describe_training_state(network, entry, prefix, tensors)
+        return entry
+
+    elif isinstance(network, FullyConnectedNet):
+        for i, (w, b) in enumerate(zip(network.get_weights(), network.get_biases())):
+            tensors.append((prefix + "layers.%d.weights" % i, w))
+            tensors.append((prefix + "layers.%d.biases" % i, b))
+        entry = {"type": "fullyconnected",
+                 "layer_sizes": list(network.get_layer_sizes()),
+                 "cost_function": network.get_cost_function().__name__,
+                 "logistic_function": network.get_logistic_function().__name__}
+        if optimizer_state:
+            describe_training_state(network, entry, prefix, tensors)
+        return entry
+
+    elif isinstance(network, RecurrentNet):
+        entry = {"type": "recurrent",
+                 "num_inputs": network.num_inputs,
+                 "cost_function": network.cost_func.__name__}
+    elif isinstance(network, (Generator, Discriminator, ConvolutionalNet)):
+        entry = {"type": "convolutional",
+                 "input_shape": network.input_shape,
+                 "cost_function": network.cost_function.__name__}
+        if isinstance(network, Generator):
+            entry["type"] = "generator"
+        elif isinstance(network, Discriminator):
+            entry["type"] = "discriminator"
+    else:
+        raise TypeError("Cannot checkpoint a %s" % type(network).__name__)
+
+    entry["layers"] = [describe_layer(lt, lyr, prefix + "layers.%d." % i, tensors)
+                       for i, lt, lyr in zip(range(network.num_layers), network.layer_types, network.layers)]
+
+    # Momentum of the optimizer, one weight and one bias array per layer
+    if optimizer_state and getattr(network, "velocity", None) is not None:
+        entry["velocity"] = True
+        for i, (vw, vb) in enumerate(zip(network.velocity[0], network.velocity[1])):
+            tensors.append((prefix + "velocity.weights.%d" % i, vw))
+            tensors.append((prefix + "velocity.biases.%d" % i, vb))
+    if optimizer_state:
+        describe_training_state(network, entry, prefix, tensors)
+    return entry
+
+# Adds the training state of a network to its header entry, if it is training, and appends its arrays to tensors
+# Besides the position in the training loop this holds the random number generators, the past state of
+# recurrent layers, and the replay buffer of a GAN, so that training resumes with the exact same updates
+def describe_training_state(network, entry, prefix, tensors):
+    state = network.training_state
+    if state is None:
+        return
+
+    python_rng = random.getstate()
+    numpy_rng = np.random.get_state()
+    entry["training"] = {"epoch": state.epoch,
+                         "position": state.position,
+                         "cost": state.cost,
+                         "correct": state.correct,
+                         "python_rng": [python_rng[0], list(python_rng[1]), python_rng[2]],
+                         "numpy_rng": [numpy_rng[0], numpy_rng[1].tolist(), numpy_rng[2], numpy_rng[3], numpy_rng[4]]}
+    if state.order is not None:
+        tensors.append((prefix + "training.order", state.order))
+
+    if isinstance(network, RecurrentNet):
+        for i, lyr in enumerate(network.layers):
+            if hasattr(lyr, "past_state"):
+                tensors.append((prefix + "training.past_state.%d" % i, lyr.past_state))
+            if hasattr(lyr, "past_cell"):
+                tensors.append((prefix + "training.past_cell.%d" % i, lyr.past_cell))
+
+    if isinstance(network, GAN) and network.replay_buffer is not None:
+        entry["training"]["replay_buffer"] = {"capacity": network.replay_buffer.capacity,
+                                              "size": network.replay_buffer.size,
+                                              "position": network.replay_buffer.position}
+        tensors.append((prefix + "training.replay_buffer", network.replay_buffer.samples))
+
+# Restores the training state saved by describe_training_state onto a rebuilt network
+def build_training_state(network, entry, prefix, tensors):
+    if "training" not in entry:
+        return
+    training = entry["training"]
+
+    python_rng = training["python_rng"]
+    numpy_rng = training["numpy_rng"]
+    rng_state = ((python_rng[0], tuple(python_rng[1]), python_rng[2]),
+                 (str(numpy_rng[0]), np.array(numpy_rng[1], dtype=np.uint32), numpy_rng[2], numpy_rng[3], numpy_rng[4]))
+    order = tensors.get(prefix + "training.order")
+    network.training_state = TrainingState(epoch=training["epoch"],
+                                           position=training["position"],
+                                           order=np.array(order, dtype=int) if order is not None else None,
+                                           cost=training["cost"],
+                                           correct=training.get("correct", 0),
+                                           rng_state=rng_state,
+                                           restored=True)
+
+    if isinstance(network, RecurrentNet):
+        for i, lyr in enumerate(network.layers):
+            if prefix + "training.past_state.%d" % i in tensors:
+                lyr.past_state = np.array(tensors[prefix + "training.past_state.%d" % i])
+            if prefix + "training.past_cell.%d" % i in tensors:
+                lyr.past_cell = np.array(tensors[prefix + "training.past_cell.%d" % i])
+
+    if "replay_buffer" in training:
+        buffer_entry = training["replay_buffer"]
+        network.replay_buffer = ReplayBuffer(buffer_entry["capacity"], network.image_shape)
+        network.replay_buffer.samples[:] = tensors[prefix + "training.replay_buffer"]
+        network.replay_buffer.size = buffer_entry["size"]
+        network.replay_buffer.position = buffer_entry["position"]
+
+# Returns a layer rebuilt from its header entry and its tensors
+def build_layer(entry, prefix, tensors):
+    layer_type = entry["type"]
+    if layer_type in ("conv", "deconv"):
+        kernel_shape = tuple(entry["kernel_shape"])
+        weights = tensors[prefix + "weights"]
+        biases = tensors[prefix + "biases"]
+        make_kernels = lambda: [Kernel(kernel_shape[1:], weights=w, bias=float(b)) for w, b in zip(weights.load(), resolve(biases))]
+        if isinstance(weights, LazyValue):
+            kernels = LazyValue(make_kernels)
+        else:
+            kernels = [Kernel(kernel_shape[1:], weights=weights[k], bias=float(biases[k])) for k in range(kernel_shape[0])]
+        activation = activation_functions[entry["activation"]]
+        if layer_type == "conv":
+            return ConvLayer(input_shape=tuple(entry["input_shape"]),
+                             kernel_shape=kernel_shape,
+                             kernels=kernels,
+                             activation_function=activation)
+        return DeconvLayer(input_shape=tuple(entry["input_shape"]),
+                           output_shape=tuple(entry["output_shape"]),
+                           kernel_shape=kernel_shape,
+                           kernels=kernels,
+                           activation_function=activation)
+
+    elif layer_type == "dense":
+        return DenseLayer(input_shape=entry["input_shape"],
+                          output_shape=entry["output_shape"],
+                          weights=tensors[prefix + "weights"],
+                          biases=tensors[prefix + "biases"],
+                          activation_function=activation_functions[entry["activation"]])
+    elif layer_type == "soft":
+        return SoftmaxLayer(input_shape=entry["input_shape"],
+                            output_shape=entry["output_shape"],
+                            weights=tensors[prefix + "weights"],
+                            biases=tensors[prefix + "biases"])
+
+    layer_class = {"recurr": RecurrentLayer, "gru": GRULayer, "lstm": LSTMLayer}[layer_type]
+    return layer_class(tuple(entry["layer_shape"]),
+                       weights=tensors[prefix + "weights"],
+                       biases=tensors[prefix + "biases"],
+                       past_weights=tensors[prefix + "past_weights"])
+
+# Returns a network rebuilt from its header entry and its tensors
+def build_network(entry, prefix, tensors):
+    network_type = entry["type"]
+    if network_type == "gan":
+        network = GAN(tuple(entry["image_shape"]),
+                      tuple(entry["generator_input_shape"]),
+                      entry["discriminator_output_shape"])
+        network.generator = build_network(entry["generator"], prefix + "generator.", tensors)
+        network.discriminator = build_network(entry["discriminator"], prefix + "discriminator.", tensors)
+        build_training_state(network, entry, prefix, tensors)
+        return network
+
+    elif network_type == "fullyconnected":
+        network = FullyConnectedNet(entry["layer_sizes"],
+                                    cost=fullyconnected_functions[entry["cost_function"]],
+                                    logistic_func=fullyconnected_functions[entry["logistic_function"]])
+        num_weight_layers = len(entry["layer_sizes"]) - 1
+        # The layers of a FullyConnectedNet are not lazy, quantized weights loaded by load are resolved right away
+        network.set_weights_biases([resolve(tensors[prefix + "layers.%d.weights" % i]) for i in range(num_weight_layers)],
+                                   [tensors[prefix + "layers.%d.biases" % i] for i in range(num_weight_layers)])
+        build_training_state(network, entry, prefix, tensors)
+        return network
+
+    layers = [build_layer(l, prefix + "layers.%d." % i, tensors) for i, l in enumerate(entry["layers"])]
+    cost_function = cost_functions[entry["cost_function"]]
+
+    if network_type == "recurrent":
+        network = RecurrentNet(entry["num_inputs"], layers=layers, cost_func=cost_function)
+        build_training_state(network, entry, prefix, tensors)
+        return network
+
+    input_shape = entry["input_shape"]
+    if isinstance(input_shape, list):
+        input_shape = tuple(input_shape)
+
+    if network_type == "generator":
+        network = Generator(input_shape, layers=layers)
+        network.cost_function = cost_function
+    elif network_type == "discriminator":
+        network = Discriminator(input_shape, layers=layers, cost_func=cost_function)
+    else:
+        network = ConvolutionalNet(input_shape, layers=layers, cost_function=cost_function)
+    network.layer_types = [str(l["type"]) for l in entry["layers"]]
+
+    if entry.get("velocity", False):
+        network.velocity = np.array([np.array([np.array(tensors[prefix + "velocity.weights.%d" % i]) for i in range(len(layers))]),
+                                     np.array([np.array(tensors[prefix + "velocity.biases.%d" % i]) for i in range(len(layers))])])
+    build_training_state(network, entry, prefix, tensors)
+    return network
+
+# Saves a network (and its optimizer state) into a single binary checkpoint file
+# Args:
+#   filename (string) - path of the checkpoint file
+#   network (object) - GAN, ConvolutionalNet, FullyConnectedNet, or RecurrentNet
+def save_checkpoint(filename, network):
+    tensors = []
+    architecture = describe_network(network, "", tensors)
+    write_checkpoint(filename, architecture, tensors)
+
+# Saves a network for inference: the weights of dense, softmax, and conv layers (and every layer of a
+# FullyConnectedNet) are stored as float16, or as int8 with one scale per output neuron or kernel, and the
+# optimizer state is left out
+# Args:
+#   filename (string) - path of the exported file, it can be read by load_checkpoint and load
+#   network (object) - GAN, ConvolutionalNet, FullyConnectedNet, or RecurrentNet
+#   precision (string) - "float16" or "int8"
+def export_checkpoint(filename, network, precision="float16"):
+    tensors = []
+    architecture = describe_network(network, "", tensors, optimizer_state=False)
+    quantized_names = [p + "weights" for p in layer_prefixes(architecture, "", ("conv", "dense", "soft"))]
+    if architecture["type"] == "fullyconnected":
+        quantized_names += ["layers.%d.weights" % i for i in range(len(architecture["layer_sizes"]) - 1)]
+
+    exported = []
+    for name, arr in tensors:
+        if name in quantized_names:
+            exported += quantize(name, np.asarray(arr, dtype=np.float64), precision)
+        else:
+            exported.append((name, arr))
+    write_checkpoint(filename, architecture, exported)
+
+# Returns the tensor name prefixes of the layers of a network with one of the given types
+# Args:
+#   entry (dictionary) - the header entry of the network
+#   prefix (string) - name prefix of the networks tensors
+#   layer_types (tuple of strings) - the layer types to look for
+def layer_prefixes(entry, prefix, layer_types):
+    if entry["type"] == "gan":
+        return (layer_prefixes(entry["generator"], prefix + "generator.", layer_types) +
+                layer_prefixes(entry["discriminator"], prefix + "discriminator.", layer_types))
+    return [prefix + "layers.%d." % i for i, l in enumerate(entry.get("layers", [])) if l["type"] in layer_types]
+
+# Returns the architecture of a network and a copy of all of its parameters and optimizer state,
+# which stays valid while the network keeps training
+def snapshot(network):
+    tensors = []
+    architecture = describe_network(network, "", tensors)
+    return architecture, [(name, np.array(arr, dtype=DTYPE)) for name, arr in tensors]
+
+# Writes a checkpoint file from an architecture and a list of (name, np array) tensors
+# The file is written under a temporary name and renamed over filename once complete,
+# so filename always holds a whole checkpoint
+def write_checkpoint(filename, architecture, tensors):
+    # Quantized tensors keep their type, everything else is stored as float64
+    tensors = [(name, np.ascontiguousarray(arr, dtype=arr.dtype if arr.dtype.str in QUANTIZED_DTYPES.values() else DTYPE))
+               for name, arr in tensors]
+
+    # The header size depends on the offsets, so lay out the tensors with a fixed width offset field
+    table = [{"name": name, "dtype": arr.dtype.str, "shape": list(arr.shape), "offset": 0} for name, arr in tensors]
+    header_size = len(json.dumps({"architecture": architecture, "tensors": table})) + 20*len(table)
+    offset = len(MAGIC) + 8 + header_size
+    offset += padding(offset)
+    for entry, (name, arr) in zip(table, tensors):
+        entry["offset"] = offset
+        offset += arr.nbytes
+        offset += padding(offset)
+
+    header = json.dumps({"architecture": architecture, "tensors": table}).encode("utf-8")
+    header += b" " * (header_size - len(header))
+
+    def write(savefile):
+        savefile.write(MAGIC)
+        savefile.write(struct.pack("<Q", len(header)))
+        savefile.write(header)
+        for entry, (name, arr) in zip(table, tensors):
+            savefile.write(b"\0" * (entry["offset"] - savefile.tell()))
+            arr.tofile(savefile)
+    write_file(filename, write)
+
+# Writes a file atomically and durably: write is called with a binary file open on filename + ".tmp", which is
+# synced to disk and then moved over filename in one step (os.replace on Python 3, os.rename on Python 2 which
+# also replaces an existing file on POSIX systems), and the rename is synced by syncing the directory.
+# So after a crash filename holds either the old file or the whole new one, and a file written later (such as
+# a manifest naming this one) never reaches the disk before it
+# Args:
+#   filename (string) - path of the file
+#   write (function) - writes the contents, called with the open file
+def write_file(filename, write):
+    tempname = filename + ".tmp"
+    savefile = open(tempname, "wb")
+    try:
+        write(savefile)
+        savefile.flush()
+        os.fsync(savefile.fileno())
+    finally:
+        savefile.close()
+
+    if hasattr(os, "replace"):
+        os.replace(tempname, filename)
+    else:
+        os.rename(tempname, filename)
+
+    # Directories cannot be opened for syncing on every platform (Windows)
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory)
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
+
+# Returns the header of a checkpoint file (a dictionary with "architecture" and "tensors")
+def read_header(checkpoint_file):
+    if checkpoint_file.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a network checkpoint file")
+    header_length = struct.unpack("<Q", checkpoint_file.read(8))[0]
+    return json.loads(checkpoint_file.read(header_length).decode("utf-8"))
+
+# Returns the header of a checkpoint file and a dictionary of all of its tensors by name
+# Args:
+#   filename (string) - path of the checkpoint file
+def read_checkpoint(filename):
+    checkpoint_file = open(filename, "rb")
+    header = read_header(checkpoint_file)
+
+    tensors = {}
+    for entry in header["tensors"]:
+        tensors[entry["name"]] = read_tensor(checkpoint_file, entry)
+
+    checkpoint_file.close()
+    return header, tensors
+
+# Reads one tensor of an open checkpoint file given its entry in the header
+def read_tensor(checkpoint_file, entry):
+    checkpoint_file.seek(entry["offset"])
+    count = int(np.prod(entry["shape"]))
+    return np.fromfile(checkpoint_file, dtype=entry["dtype"], count=count).reshape(entry["shape"])
+
+# Returns a float64 tensor of a checkpoint file, opening the file to read it
+# Args:
+#   filename (string) - path of the checkpoint file
+#   entry (dictionary) - the tensors entry in the header
+#   scale_entry (dictionary) optional - the entry of its scale, if it is int8
+def read_tensor_from(filename, entry, scale_entry=None):
+    checkpoint_file = open(filename, "rb")
+    arr = read_tensor(checkpoint_file, entry)
+    scale = read_tensor(checkpoint_file, scale_entry) if scale_entry is not None else None
+    checkpoint_file.close()
+    if arr.dtype.str in QUANTIZED_DTYPES.values():
+        return dequantize(arr, scale)
+    return arr
+
+# Reads the header of a checkpoint file and the tensors of every layer that is not
+# conv, deconv, dense, or soft; the weights and biases of those are LazyValues that read them
+# from the file when the layer first uses them
+def read_checkpoint_lazy(filename):
+    checkpoint_file = open(filename, "rb")
+    header = read_header(checkpoint_file)
+
+    table = dict((entry["name"], entry) for entry in header["tensors"])
+    lazy_names = set()
+    for prefix in layer_prefixes(header["architecture"], "", ("conv", "deconv", "dense", "soft")):
+        lazy_names.update([prefix + "weights", prefix + "biases"])
+
+    tensors = {}
+    for name, entry in table.items():
+        if name in lazy_names:
+            tensors[name] = LazyValue(lambda entry=entry: read_tensor_from(filename, entry, table.get(entry["name"] + SCALE_SUFFIX)))
+        elif not (name.endswith(SCALE_SUFFIX) and name[:-len(SCALE_SUFFIX)] in lazy_names):
+            tensors[name] = read_tensor(checkpoint_file, entry)
+
+    checkpoint_file.close()
+    return header, tensors
+
+# Loads a network saved with save_checkpoint or export_checkpoint
+# Args:
+#   filename (string) - path of the checkpoint file
+#   lazy (bool) - if True every layer is created right away but the parameters of conv, deconv, dense,
+#                 and softmax layers are only read from the file on the first access to their
+#                 kernels or weights, so only the layers that are actually run are loaded
+def load_checkpoint(filename, lazy=False):
+    if lazy:
+        header, tensors = read_checkpoint_lazy(filename)
+    else:
+        header, tensors = read_checkpoint(filename)
+    dequantize_tensors(tensors)
+    return build_network(header["architecture"], "", tensors)
+
+# Loads a network saved with save_checkpoint or export_checkpoint by memory mapping the file, without reading or copying
+# any parameters: every weight array is a view into the mapping, so loading takes about as long as
+# parsing the header, and processes loading the same file share one copy of the weights in the page cache
+# Args:
+#   filename (string) - path of the checkpoint file
+#   copy_on_write (bool) - if False the weights are read-only (for inference), if True they can be
+#                          updated and the pages that are written become private to this process
+# Quantized weights are converted back to float64 the first time their layer uses them
+def load(filename, copy_on_write=False):
+    checkpoint_file = open(filename, "rb")
+    header = read_header(checkpoint_file)
+    checkpoint_file.close()
+
+    mapping = np.memmap(filename, dtype=np.uint8, mode="c" if copy_on_write else "r")
+
+    tensors = {}
+    for entry in header["tensors"]:
+        tensors[entry["name"]] = np.ndarray(shape=tuple(entry["shape"]),
+                                            dtype=entry["dtype"],
+                                            buffer=mapping,
+                                            offset=entry["offset"])
+    dequantize_tensors(tensors, lazy=True)
+
+    return build_network(header["architecture"], "", tensors)
@@ -0,0 +1,232 @@
+from checkpoint import describe_network
+from checkpoint import build_network
+from checkpoint import write_checkpoint
+from checkpoint import read_checkpoint
+from checkpoint import write_file
+
+import numpy as np
+import json
+import os
+import time
+
+# Incremental checkpoints
+#
+# A directory holds full base checkpoints (the single file binary format) and delta files. A delta file
+# is a compressed npz holding, for every tensor that changed by more than a threshold, the change since
+# the previous checkpoint (optionally quantized). manifest.json lists every checkpoint in order with the
+# file it is stored in and the base its chain starts from, so any checkpoint can be rebuilt by replaying
+# the deltas after its base.
+#
+# The training state of a network checkpointed during training changes completely between checkpoints,
+# so its tensors are stored whole (under "=" + name) and the architecture holding it is stored in every delta.
+
+MANIFEST = "manifest.json"
+# Suffix of the npz key holding the scale of an int8 quantized delta
+SCALE_SUFFIX = "@scale"
+# Prefix of the npz keys of tensors stored whole, and the key of the architecture
+WHOLE_PREFIX = "="
+ARCHITECTURE_KEY = "@architecture"
+
+# Returns an architecture without its training state, which changes with every checkpoint taken during training
+def model_architecture(entry):
+    entry = dict((k, v) for k, v in entry.items() if k != "training")
+    for half in ("generator", "discriminator"):
+        if half in entry:
+            entry[half] = model_architecture(entry[half])
+    return entry
+
+# Returns the manifest of an incremental checkpoint directory
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {"checkpoints": []}
+    manifest_file = open(path, "r")
+    manifest = json.load(manifest_file)
+    manifest_file.close()
+    return manifest
+
+# Writes the manifest of an incremental checkpoint directory, replacing the old one atomically
+# (after the files it names, which are synced to disk before it)
+def write_manifest(directory, manifest):
+    contents = json.dumps(manifest).encode("utf-8")
+    write_file(os.path.join(directory, MANIFEST), lambda manifest_file: manifest_file.write(contents))
+
+# Returns the architecture stored in a delta file, the tensors of the delta file (dequantized) by name,
+# and the tensors stored whole by name
+def read_delta(filename):
+    arrays = np.load(filename)
+    architecture = json.loads(str(arrays[ARCHITECTURE_KEY])) if ARCHITECTURE_KEY in arrays.files else None
+    deltas = {}
+    whole = {}
+    for name in arrays.files:
+        if name.endswith(SCALE_SUFFIX) or name == ARCHITECTURE_KEY:
+            continue
+        if name.startswith(WHOLE_PREFIX):
+            whole[name[len(WHOLE_PREFIX):]] = arrays[name]
+            continue
+        delta = arrays[name].astype(np.float64)
+        if name + SCALE_SUFFIX in arrays.files:
+            delta *= arrays[name + SCALE_SUFFIX]
+        deltas[name] = delta
+    arrays.close()
+    return architecture, deltas, whole
+
+# Rebuilds a network from an incremental checkpoint directory
+# Args:
+#   directory (string) - the checkpoint directory
+#   index (int) optional - which checkpoint to rebuild, the latest if not given
+# Raises ValueError if the directory holds no checkpoints, the index is out of range, or the checkpoint was pruned
+def load_incremental(directory, index=None):
+    checkpoints = read_manifest(directory)["checkpoints"]
+    if not checkpoints:
+        raise ValueError("No incremental checkpoints in %s" % directory)
+    if index is None:
+        index = len(checkpoints) - 1
+    if not 0 <= index < len(checkpoints):
+        raise ValueError("checkpoint %d does not exist, %s holds %d" % (index, directory, len(checkpoints)))
+    base = checkpoints[index]["base"]
+    if any(entry["file"] is None for entry in checkpoints[base:index+1]):
+        raise ValueError("checkpoint %d was pruned" % index)
+
+    header, tensors = read_checkpoint(os.path.join(directory, checkpoints[base]["file"]))
+    architecture = header["architecture"]
+    for entry in checkpoints[base+1:index+1]:
+        architecture, deltas, whole = read_delta(os.path.join(directory, entry["file"]))
+        for name, delta in deltas.items():
+            tensors[name] += delta
+        tensors.update(whole)
+
+    return build_network(architecture, "", tensors)
+
+# Saves a sequence of checkpoints of a network where, after a full base, every save only stores
+# the tensors that changed meaningfully
+# It can be given to the training loops as their checkpointer like a BackgroundCheckpointer, then it saves
+# (in the training thread) whenever an interval has passed
+class IncrementalCheckpointer:
+    # Args:
+    #   directory (string) - directory holding the checkpoints (created if needed)
+    #   threshold (float) - a tensor is skipped if none of its values moved by more than this since it was last stored
+    #   quantize (string) optional - None to store float64 deltas, "float16", or "int8" (with one scale per tensor)
+    #   compact_every (int) - number of deltas after which the next save writes a new full base,
+    #                         which bounds how many deltas have to be replayed to load a checkpoint
+    #   every_steps (int) optional - when stepped by a training loop, save after this many training steps
+    #   every_seconds (float) optional - when stepped by a training loop, save once this many seconds have
+    #                                    passed since the last save
+    def __init__(self, directory, threshold=0.0, quantize=None, compact_every=20, every_steps=None,
+                 every_seconds=None):
+        self.directory = directory
+        self.threshold = threshold
+        self.quantize = quantize
+        self.compact_every = compact_every
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+
+        self.steps = 0
+        self.last_save_step = 0
+        self.last_save_time = time.time()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.manifest = read_manifest(directory)
+
+        # The parameters as they will be rebuilt from the stored files, deltas are taken against these
+        # so quantization errors are corrected by later deltas instead of accumulating
+        self.reference = None
+        self.architecture = None
+        self.num_deltas = 0
+
+    # Called by the training loops after every update, saves the network when an interval has passed
+    # Args:
+    #   network (object) - the network being trained
+    def step(self, network):
+        self.steps += 1
+        due = False
+        if self.every_steps is not None and self.steps - self.last_save_step >= self.every_steps:
+            due = True
+        if self.every_seconds is not None and time.time() - self.last_save_time >= self.every_seconds:
+            due = True
+        if due:
+            self.save(network)
+
+    # Saves a checkpoint of the network, returning its index
+    def save(self, network):
+        self.last_save_step = self.steps
+        self.last_save_time = time.time()
+        tensors = []
+        architecture = describe_network(network, "", tensors)
+        index = len(self.manifest["checkpoints"])
+
+        if (self.reference is None or self.num_deltas >= self.compact_every or
+                model_architecture(architecture) != self.architecture):
+            self.write_base(index, architecture, tensors)
+        else:
+            self.write_delta(index, architecture, tensors)
+
+        write_manifest(self.directory, self.manifest)
+        return index
+
+    # Makes the next save write a new full base
+    def compact(self):
+        self.reference = None
+
+    # Deletes every chain except the newest keep_bases ones (their checkpoints can no longer be loaded)
+    # Raises ValueError if keep_bases is less than 1, the newest chain is always kept
+    def prune(self, keep_bases=1):
+        if keep_bases < 1:
+            raise ValueError("prune has to keep at least one chain, got keep_bases=%d" % keep_bases)
+        checkpoints = self.manifest["checkpoints"]
+        bases = [c["index"] for c in checkpoints if c["base"] == c["index"] and c["file"] is not None]
+        if len(bases) <= keep_bases:
+            return
+        first_kept = bases[-keep_bases]
+        for c in checkpoints[:first_kept]:
+            if c["file"] is not None:
+                os.remove(os.path.join(self.directory, c["file"]))
+                c["file"] = None
+        write_manifest(self.directory, self.manifest)
+
+    def write_base(self, index, architecture, tensors):
+        filename = "base_%06d.ckpt" % index
+        write_checkpoint(os.path.join(self.directory, filename), architecture, tensors)
+
+        self.reference = dict((name, np.array(arr, dtype=np.float64)) for name, arr in tensors)
+        self.architecture = model_architecture(architecture)
+        self.num_deltas = 0
+        self.manifest["checkpoints"].append({"index": index, "file": filename, "base": index})
+
+    def write_delta(self, index, architecture, tensors):
+        arrays = {ARCHITECTURE_KEY: np.array(json.dumps(architecture))}
+        for name, arr in tensors:
+            if name not in self.reference or name.startswith("training.") or ".training." in name:
+                arrays[WHOLE_PREFIX + name] = np.array(arr, dtype=np.float64)
+                continue
+
+            delta = np.asarray(arr, dtype=np.float64) - self.reference[name]
+            largest = np.max(np.abs(delta)) if delta.size > 0 else 0.0
+            if largest <= self.threshold:
+                continue
+
+            if self.quantize == "float16":
+                stored = delta.astype("<f2")
+                applied = stored.astype(np.float64)
+            elif self.quantize == "int8":
+                scale = largest / 127.0
+                stored = np.round(delta / scale).astype(np.int8)
+                applied = stored * scale
+                arrays[name + SCALE_SUFFIX] = np.array(scale)
+            else:
+                stored = delta
+                applied = delta
+
+            arrays[name] = stored
+            self.reference[name] += applied
+
+        filename = "delta_%06d.npz" % index
+        write_file(os.path.join(self.directory, filename), lambda delta_file: np.savez_compressed(delta_file, **arrays))
+
+        self.num_deltas += 1
+        self.manifest["checkpoints"].append({"index": index, "file": filename, "base": self.manifest["checkpoints"][-1]["base"]})
+
+    # Rebuilds the network stored at a checkpoint index (the latest if not given)
+    def load(self, index=None):
+        return load_incremental(self.directory, index)
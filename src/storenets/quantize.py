@@ -0,0 +1,47 @@
+from layers import LazyValue
+
+import numpy as np
+
+# Quantized tensors for exported models
+#
+# A float16 tensor is stored as is. An int8 tensor is stored with a float64 companion tensor
+# named <name>.scale holding one scale per output channel (first axis), so that
+# value = int8 value * scale of its channel.
+
+QUANTIZED_DTYPES = {"float16": "<f2", "int8": "|i1"}
+SCALE_SUFFIX = ".scale"
+
+# Returns a list of (name, np array) pairs storing arr at a lower precision
+# Args:
+#   name (string) - name of the tensor
+#   arr (np array) - the tensor, its first axis is the output channel
+#   precision (string) - "float16" or "int8"
+def quantize(name, arr, precision):
+    if precision == "float16":
+        return [(name, arr.astype("<f2"))]
+    elif precision == "int8":
+        largest = np.abs(arr).reshape(len(arr), -1).max(axis=1)
+        scale = np.where(largest > 0, largest / 127.0, 1.0)
+        values = np.round(arr / scale.reshape((-1,) + (1,)*(arr.ndim-1))).astype(np.int8)
+        return [(name, values), (name + SCALE_SUFFIX, scale)]
+    raise ValueError("Unknown precision %s" % precision)
+
+# Returns a float64 copy of a quantized tensor
+def dequantize(values, scale=None):
+    arr = values.astype(np.float64)
+    if scale is not None:
+        arr *= scale.reshape((-1,) + (1,)*(arr.ndim-1))
+    return arr
+
+# Replaces every quantized tensor in a dictionary of tensors by its float64 value, or by a
+# LazyValue computing it if lazy is set, and removes the scale tensors
+def dequantize_tensors(tensors, lazy=False):
+    for name in list(tensors.keys()):
+        if name.endswith(SCALE_SUFFIX) or isinstance(tensors[name], LazyValue) or tensors[name].dtype.str not in QUANTIZED_DTYPES.values():
+            continue
+        scale = tensors.pop(name + SCALE_SUFFIX, None)
+        if lazy:
+            tensors[name] = LazyValue(lambda values=tensors[name], scale=scale: dequantize(values, scale))
+        else:
+            tensors[name] = dequantize(tensors[name], scale)
+    return tensors
@@ -2,11 +2,15 @@ from neuralnets import GAN
 from neuralnets import Generator
 from neuralnets import Discriminator
 from neuralnets import ConvolutionalNet
+from neuralnets import RecurrentNet
 from layers import Kernel
 from layers import DenseLayer
 from layers import SoftmaxLayer
 from layers import DeconvLayer
 from layers import ConvLayer
+from layers import RecurrentLayer
+from layers import GRULayer
+from layers import LSTMLayer
 
 import os
 
@@ -33,6 +37,8 @@ def save (filename, network):
         currdir = currdir+"/"+filename+"_gan_net"
     elif isinstance(network, ConvolutionalNet):
         currdir = currdir+"/"+filename+"_cnn_net"
+    elif isinstance(network, RecurrentNet):
+        currdir = currdir+"/"+filename+"_rnn_net"
     else:
         return "Failed save"
 
@@ -94,6 +100,48 @@ def save_net(filename, network, currdir):
         # Close file
         savefile.close()
 
+    # If recurrent network object
+    elif isinstance(network, RecurrentNet):
+        filename += "_rnn"
+        filedir = os.path.join(currdir, filename + ".txt")
+
+        savefile = open(filedir, "w")
+
+        # Save number of inputs and number of layers
+        savefile.write(str(network.num_inputs) + "\n")
+        savefile.write(str(network.num_layers) + "\n")
+
+        # Save layer types and layers
+        for i, lt, lyr in zip(range(network.num_layers), network.layer_types, network.layers):
+            savefile.write(lt + "\n")
+            newfilename = filename + "_" + lt + "_" + str(i)
+            savefile.write(newfilename + ".txt\n")
+            save_net(newfilename, lyr, currdir)
+
+        # Close file
+        savefile.close()
+
+    # If recurrent layer object (gru and lstm weights are stacked by gate)
+    elif isinstance(network, (RecurrentLayer, GRULayer, LSTMLayer)):
+        filedir = os.path.join(currdir, filename + ".txt")
+
+        savefile = open(filedir, "w")
+
+        savefile.write(tuple_to_str(network.layer_shape) + "\n")
+
+        # Save weights and past weights (2D arrs)
+        for weights in (network.weights, network.past_weights):
+            for w1 in weights:
+                for w2 in w1:
+                    savefile.write(str(w2) + "\n")
+
+        # Save biases (1D arr)
+        for b1 in network.biases:
+            savefile.write(str(b1) + "\n")
+
+        # Close file
+        savefile.close()
+
     # If layer object
     elif isinstance(network, (ConvLayer, DeconvLayer, DenseLayer, SoftmaxLayer)):
         filedir = os.path.join(currdir, filename + ".txt")
@@ -118,7 +166,7 @@ def save_net(filename, network, currdir):
                 save_net(newfilename, k, currdir)
 
         elif isinstance(network, (SoftmaxLayer, DenseLayer)):
-            savefile.write(tuple_to_str(network.layer_shape) + "\n")
+            savefile.write(tuple_to_str((network.output_shape, network.input_shape)) + "\n")
             weights = network.weights
             biases = network.biases
 
@@ -0,0 +1,22 @@
+from datasets import ArrayDataset
+
+import unittest
+import numpy as np
+
+class ArrayDatasetTest(unittest.TestCase):
+    def setUp(self):
+        self.dataset = ArrayDataset(np.arange(12).reshape(4, 3), np.eye(4))
+
+    def test_gather(self):
+        inputs_out = np.empty((2, 3))
+        inputs, targets = self.dataset.gather(np.array([3, 1]), inputs_out=inputs_out)
+        self.assertIs(inputs, inputs_out)
+        np.testing.assert_array_equal(inputs, [[9, 10, 11], [3, 4, 5]])
+        np.testing.assert_array_equal(targets, np.eye(4)[[3, 1]])
+
+    def test_gather_out_of_range_raises(self):
+        with self.assertRaises(IndexError):
+            self.dataset.gather(np.array([0, 4]))
+
+if __name__ == "__main__":
+    unittest.main()
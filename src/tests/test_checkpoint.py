@@ -0,0 +1,34 @@
+from neuralnets import FullyConnectedNet
+from storenets import export_checkpoint
+from storenets import load_checkpoint
+from storenets import load
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+class ExportCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.directory = tempfile.mkdtemp()
+        self.network = FullyConnectedNet([30, 40, 10])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fullyconnected_weights_are_quantized(self):
+        sizes = {}
+        for precision, tolerance in (("float16", 1e-3), ("int8", 1e-2)):
+            filename = os.path.join(self.directory, precision)
+            export_checkpoint(filename, self.network, precision)
+            sizes[precision] = os.path.getsize(filename)
+            for loader in (load_checkpoint, load):
+                loaded = loader(filename)
+                for w, expected in zip(loaded.get_weights(), self.network.get_weights()):
+                    np.testing.assert_allclose(w, expected, atol=tolerance)
+        self.assertLess(sizes["int8"], sizes["float16"])
+
+if __name__ == "__main__":
+    unittest.main()
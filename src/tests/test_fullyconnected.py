@@ -0,0 +1,19 @@
+from neuralnets import FullyConnectedNet
+
+import unittest
+import numpy as np
+
+class FullyConnectedNetTest(unittest.TestCase):
+    def test_training_after_setting_list_weights(self):
+        network = FullyConnectedNet([2, 2, 1])
+        network.set_weights_biases([[[1, -1], [0, 2]], [[1, 1]]], [[0, 0], [1]])
+        examples = [np.array([1.0, 0.0]), np.array([0.0, 1.0])]
+        outputs = [np.array([1.0]), np.array([0.0])]
+        network.stochastic_gradient_descent(2, 1, examples, outputs, 0.1, progress=lambda report: None)
+
+        weights = network.get_weights()
+        self.assertTrue(all(w.dtype == float for w in weights + network.get_biases()))
+        self.assertFalse(np.array_equal(weights[0], [[1, -1], [0, 2]]))
+
+if __name__ == "__main__":
+    unittest.main()
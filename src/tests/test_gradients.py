@@ -0,0 +1,111 @@
+from layers import ConvLayer
+from layers import DeconvLayer
+from neuralnets import Discriminator
+
+import unittest
+import numpy as np
+
+# Gradient checks of the convolutional layers and of the input gradients of a discriminator
+# Run from the src directory: python -m unittest discover tests
+
+# Step of the central differences
+EPSILON = 1e-6
+
+# Returns the sum of the activations of a layer for one input weighted by deltas, whose gradient with
+# respect to the input is what getdeltas returns for derivatives of one
+def weighted_activations(layer, inputs, deltas):
+    return np.sum(layer.getactivations(inputs) * deltas)
+
+# Returns the central difference gradient of function with respect to every element of array (changed in place)
+def numeric_gradient(function, array):
+    gradient = np.zeros(array.shape)
+    for index in np.ndindex(*array.shape):
+        original = array[index]
+        array[index] = original + EPSILON
+        above = function()
+        array[index] = original - EPSILON
+        below = function()
+        array[index] = original
+        gradient[index] = (above - below) / (2*EPSILON)
+    return gradient
+
+class DeconvLayerTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        # Several kernels on a deep input, the case where the per example path padded repeatedly
+        self.layer = DeconvLayer(input_shape=(2, 3, 3), output_shape=(3, 5, 5), kernel_shape=(3, 2, 2, 2))
+        self.inputs = np.random.randn(4, 2, 3, 3)
+        self.deltas = np.random.randn(4, 3, 5, 5)
+        self.derivatives = np.random.rand(4, 2, 3, 3)
+
+    def test_getdeltas_batch_matches_getdeltas(self):
+        batch = self.layer.getdeltas_batch(self.derivatives, self.deltas)
+        for i in range(len(self.inputs)):
+            np.testing.assert_allclose(batch[i], self.layer.getdeltas(self.derivatives[i], self.deltas[i]),
+                                       rtol=1e-10, atol=1e-12)
+
+    def test_backprop_deltas_match_getdeltas(self):
+        for i in range(len(self.inputs)):
+            wd, bd, deltas = self.layer.backprop(self.inputs[i], self.derivatives[i], self.deltas[i])
+            np.testing.assert_allclose(deltas, self.layer.getdeltas(self.derivatives[i], self.deltas[i]),
+                                       rtol=1e-10, atol=1e-12)
+
+    def test_getdeltas_finite_differences(self):
+        inputs = self.inputs[0].copy()
+        numeric = numeric_gradient(lambda: weighted_activations(self.layer, inputs, self.deltas[0]), inputs)
+        # With derivatives of one the deltas are the gradient with respect to the input
+        analytic = self.layer.getdeltas(np.ones(inputs.shape), self.deltas[0])
+        np.testing.assert_allclose(analytic, numeric, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(self.layer.getdeltas_batch(np.ones((1,) + inputs.shape), self.deltas[:1])[0],
+                                   numeric, rtol=1e-5, atol=1e-6)
+
+class ConvLayerTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.layer = ConvLayer(input_shape=(2, 5, 5), kernel_shape=(3, 2, 2, 2))
+        self.inputs = np.random.randn(4, 2, 5, 5)
+        self.deltas = np.random.randn(4, 3, 4, 4)
+        self.derivatives = np.random.rand(4, 2, 5, 5)
+
+    def test_getdeltas_batch_matches_getdeltas(self):
+        batch = self.layer.getdeltas_batch(self.derivatives, self.deltas)
+        for i in range(len(self.inputs)):
+            np.testing.assert_allclose(batch[i], self.layer.getdeltas(self.derivatives[i], self.deltas[i]),
+                                       rtol=1e-10, atol=1e-12)
+
+    def test_getdeltas_finite_differences(self):
+        inputs = self.inputs[0].copy()
+        numeric = numeric_gradient(lambda: weighted_activations(self.layer, inputs, self.deltas[0]), inputs)
+        np.testing.assert_allclose(self.layer.getdeltas(np.ones(inputs.shape), self.deltas[0]), numeric,
+                                   rtol=1e-5, atol=1e-6)
+
+class DiscriminatorTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.discriminator = Discriminator((1, 3, 3))
+        self.discriminator.addlayer("deconv", (4, 4), (3, 2, 2))
+        self.discriminator.addlayer("conv", None, (2, 2, 2))
+        self.discriminator.addlayer("dense", 6)
+        self.discriminator.addlayer("soft", 2)
+        self.images = np.random.randn(3, 1, 3, 3)
+        self.expected = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 0.0]])
+
+    def test_cost_and_deltas_batch_finite_differences(self):
+        images = self.images.copy()
+        costs, deltas = self.discriminator.cost_and_deltas_batch(images, self.expected, np.ones(images.shape))
+        for i in range(len(images)):
+            cost = lambda: self.discriminator.cost_function.cost(self.discriminator.feedforward(images[i]),
+                                                                 self.expected[i])
+            self.assertAlmostEqual(costs[i], cost(), places=10)
+            np.testing.assert_allclose(deltas[i], numeric_gradient(cost, images[i]), rtol=1e-4, atol=1e-6)
+
+    def test_cost_and_deltas_match_batch(self):
+        costs, deltas = self.discriminator.cost_and_deltas_batch(self.images, self.expected, np.ones(self.images.shape))
+        for i in range(len(self.images)):
+            cost, delta = self.discriminator.cost_and_deltas(self.images[i], self.expected[i],
+                                                             np.ones(self.images[i].shape))
+            self.assertAlmostEqual(costs[i], cost, places=10)
+            np.testing.assert_allclose(deltas[i], delta, rtol=1e-10, atol=1e-12)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+from neuralnets import ConvolutionalNet
+from neuralnets import GAN
+from storenets import IncrementalCheckpointer
+from storenets import load_incremental
+
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+class IncrementalCheckpointerTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.directory = tempfile.mkdtemp()
+        self.network = ConvolutionalNet(input_shape=3)
+        self.network.addlayer("dense", 4)
+        self.network.addlayer("soft", 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_loading_a_pruned_checkpoint_raises(self):
+        checkpointer = IncrementalCheckpointer(self.directory, compact_every=1)
+        for i in range(4):
+            self.network.layers[0].weights += 0.1
+            checkpointer.save(self.network)
+        checkpointer.prune(1)
+
+        with self.assertRaises(ValueError):
+            load_incremental(self.directory, 1)
+        latest = load_incremental(self.directory)
+        np.testing.assert_array_equal(latest.layers[0].weights, self.network.layers[0].weights)
+
+    def test_pruning_every_chain_raises(self):
+        checkpointer = IncrementalCheckpointer(self.directory, compact_every=1)
+        for i in range(3):
+            checkpointer.save(self.network)
+        with self.assertRaises(ValueError):
+            checkpointer.prune(0)
+        self.assertTrue(all(entry["file"] is not None for entry in checkpointer.manifest["checkpoints"]))
+
+    def test_loading_a_missing_checkpoint_raises(self):
+        with self.assertRaises(ValueError):
+            load_incremental(self.directory)
+        IncrementalCheckpointer(self.directory).save(self.network)
+        with self.assertRaises(ValueError):
+            load_incremental(self.directory, 1)
+
+    def test_training_loops_step_the_checkpointer(self):
+        checkpointer = IncrementalCheckpointer(self.directory, every_steps=2)
+        inputs = [np.random.randn(3) for i in range(8)]
+        outputs = [np.eye(2)[i % 2] for i in range(8)]
+        # Two epochs of four minibatches, a save every second update
+        self.network.stochastic_gradient_descent(2, 0.1, 2, inputs, outputs, checkpointer=checkpointer,
+                                                 progress=lambda report: None)
+        self.assertEqual(len(checkpointer.manifest["checkpoints"]), 4)
+        latest = load_incremental(self.directory)
+        np.testing.assert_array_equal(latest.layers[0].weights, self.network.layers[0].weights)
+
+    def test_gan_train_steps_the_checkpointer(self):
+        gan = GAN((1, 3, 3), (1, 2, 2), 2)
+        gan.add_layer_to_generator("deconv", (3, 3), (1, 2, 2))
+        gan.add_layer_to_discriminator("conv", None, (2, 2, 2))
+        gan.add_layer_to_discriminator("dense", 4)
+        gan.add_layer_to_discriminator("soft", 2)
+        noise_set = [(n, np.array([1, 0])) for n in np.random.randn(8, 1, 2, 2)]
+        checkpointer = IncrementalCheckpointer(self.directory, every_steps=1)
+        gan.train(rounds=2, real_images=np.random.rand(8, 1, 3, 3), noise_set=noise_set, real_output=np.array([1, 0]),
+                  fake_output=np.array([0, 1]), buffer_capacity=8, mini_batch_size=4, checkpointer=checkpointer,
+                  progress=lambda report: None)
+        self.assertEqual(len(checkpointer.manifest["checkpoints"]), 2)
+        latest = load_incremental(self.directory)
+        np.testing.assert_array_equal(latest.get_generator().layers[0].kernels[0].weights,
+                                      gan.get_generator().layers[0].kernels[0].weights)
+
+if __name__ == "__main__":
+    unittest.main()
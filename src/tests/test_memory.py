@@ -0,0 +1,35 @@
+from neuralnets import GAN
+from neuralnets import memory_report
+
+import unittest
+import numpy as np
+
+class MemoryReportTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.gan = GAN((1, 8, 8), (1, 4, 4), 2)
+        self.gan.add_layer_to_generator("deconv", (8, 8), (1, 2, 2))
+        self.gan.add_layer_to_discriminator("conv", None, (6, 2, 2))
+        self.gan.add_layer_to_discriminator("soft", 2)
+
+    def test_generator_step_counts_the_discriminator_cache(self):
+        report = memory_report(self.gan.get_generator(), 50, discriminator=self.gan.get_discriminator())
+        self.assertEqual([row["name"] for row in report["layers"]],
+                         ["0 deconv", "discriminator 0 conv", "discriminator 1 soft"])
+        # The derivatives of the (6, 7, 7) conv outputs for the whole minibatch
+        self.assertEqual(report["layers"][1]["activations"], 6*7*7*50*8)
+
+    def test_gan_combines_both_networks(self):
+        report = memory_report(self.gan, 50)
+        generator = memory_report(self.gan.get_generator(), 50, discriminator=self.gan.get_discriminator())
+        discriminator = memory_report(self.gan.get_discriminator(), 50)
+        self.assertEqual(report["network"], "GAN")
+        self.assertEqual(report["layers"][0]["name"], "generator 0 deconv")
+        for row, generator_step, discriminator_step in zip(report["layers"][1:], generator["layers"][1:],
+                                                           discriminator["layers"]):
+            for key in ("parameters", "gradients", "activations", "optimizer_state"):
+                self.assertEqual(row[key], max(generator_step[key], discriminator_step[key]))
+        self.assertEqual(report["total"]["total"], sum(row["total"] for row in report["layers"]))
+
+if __name__ == "__main__":
+    unittest.main()
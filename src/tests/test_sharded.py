@@ -0,0 +1,37 @@
+from datasets import write_shards
+from datasets import load_shards
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+class ShardedDatasetTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_shards_keep_their_dtype(self):
+        inputs = np.arange(5*4, dtype=np.uint8).reshape(5, 1, 2, 2)
+        targets = np.eye(5, dtype=np.uint8)
+        write_shards(self.directory, inputs, targets, shard_size=2)
+        self.assertEqual(np.load(os.path.join(self.directory, "inputs_00000.npy")).dtype, np.uint8)
+
+        dataset = load_shards(self.directory)
+        self.assertEqual(len(dataset), 5)
+        inp, target = dataset[3]
+        self.assertEqual(inp.dtype, float)
+        np.testing.assert_array_equal(inp, inputs[3])
+        gathered_inputs, gathered_targets = dataset.gather(np.array([4, 0, 2]))
+        self.assertEqual(gathered_inputs.dtype, float)
+        np.testing.assert_array_equal(gathered_targets, targets[[4, 0, 2]])
+
+    def test_loading_an_empty_directory_raises(self):
+        with self.assertRaises(ValueError):
+            load_shards(self.directory)
+
+if __name__ == "__main__":
+    unittest.main()
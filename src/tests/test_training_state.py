@@ -0,0 +1,170 @@
+from neuralnets import ConvolutionalNet
+from neuralnets import FullyConnectedNet
+from neuralnets import RecurrentNet
+from neuralnets import GAN
+from neuralnets import TrainingState
+from datasets import Stream
+from storenets import save_checkpoint
+from storenets import load_checkpoint
+from storenets.checkpoint import describe_network
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+# Stops a training loop from its progress function after a number of epochs
+class Interrupt(Exception):
+    pass
+
+def interrupt_after(epochs, reports):
+    def progress(report):
+        reports.append(report)
+        if len(reports) == epochs:
+            raise Interrupt()
+    return progress
+
+class StartTrainingTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.network = ConvolutionalNet(input_shape=3)
+        self.network.addlayer("dense", 4)
+        self.network.addlayer("soft", 2)
+        self.inputs = list(np.random.rand(10, 3))
+        self.outputs = [np.eye(2)[i % 2] for i in range(10)]
+
+    def test_interrupted_run_is_not_resumed(self):
+        reports = []
+        with self.assertRaises(Interrupt):
+            self.network.stochastic_gradient_descent(3, 0.01, 5, self.inputs, self.outputs,
+                                                     progress=interrupt_after(2, reports))
+        reports = []
+        self.network.stochastic_gradient_descent(3, 0.01, 5, self.inputs, self.outputs, progress=reports.append)
+        self.assertEqual([report["epoch"] for report in reports], [1, 2, 3])
+        self.assertIsNone(self.network.training_state)
+
+    def test_one_shot_stream_raises_on_empty_epoch(self):
+        examples = (example for example in zip(self.inputs, self.outputs))
+        reports = []
+        with self.assertRaises(ValueError):
+            self.network.stochastic_gradient_descent(2, 0.01, 5, Stream(examples), None, progress=reports.append)
+        self.assertEqual([report["epoch"] for report in reports], [1])
+
+# Checkpoints a network after every update and stops training after a number of updates
+class StopAfter:
+    def __init__(self, filename, steps):
+        self.filename = filename
+        self.steps = steps
+
+    def step(self, network):
+        save_checkpoint(self.filename, network)
+        self.steps -= 1
+        if self.steps == 0:
+            raise Interrupt()
+
+def silent(report):
+    pass
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    # Trains a network uninterrupted, and another one that is stopped mid-epoch, restored from its checkpoint
+    # with every random number generator disturbed, and trained again, and checks both end with the same parameters
+    # Args:
+    #   make (function) - returns a new network
+    #   train (function) - trains a network, called with (network, checkpointer)
+    #   steps (int) - number of updates before the run is stopped, not a multiple of the updates per epoch
+    def assert_resumes_exactly(self, make, train, steps):
+        np.random.seed(1)
+        random.seed(1)
+        uninterrupted = make()
+        train(uninterrupted, None)
+
+        np.random.seed(1)
+        random.seed(1)
+        filename = os.path.join(self.directory, "resume.ckpt")
+        with self.assertRaises(Interrupt):
+            train(make(), StopAfter(filename, steps))
+        np.random.seed(99)
+        random.seed(99)
+        restored = load_checkpoint(filename)
+        self.assertIsNotNone(restored.training_state)
+        train(restored, None)
+
+        expected = []
+        describe_network(uninterrupted, "", expected, optimizer_state=False)
+        resumed = []
+        describe_network(restored, "", resumed, optimizer_state=False)
+        self.assertEqual([name for name, arr in resumed], [name for name, arr in expected])
+        for (name, arr), (expected_name, expected_arr) in zip(resumed, expected):
+            np.testing.assert_array_equal(arr, expected_arr, err_msg=name)
+
+    def test_convolutional_net_with_momentum(self):
+        inputs = list(np.random.rand(23, 1, 6, 6))
+        outputs = [np.eye(3)[i % 3] for i in range(23)]
+        def make():
+            network = ConvolutionalNet((1, 6, 6))
+            network.addlayer("conv", None, (2, 3, 3))
+            network.addlayer("dense", 10)
+            network.addlayer("soft", 3)
+            return network
+        def train(network, checkpointer):
+            network.stochastic_gradient_descent(3, 0.1, 5, inputs, outputs, is_momentum_based=True, friction=0.9,
+                                                checkpointer=checkpointer, progress=silent)
+        self.assert_resumes_exactly(make, train, 7)
+
+    def test_fullyconnected_net_with_l2(self):
+        inputs = list(np.random.rand(23, 8))
+        outputs = [np.eye(3)[i % 3] for i in range(23)]
+        def train(network, checkpointer):
+            network.stochastic_gradient_descent(3, 5, inputs, outputs, 0.5, lmbda=0.1, regularization_type="L2",
+                                                checkpointer=checkpointer, progress=silent)
+        self.assert_resumes_exactly(lambda: FullyConnectedNet([8, 6, 3]), train, 8)
+
+    def test_lstm_recurrent_net(self):
+        sequence = [(np.eye(5)[i % 5], np.eye(5)[(i+1) % 5]) for i in range(23)]
+        def make():
+            network = RecurrentNet(5)
+            network.add("lstm", 6)
+            network.add("recurr", 4)
+            network.add("soft", 5)
+            return network
+        def train(network, checkpointer):
+            network.stochastic_gradient_descent(3, 0.1, 4, sequence, checkpointer=checkpointer, progress=silent)
+        self.assert_resumes_exactly(make, train, 8)
+
+    def test_gan(self):
+        noise_set = [(noise, np.array([1, 0])) for noise in np.random.randn(30, 1, 2, 2)]
+        real_images = np.random.rand(30, 1, 3, 3)
+        def make():
+            gan = GAN((1, 3, 3), (1, 2, 2), 2)
+            gan.add_layer_to_generator("deconv", (3, 3), (1, 2, 2))
+            gan.add_layer_to_discriminator("conv", None, (3, 2, 2))
+            gan.add_layer_to_discriminator("dense", 10)
+            gan.add_layer_to_discriminator("soft", 2)
+            return gan
+        def train(gan, checkpointer):
+            gan.train(4, real_images, noise_set, np.array([1, 0]), np.array([0, 1]), 20, discriminator_epochs=2,
+                      generator_epochs=2, mini_batch_size=7, checkpointer=checkpointer, progress=silent)
+        self.assert_resumes_exactly(make, train, 2)
+
+class TrainingStateTest(unittest.TestCase):
+    def test_averages_of_an_empty_epoch_are_nan(self):
+        state = TrainingState()
+        self.assertTrue(np.isnan(state.average_cost()))
+        self.assertTrue(np.isnan(state.average_accuracy()))
+
+    def test_averages(self):
+        state = TrainingState(position=4, cost=2.0, correct=3)
+        self.assertEqual(state.average_cost(), 0.5)
+        self.assertEqual(state.average_accuracy(), 0.75)
+
+if __name__ == "__main__":
+    unittest.main()